@@ -2,7 +2,7 @@
 Main Flask application for AI-Driven Personalized Learning Platform
 """
 import os
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
@@ -10,6 +10,13 @@ from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
 from config import config
 from database import db, init_db
+from ml_engine.recommend import ai_engine
+from ml_engine.cache import recommendation_cache
+from ml_engine.collaborative import collaborative_model
+from ml_engine.review import review_scheduler
+from ml_engine.registry import model_registry
+from ml_engine.scoring import scoring_model
+from ml_engine.instrumentation import metrics, shared_metrics, instrument_sqlalchemy
 
 # Import routes
 from routes.auth_routes import auth_bp
@@ -71,6 +78,49 @@ def create_app(config_name=None):
     # Initialize database
     init_db(app)
     
+    # Time SQL statements per endpoint for /metrics
+    with app.app_context():
+        instrument_sqlalchemy(db.engine)
+    
+    # Each worker snapshots its metrics into a shared directory so /metrics
+    # can report totals across workers
+    shared_metrics.configure(
+        directory=app.config['METRICS_DIR'],
+        flush_interval=app.config['METRICS_FLUSH_INTERVAL']
+    )
+    
+    @app.before_request
+    def start_metrics_flusher():
+        shared_metrics.start()  # Once per (possibly forked) worker process
+    
+    # Size the per-worker recommendation cache
+    recommendation_cache.configure(
+        max_entries=app.config['RECOMMENDATION_CACHE_SIZE'],
+        max_age=app.config['RECOMMENDATION_CACHE_TTL']
+    )
+    collaborative_model.configure(neighbors=app.config['COLLABORATIVE_NEIGHBORS'])
+    review_scheduler.configure(
+        max_students=app.config['REVIEW_QUEUE_SIZE'],
+        max_age=app.config['REVIEW_QUEUE_TTL']
+    )
+    scoring_model.configure(
+        path=app.config['RECOMMENDATION_SCORING_SPEC'],
+        check_interval=app.config['ML_MODEL_CHECK_INTERVAL']
+    )
+    
+    # Load the live model version and hot-swap to newer ones as they are published
+    model_registry.configure(
+        root=app.config['ML_MODEL_DIR'],
+        check_interval=app.config['ML_MODEL_CHECK_INTERVAL']
+    )
+    model_registry.subscribe(ai_engine.apply_model)
+    model_registry.subscribe(collaborative_model.apply_model)
+    model_registry.poll(force=True)
+    
+    @app.before_request
+    def poll_model_registry():
+        model_registry.poll()
+    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(lesson_bp, url_prefix='/api/lessons')
@@ -160,6 +210,28 @@ def create_app(config_name=None):
                 'error': 'file_not_found'
             }), 404
     
+    # Prometheus metrics summed over all workers
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return jsonify({
+                    'success': False,
+                    'message': 'Metrics token required',
+                    'error': 'authorization_required'
+                }), 401
+        elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+            # No token configured: only scrapers on this host may read metrics,
+            # not clients relayed by a local reverse proxy
+            return jsonify({
+                'success': False,
+                'message': 'Metrics are only served to local clients unless METRICS_TOKEN is set',
+                'error': 'forbidden'
+            }), 403
+        series = shared_metrics.collect() if shared_metrics.enabled else None
+        return Response(metrics.render(series), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
     # Health check endpoint
     @app.route('/health', methods=['GET'])
     def health_check():
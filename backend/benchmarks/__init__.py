@@ -0,0 +1 @@
+# Benchmark suite (run the scripts directly; see bench_engine.py)
@@ -0,0 +1,212 @@
+"""
+Benchmark AIEngine methods on synthetic student histories and catalogs
+Times evaluate_performance, recommend_lessons, detect_learning_gaps and
+predict_success_probability for each size preset and reports throughput,
+p50/p99 latency and peak traced memory. Inputs (and catalog-level indexes,
+which the app caches) are built before timing starts.
+
+    python benchmarks/bench_engine.py                          # all sizes
+    python benchmarks/bench_engine.py --sizes small medium
+    python benchmarks/bench_engine.py --save benchmarks/baseline.json
+    python benchmarks/bench_engine.py --compare benchmarks/baseline.json
+
+--compare exits with status 1 when a case's p50 latency or peak memory
+grew by more than --threshold over the baseline (latency changes under
+--min-delta-ms are ignored).
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+# Run from anywhere: make the backend package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_engine.recommend import AIEngine
+from ml_engine.scoring import LessonScoringMatrix
+from ml_engine.topic_index import LessonTopicIndex
+from benchmarks.synthetic import make_catalog, make_student, make_quiz
+
+# name: (attempts per student, lessons in the catalog)
+SIZES = {
+    'small': (10, 10),
+    'medium': (1000, 1000),
+    'large': (10000, 10000),
+    'xlarge': (100000, 50000)
+}
+METHODS = ['evaluate_performance', 'recommend_lessons', 'detect_learning_gaps', 'predict_success_probability']
+
+
+def build_cases(size, engine, seed):
+    """
+    Inputs for every benchmarked method at one size
+
+    Returns:
+        dict: {method: zero-argument callable}
+    """
+    n_attempts, n_lessons = SIZES[size]
+    catalog = make_catalog(n_lessons, seed)
+    student = make_student(n_attempts, catalog, engine, seed)
+    quiz = make_quiz(catalog, seed)
+
+    # The app builds these once per catalog version (see ml_engine.catalog)
+    scoring_matrix = LessonScoringMatrix(catalog)
+    topic_index = LessonTopicIndex(catalog)
+
+    return {
+        'evaluate_performance': lambda: engine.evaluate_performance(student['attempts']),
+        'recommend_lessons': lambda: engine.recommend_lessons(
+            student, catalog, limit=5, matrix=scoring_matrix
+        ),
+        'detect_learning_gaps': lambda: engine.detect_learning_gaps(
+            student['attempts'], catalog, topic_index
+        ),
+        'predict_success_probability': lambda: engine.predict_success_probability(
+            {'attempts': student['attempts']}, quiz
+        )
+    }
+
+
+def measure(fn, min_calls, max_calls, budget):
+    """
+    Time repeated calls of fn, then trace one call for peak memory
+
+    Returns:
+        dict: Latency percentiles (ms), throughput (calls/s) and peak memory (KiB)
+    """
+    fn()  # Warm-up
+
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < max_calls and (len(durations) < min_calls or time.perf_counter() - started < budget):
+        call_started = time.perf_counter_ns()
+        fn()
+        durations.append(time.perf_counter_ns() - call_started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations_ms = np.array(durations) / 1e6
+    return {
+        'calls': len(durations),
+        'p50_ms': round(float(np.percentile(durations_ms, 50)), 4),
+        'p99_ms': round(float(np.percentile(durations_ms, 99)), 4),
+        'mean_ms': round(float(durations_ms.mean()), 4),
+        'throughput_per_s': round(1000 / float(durations_ms.mean()), 2),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def run(sizes, methods, min_calls, max_calls, budget, seed):
+    engine = AIEngine()
+    results = {}
+    for size in sizes:
+        n_attempts, n_lessons = SIZES[size]
+        print(f"\n📦 {size}: {n_attempts} attempts, {n_lessons} lessons")
+        cases = build_cases(size, engine, seed)
+        for method in methods:
+            result = measure(cases[method], min_calls, max_calls, budget)
+            result.update({'attempts': n_attempts, 'lessons': n_lessons})
+            results[f'{method}/{size}'] = result
+            print(f"   {method:<30} p50 {result['p50_ms']:>10.3f} ms   p99 {result['p99_ms']:>10.3f} ms   "
+                  f"{result['throughput_per_s']:>10.1f}/s   peak {result['peak_kib']:>10.1f} KiB")
+    return results
+
+
+def environment():
+    """Where the numbers came from; baselines only compare on the same machine"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    Print the change against a baseline run
+
+    Returns:
+        list: Case names that regressed by more than threshold
+    """
+    regressions = []
+    print(f"\n📊 Compared with baseline from {baseline['environment'].get('created_at')} "
+          f"(commit {baseline['environment'].get('commit')})")
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"   ➕ {name}: not in baseline")
+            continue
+
+        latency_change = result['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        memory_change = result['peak_kib'] / base['peak_kib'] - 1 if base['peak_kib'] else 0.0
+        # Ignore sub-threshold absolute changes; microsecond cases are mostly timer noise
+        slower = latency_change > threshold and result['p50_ms'] - base['p50_ms'] > min_delta_ms
+        regressed = slower or memory_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"   {'❌' if regressed else '✅'} {name:<45} p50 {latency_change:+8.1%}   peak {memory_change:+8.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AIEngine on synthetic data')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES), help='Size presets to run')
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=METHODS, help='Methods to time')
+    parser.add_argument('--min-calls', type=int, default=5, help='Timed calls per case, at least')
+    parser.add_argument('--max-calls', type=int, default=1000, help='Timed calls per case, at most')
+    parser.add_argument('--budget', type=float, default=2.0, help='Seconds spent timing each case past --min-calls')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic data')
+    parser.add_argument('--save', help='Write results to this JSON file (e.g. a new baseline)')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative p50/peak memory growth counted as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='Absolute p50 growth below which a case never counts as slower')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  AI ENGINE BENCHMARKS")
+    print("="*60)
+
+    results = run(args.sizes, args.methods, args.min_calls, args.max_calls, args.budget, args.seed)
+    report = {'environment': environment(), 'results': results}
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n✅ Saved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
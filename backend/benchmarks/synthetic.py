@@ -0,0 +1,122 @@
+"""
+Synthetic catalogs and student histories for the AIEngine benchmarks
+Shapes match what the routes pass to the engine (Lesson.to_dict(),
+attempt dicts, SkillMastery state); every generator is seeded so runs are
+comparable.
+"""
+import random
+from datetime import datetime, timedelta
+
+SUBJECTS = [
+    'Programming', 'Mathematics', 'Physics', 'Chemistry', 'Biology', 'Data Structures',
+    'Algorithms', 'Databases', 'Networking', 'Operating Systems', 'Statistics', 'Machine Learning'
+]
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+WORDS = [
+    'introduction', 'advanced', 'basics', 'applied', 'theory', 'practice', 'linear', 'graphs',
+    'functions', 'systems', 'analysis', 'design', 'patterns', 'models', 'methods', 'review'
+]
+
+
+def make_catalog(n_lessons, seed=0):
+    """
+    Published lessons with subjects, difficulties and acyclic prerequisites
+
+    Returns:
+        list: Lesson dictionaries shaped like Lesson.to_dict(include_content=False)
+    """
+    rng = random.Random(seed)
+    created_at = datetime(2024, 1, 1).isoformat()
+    lessons = []
+    for lesson_id in range(1, n_lessons + 1):
+        subject = rng.choice(SUBJECTS)
+        # Prerequisites only point at earlier lessons, so the graph stays acyclic
+        prerequisites = rng.sample(range(1, lesson_id), min(rng.randint(0, 2), lesson_id - 1))
+        lessons.append({
+            'id': lesson_id,
+            'title': f"{subject} {' '.join(rng.sample(WORDS, 2)).title()} {lesson_id}",
+            'subject': subject,
+            'difficulty': rng.choice(DIFFICULTIES),
+            'duration_minutes': rng.choice([15, 30, 45, 60]),
+            'prerequisites': prerequisites,
+            'tags': rng.sample(WORDS, 3),
+            'is_published': True,
+            'views_count': rng.randint(0, 5000),
+            'created_by': 1,
+            'created_at': created_at,
+            'updated_at': created_at,
+            'quiz_count': rng.randint(1, 10)
+        })
+    return lessons
+
+
+def make_attempts(n_attempts, seed=0, skill=0.65):
+    """
+    One student's attempts, oldest first
+
+    Returns:
+        list: Attempt dictionaries with topic, difficulty, score (0-100) and correctness
+    """
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1)
+    attempts = []
+    for i in range(n_attempts):
+        topic = rng.choice(SUBJECTS)
+        is_correct = rng.random() < skill
+        attempts.append({
+            'quiz_id': rng.randint(1, 10000),
+            'is_correct': is_correct,
+            'score': 100 if is_correct else 0,
+            'timestamp': (started + timedelta(minutes=i)).isoformat(),
+            'difficulty': rng.choice(DIFFICULTIES),
+            'topic': topic,
+            'lesson_id': rng.randint(1, 1000)
+        })
+    return attempts
+
+
+def make_mastery(attempts, engine):
+    """Stored BKT state for the attempts, as knowledge_state.load_mastery returns it"""
+    mastery = {}
+    for attempt in attempts:
+        topic = attempt['topic']
+        state = mastery.setdefault(topic, {'p_mastery': engine.initial_mastery(topic), 'attempts': 0, 'correct': 0})
+        state['p_mastery'] = engine.update_mastery(state['p_mastery'], attempt['is_correct'], topic)
+        state['attempts'] += 1
+        state['correct'] += 1 if attempt['is_correct'] else 0
+    return mastery
+
+
+def make_student(n_attempts, catalog, engine, seed=0):
+    """
+    Student data in the shape the ML routes build for AIEngine
+
+    Returns:
+        dict: profile, attempts, completed_lessons and mastery
+    """
+    rng = random.Random(seed)
+    attempts = make_attempts(n_attempts, seed)
+    completed = rng.sample([lesson['id'] for lesson in catalog], len(catalog) // 5)
+    correct = sum(1 for a in attempts if a['is_correct'])
+    return {
+        'profile': {
+            'total_quizzes_taken': n_attempts,
+            'average_score': correct / n_attempts * 100 if n_attempts else 0
+        },
+        'attempts': attempts,
+        'completed_lessons': completed,
+        'mastery': make_mastery(attempts, engine)
+    }
+
+
+def make_quiz(catalog, seed=0):
+    """A quiz dictionary for predict_success_probability"""
+    rng = random.Random(seed)
+    lesson = rng.choice(catalog)
+    return {
+        'id': 1,
+        'lesson_id': lesson['id'],
+        'topic': lesson['subject'],
+        'difficulty': rng.choice(DIFFICULTIES),
+        'points': 10
+    }
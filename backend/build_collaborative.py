@@ -0,0 +1,59 @@
+"""
+Build the item-item collaborative filtering model and publish it
+Workers only ever map the published arrays from the model registry; the
+matrices are never built inside a request, and lesson neighbor lists only
+change when this runs, so run it on a schedule (a build over 200k
+interactions takes about a second):
+
+    python build_collaborative.py
+"""
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def build(keep_versions):
+    from app import create_app
+    from ml_engine.catalog import lesson_catalog
+    from ml_engine.collaborative import collaborative_model, load_interactions
+    from ml_engine.registry import ModelRegistry
+
+    app = create_app()
+    with app.app_context():
+        catalog = lesson_catalog.refresh()
+        user_ids, lesson_ids, weights = load_interactions()
+        print(f"   Loaded {len(weights)} interactions over {len(catalog.lessons_by_id)} lessons")
+
+        collaborative_model.build(sorted(catalog.lessons_by_id), user_ids, lesson_ids, weights)
+        arrays, params = collaborative_model.export()
+
+        registry = ModelRegistry(app.config['ML_MODEL_DIR'])
+        version = registry.publish(arrays=arrays, params=params)
+        registry.prune(keep_versions)
+        return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and publish the collaborative filtering model')
+    parser.add_argument('--keep-versions', type=int, default=3, help='Model registry versions to keep')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  BUILD COLLABORATIVE FILTERING MODEL")
+    print("="*60)
+
+    try:
+        version = build(args.keep_versions)
+    except Exception as e:
+        print(f"\n❌ Build failed: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n✅ Published model version {version}")
+    print("   Running workers pick it up within ML_MODEL_CHECK_INTERVAL seconds")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Calibrate Item Response Theory parameters from the attempts table
+Fits quiz difficulty/discrimination and student ability and stores them in
+the item_calibrations and student_abilities tables, where
+/api/ml/predict-success reads them as a logistic lookup.
+
+    python calibrate_irt.py                 # 2PL on the most recent responses
+    python calibrate_irt.py --model 1pl     # Rasch model
+"""
+import sys
+import argparse
+from array import array
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def load_responses(max_responses, chunk_size):
+    """
+    Stream the most recent responses into compact columns
+
+    Returns:
+        tuple: (user IDs, quiz IDs, correctness) as NumPy arrays
+    """
+    import numpy as np
+    from database import db
+    from models.quiz import Attempt
+
+    user_ids, quiz_ids, correct = array('q'), array('q'), array('b')
+    query = db.session.query(Attempt.user_id, Attempt.quiz_id, Attempt.is_correct)\
+        .order_by(Attempt.id.desc())
+    if max_responses:
+        query = query.limit(max_responses)
+
+    for user_id, quiz_id, is_correct in query.yield_per(chunk_size):
+        user_ids.append(user_id)
+        quiz_ids.append(quiz_id)
+        correct.append(1 if is_correct else 0)
+
+    return (
+        np.frombuffer(user_ids, dtype=np.int64),
+        np.frombuffer(quiz_ids, dtype=np.int64),
+        np.frombuffer(correct, dtype=np.int8)
+    )
+
+
+def calibrate(model, max_responses, chunk_size):
+    import numpy as np
+    from app import create_app
+    from database import db
+    from models.user import StudentAbility
+    from models.quiz import ItemCalibration
+    from ml_engine.irt import fit_irt
+
+    app = create_app()
+    with app.app_context():
+        user_ids, quiz_ids, correct = load_responses(max_responses, chunk_size)
+        if len(correct) == 0:
+            raise ValueError('No attempts to calibrate from')
+        print(f"   Loaded {len(correct)} responses")
+
+        students, student_index = np.unique(user_ids, return_inverse=True)
+        quizzes, quiz_index = np.unique(quiz_ids, return_inverse=True)
+        fit = fit_irt(student_index, quiz_index, correct, len(students), len(quizzes), model=model)
+        print(f"   Converged in {fit['iterations']} iterations (log-likelihood {fit['log_likelihood']:.1f})")
+
+        calibrated_at = datetime.utcnow()
+        student_counts = np.bincount(student_index, minlength=len(students))
+        quiz_counts = np.bincount(quiz_index, minlength=len(quizzes))
+
+        try:
+            # Replace the previous calibration in one transaction
+            ItemCalibration.query.delete()
+            StudentAbility.query.delete()
+            db.session.bulk_insert_mappings(ItemCalibration, [
+                {
+                    'quiz_id': int(quiz_id),
+                    'difficulty': float(fit['difficulty'][i]),
+                    'discrimination': float(fit['discrimination'][i]),
+                    'responses_count': int(quiz_counts[i]),
+                    'calibrated_at': calibrated_at
+                }
+                for i, quiz_id in enumerate(quizzes)
+            ])
+            db.session.bulk_insert_mappings(StudentAbility, [
+                {
+                    'user_id': int(user_id),
+                    'theta': float(fit['theta'][i]),
+                    'responses_count': int(student_counts[i]),
+                    'calibrated_at': calibrated_at
+                }
+                for i, user_id in enumerate(students)
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return len(quizzes), len(students)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate IRT item and student parameters')
+    parser.add_argument('--model', choices=['1pl', '2pl'], default='2pl', help='IRT model to fit')
+    parser.add_argument('--max-responses', type=int, default=2000000,
+                        help='Use at most this many of the most recent attempts (0 = all)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per database round trip')
+    args = parser.parse_args()
+
+    print("="*60)
+    print(f"  CALIBRATE IRT ({args.model.upper()})")
+    print("="*60)
+
+    try:
+        n_quizzes, n_students = calibrate(args.model, args.max_responses, args.chunk_size)
+    except Exception as e:
+        print(f"\n❌ Calibration failed: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n✅ Calibrated {n_quizzes} quizzes and {n_students} students")
+
+
+if __name__ == '__main__':
+    main()
@@ -66,7 +66,19 @@ class Config:
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
     
     # ML Model Configuration
-    ML_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'ml_engine', 'model.pkl')
+    ML_MODEL_DIR = os.environ.get('ML_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'instance', 'models'))
+    ML_MODEL_CHECK_INTERVAL = int(os.environ.get('ML_MODEL_CHECK_INTERVAL', 10))  # Seconds between version checks
+    RECOMMENDATION_CACHE_SIZE = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000))  # Students per worker
+    RECOMMENDATION_CACHE_TTL = int(os.environ.get('RECOMMENDATION_CACHE_TTL', 300))  # Seconds
+    RECOMMENDATION_PRECOMPUTE_MAX_AGE = timedelta(hours=int(os.environ.get('RECOMMENDATION_PRECOMPUTE_MAX_AGE_HOURS', 24)))
+    RECOMMENDATION_SCORING_SPEC = os.environ.get('RECOMMENDATION_SCORING_SPEC', os.path.join(os.path.dirname(__file__), 'instance', 'recommendation_scoring.json'))  # Reloaded when it changes
+    COLLABORATIVE_NEIGHBORS = int(os.environ.get('COLLABORATIVE_NEIGHBORS', 20))  # Neighbors kept per lesson
+    REVIEW_QUEUE_SIZE = int(os.environ.get('REVIEW_QUEUE_SIZE', 10000))  # Students' review heaps per worker
+    REVIEW_QUEUE_TTL = int(os.environ.get('REVIEW_QUEUE_TTL', 300))  # Seconds before a heap is reloaded
+    SYNC_CHUNK_SIZE = int(os.environ.get('SYNC_CHUNK_SIZE', 200))  # NDJSON attempts committed per chunk
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for /metrics; without it only loopback clients are served
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')  # Directory shared by all workers (POSIX only); empty keeps metrics per worker
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 5))  # Seconds between worker snapshots
     
     # Celery Configuration (Optional)
     CELERY_BROKER_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
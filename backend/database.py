@@ -9,9 +9,9 @@ def init_db(app):
     
     with app.app_context():
         # Import all models here to ensure they're registered
-        from models.user import User, StudentProfile
-        from models.lesson import Lesson
-        from models.quiz import Quiz, Attempt
+        from models.user import User, StudentProfile, SkillMastery, StudentAbility, StudentFeatures
+        from models.lesson import Lesson, LessonProgress, StudentRecommendation
+        from models.quiz import Quiz, Attempt, ItemCalibration, ReviewItem, QuizSession
         
         try:
             # Create all tables
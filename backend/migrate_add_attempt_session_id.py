@@ -0,0 +1,133 @@
+"""
+Database migration script to link attempts to their quiz session and
+backfill session totals
+
+Attempts now carry session_id and sessions keep running totals, so
+completing a session no longer re-reads the student's attempt history.
+Existing attempts are assigned to the latest session of the same student
+and lesson that was running when they were made; open sessions then get
+their totals from one GROUP BY over the linked attempts.
+
+PRODUCTION USAGE (on Render):
+1. Deploy the code that adds Attempt.session_id
+2. Run: python migrate_add_attempt_session_id.py
+"""
+import os
+import sys
+from bisect import bisect_right
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+
+def migrate_add_attempt_session_id():
+    """Add session_id to attempts, index it and backfill the links"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from sqlalchemy import inspect
+            from models.quiz import Quiz, Attempt, QuizSession
+
+            db_type = db.engine.dialect.name
+            print(f"Database type: {db_type}")
+
+            columns = [col['name'] for col in inspect(db.engine).get_columns('attempts')]
+            if 'session_id' in columns:
+                print("✓ session_id column already exists")
+            else:
+                print("Adding session_id column to attempts table...")
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "ALTER TABLE attempts ADD COLUMN session_id INTEGER REFERENCES quiz_sessions (id)"
+                    ))
+                print("✓ Added session_id column")
+
+            print("Creating indexes...")
+            with db.engine.begin() as conn:
+                conn.execute(db.text(
+                    "CREATE INDEX IF NOT EXISTS ix_attempts_session_id ON attempts (session_id)"
+                ))
+                conn.execute(db.text(
+                    "CREATE INDEX IF NOT EXISTS ix_quiz_sessions_user_lesson "
+                    "ON quiz_sessions (user_id, lesson_id)"
+                ))
+            print("✓ Indexes ready")
+
+            print("Linking existing attempts to sessions...")
+
+            # (user, lesson) -> sessions ordered by start time
+            sessions = {}
+            for session_id, user_id, lesson_id, started_at, completed_at in db.session.query(
+                QuizSession.id, QuizSession.user_id, QuizSession.lesson_id,
+                QuizSession.started_at, QuizSession.completed_at
+            ).order_by(QuizSession.started_at):
+                sessions.setdefault((user_id, lesson_id), []).append((started_at, completed_at, session_id))
+            starts = {key: [s[0] for s in rows] for key, rows in sessions.items()}
+
+            links = []
+            unlinked = db.session.query(
+                Attempt.id, Attempt.user_id, Quiz.lesson_id, Attempt.timestamp
+            ).join(Quiz, Attempt.quiz_id == Quiz.id).filter(Attempt.session_id.is_(None))
+            for attempt_id, user_id, lesson_id, timestamp in unlinked.yield_per(5000):
+                key = (user_id, lesson_id)
+                if key not in sessions or timestamp is None:
+                    continue
+                # Latest session started before the attempt and still running then
+                index = bisect_right(starts[key], timestamp) - 1
+                if index < 0:
+                    continue
+                started_at, completed_at, session_id = sessions[key][index]
+                if completed_at is None or timestamp <= completed_at:
+                    links.append({'id': attempt_id, 'session_id': session_id})
+
+            for start in range(0, len(links), 1000):
+                db.session.execute(db.update(Attempt), links[start:start + 1000])
+            print(f"✓ Linked {len(links)} attempts")
+
+            # Completed sessions keep their stored results; open ones get
+            # totals matching their linked attempts
+            totals = db.session.query(
+                Attempt.session_id,
+                db.func.count(Attempt.id),
+                db.func.sum(db.case((Attempt.is_correct, 1), else_=0)),
+                db.func.sum(Attempt.score),
+                db.func.sum(db.func.coalesce(Attempt.time_taken_seconds, 0))
+            ).join(QuizSession, Attempt.session_id == QuizSession.id).filter(
+                QuizSession.completed_at.is_(None)
+            ).group_by(Attempt.session_id).all()
+
+            for session_id, _, correct, score, time_taken in totals:
+                db.session.execute(
+                    db.update(QuizSession).where(QuizSession.id == session_id).values(
+                        correct_answers=correct or 0,
+                        total_score=score or 0,
+                        time_taken_seconds=time_taken or 0
+                    )
+                )
+            db.session.commit()
+
+            print(f"✓ Recomputed totals for {len(totals)} open sessions")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Link attempts to quiz sessions")
+    print("="*60)
+    success = migrate_add_attempt_session_id()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
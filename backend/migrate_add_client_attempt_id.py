@@ -0,0 +1,68 @@
+"""
+Database migration script to add the client_attempt_id idempotency key to
+attempts, unique per student
+
+Offline sync inserts attempts with ON CONFLICT DO NOTHING on
+(user_id, client_attempt_id), so retried batches are stored once. Existing
+rows keep a NULL key; NULLs never conflict with each other.
+
+    python migrate_add_client_attempt_id.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+def migrate_add_client_attempt_id():
+    """Add client_attempt_id to attempts and its unique index"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from sqlalchemy import inspect
+
+            db_type = db.engine.dialect.name
+            print(f"Database type: {db_type}")
+
+            columns = [col['name'] for col in inspect(db.engine).get_columns('attempts')]
+            if 'client_attempt_id' in columns:
+                print("✓ client_attempt_id column already exists")
+            else:
+                print("Adding client_attempt_id column to attempts table...")
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "ALTER TABLE attempts ADD COLUMN client_attempt_id VARCHAR(64)"
+                    ))
+                print("✓ Added client_attempt_id column")
+
+            print("Creating unique index on (user_id, client_attempt_id)...")
+            with db.engine.begin() as conn:
+                conn.execute(db.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS _user_client_attempt_uc "
+                    "ON attempts (user_id, client_attempt_id)"
+                ))
+            print("✓ Unique index ready")
+
+            return True
+
+        except Exception as e:
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Add client_attempt_id to attempts")
+    print("="*60)
+    success = migrate_add_client_attempt_id()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
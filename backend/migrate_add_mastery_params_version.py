@@ -0,0 +1,61 @@
+"""
+Database migration script to add params_version to skill_mastery
+
+Each stored BKT posterior now records the version of the fitted
+parameters it was computed under. Existing rows get NULL (computed under
+the default parameters), so topics with fitted parameters report their
+accuracy until train_bkt.py replays them under the new parameters.
+
+    python migrate_add_mastery_params_version.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+def migrate_add_mastery_params_version():
+    """Add params_version to skill_mastery"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from sqlalchemy import inspect
+
+            db_type = db.engine.dialect.name
+            print(f"Database type: {db_type}")
+
+            columns = [col['name'] for col in inspect(db.engine).get_columns('skill_mastery')]
+            if 'params_version' in columns:
+                print("✓ params_version column already exists")
+            else:
+                print("Adding params_version column to skill_mastery table...")
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        "ALTER TABLE skill_mastery ADD COLUMN params_version VARCHAR(32)"
+                    ))
+                print("✓ Added params_version column")
+                print("  Run train_bkt.py to replay stored posteriors under fitted parameters")
+
+            return True
+
+        except Exception as e:
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Add params_version to skill_mastery")
+    print("="*60)
+    success = migrate_add_mastery_params_version()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,71 @@
+"""
+Database migration script to add the option_feedback column to quizzes
+and precompile feedback for existing quizzes
+
+Quizzes created or edited after this deploy are compiled by the quiz
+routes; this backfills the rest so grading never generates feedback text.
+
+    python migrate_add_option_feedback.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+def migrate_add_option_feedback():
+    """Add option_feedback to quizzes and compile it for every quiz"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from sqlalchemy import inspect
+            from models.quiz import Quiz
+            from ml_engine import events
+
+            db_type = db.engine.dialect.name
+            print(f"Database type: {db_type}")
+
+            columns = [col['name'] for col in inspect(db.engine).get_columns('quizzes')]
+            if 'option_feedback' in columns:
+                print("✓ option_feedback column already exists")
+            else:
+                print("Adding option_feedback column to quizzes table...")
+                column_type = 'TEXT' if db_type == 'sqlite' else 'JSON'
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        f"ALTER TABLE quizzes ADD COLUMN option_feedback {column_type}"
+                    ))
+                print("✓ Added option_feedback column")
+
+            print("Compiling feedback for existing quizzes...")
+            compiled = 0
+            for quiz in Quiz.query.filter(Quiz.option_feedback.is_(None)).yield_per(500):
+                events.quiz_saved(quiz)
+                compiled += 1
+            db.session.commit()
+
+            print(f"✓ Compiled feedback for {compiled} quizzes")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Add option_feedback to quizzes")
+    print("="*60)
+    success = migrate_add_option_feedback()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
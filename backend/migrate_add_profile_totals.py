@@ -0,0 +1,91 @@
+"""
+Database migration script to add running score totals to student_profiles
+and backfill them from the attempt history
+
+Quiz submissions now add to total_points_earned, total_points_possible and
+total_quizzes_taken in place and derive average_score from them, instead
+of rescanning every attempt and assuming 10 points per quiz.
+
+PRODUCTION USAGE (on Render):
+1. Deploy the code that adds the columns to StudentProfile
+2. Run: python migrate_add_profile_totals.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+
+def migrate_add_profile_totals():
+    """Add the total columns and recompute every profile's totals"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from sqlalchemy import inspect
+            from models.user import StudentProfile
+            from models.quiz import Quiz, Attempt
+
+            db_type = db.engine.dialect.name
+            print(f"Database type: {db_type}")
+
+            columns = [col['name'] for col in inspect(db.engine).get_columns('student_profiles')]
+            for column in ('total_points_earned', 'total_points_possible'):
+                if column in columns:
+                    print(f"✓ {column} column already exists")
+                    continue
+                print(f"Adding {column} column to student_profiles table...")
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        f"ALTER TABLE student_profiles ADD COLUMN {column} INTEGER DEFAULT 0"
+                    ))
+                print(f"✓ Added {column} column")
+
+            print("Recomputing totals from the attempt history...")
+
+            totals = {
+                user_id: (count, earned or 0, possible or 0)
+                for user_id, count, earned, possible in db.session.query(
+                    Attempt.user_id,
+                    db.func.count(Attempt.id),
+                    db.func.sum(Attempt.score),
+                    db.func.sum(Quiz.points)
+                ).join(Quiz, Attempt.quiz_id == Quiz.id)
+                    .group_by(Attempt.user_id)
+            }
+
+            updated = 0
+            for profile in StudentProfile.query.yield_per(1000):
+                count, earned, possible = totals.get(profile.user_id, (0, 0, 0))
+                profile.total_quizzes_taken = count
+                profile.total_points_earned = earned
+                profile.total_points_possible = possible
+                profile.average_score = earned * 100.0 / possible if possible > 0 else 0.0
+                updated += 1
+            db.session.commit()
+
+            print(f"✓ Backfilled totals for {updated} student profiles")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Add running totals to student_profiles")
+    print("="*60)
+    success = migrate_add_profile_totals()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,86 @@
+"""
+Database migration script to create and backfill the review_items table
+Replays every existing attempt through the SM-2 scheduler once so
+/api/ml/review/due can read stored due times instead of rescanning attempts
+
+PRODUCTION USAGE (on Render):
+1. Deploy the code that adds the ReviewItem model
+2. Run: python migrate_backfill_review_items.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+
+def migrate_backfill_review_items():
+    """Build review_items rows from the full attempt history"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from types import SimpleNamespace
+            from models.quiz import Attempt, ReviewItem
+            from ml_engine.review import apply_review, INITIAL_EASINESS
+
+            # create_all only adds missing tables
+            db.create_all()
+
+            if ReviewItem.query.first():
+                print("✓ review_items already contains data, nothing to backfill")
+                return True
+
+            print("Replaying attempts through SM-2...")
+
+            # Stream attempts in chronological order per student and quiz
+            rows = db.session.query(
+                Attempt.user_id,
+                Attempt.quiz_id,
+                Attempt.is_correct,
+                Attempt.timestamp
+            ).order_by(Attempt.user_id, Attempt.quiz_id, Attempt.timestamp, Attempt.id)\
+                .yield_per(5000)
+
+            items = []
+            current = None
+            for user_id, quiz_id, is_correct, timestamp in rows:
+                if current is None or (current.user_id, current.quiz_id) != (user_id, quiz_id):
+                    current = SimpleNamespace(
+                        user_id=user_id,
+                        quiz_id=quiz_id,
+                        easiness=INITIAL_EASINESS,
+                        interval_days=0.0,
+                        repetitions=0,
+                        lapses=0
+                    )
+                    items.append(current)
+                apply_review(current, is_correct, timestamp)
+
+            db.session.bulk_insert_mappings(ReviewItem, [vars(item) for item in items])
+            db.session.commit()
+
+            print(f"✓ Backfilled {len(items)} review_items rows")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Backfill review_items")
+    print("="*60)
+    success = migrate_backfill_review_items()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+"""
+Database migration script to create and backfill the skill_mastery table
+Replays every existing attempt through Bayesian Knowledge Tracing once so
+the ML endpoints can read stored mastery instead of rescanning attempts
+
+PRODUCTION USAGE (on Render):
+1. Deploy the code that adds the SkillMastery model
+2. Run: python migrate_backfill_skill_mastery.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+
+def migrate_backfill_skill_mastery():
+    """Build skill_mastery rows from the full attempt history"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from models.user import SkillMastery
+            from models.lesson import Lesson
+            from models.quiz import Quiz, Attempt
+            from ml_engine.recommend import ai_engine
+
+            # create_all only adds missing tables
+            db.create_all()
+
+            if SkillMastery.query.first():
+                print("✓ skill_mastery already contains data, nothing to backfill")
+                return True
+
+            print("Replaying attempts through BKT...")
+
+            # Stream attempts in chronological order per student and topic
+            rows = db.session.query(
+                Attempt.user_id,
+                Lesson.subject,
+                Attempt.is_correct
+            ).join(Quiz, Attempt.quiz_id == Quiz.id)\
+                .join(Lesson, Quiz.lesson_id == Lesson.id)\
+                .order_by(Attempt.user_id, Attempt.timestamp, Attempt.id)\
+                .yield_per(5000)
+
+            states = {}
+            for user_id, subject, is_correct in rows:
+                topic = subject or 'general'
+                key = (user_id, topic)
+                p_mastery, attempts, correct = states.get(key, (ai_engine.initial_mastery(topic), 0, 0))
+                states[key] = (
+                    ai_engine.update_mastery(p_mastery, is_correct, topic),
+                    attempts + 1,
+                    correct + (1 if is_correct else 0)
+                )
+
+            db.session.bulk_insert_mappings(SkillMastery, [
+                {
+                    'user_id': user_id,
+                    'topic': topic,
+                    'p_mastery': p_mastery,
+                    'attempts_count': attempts,
+                    'correct_count': correct
+                }
+                for (user_id, topic), (p_mastery, attempts, correct) in states.items()
+            ])
+            db.session.commit()
+
+            print(f"✓ Backfilled {len(states)} skill_mastery rows")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Backfill skill_mastery")
+    print("="*60)
+    success = migrate_backfill_skill_mastery()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
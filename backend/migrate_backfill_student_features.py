@@ -0,0 +1,107 @@
+"""
+Database migration script to create and backfill the student_features table
+Replays every existing attempt and counts completed lessons once so the ML
+routes can read running aggregates instead of re-querying attempts
+
+PRODUCTION USAGE (on Render):
+1. Deploy the code that adds the StudentFeatures model
+2. Run: python migrate_backfill_student_features.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import create_app
+from database import db
+
+
+def migrate_backfill_student_features():
+    """Build student_features rows from the full attempt and progress history"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            from types import SimpleNamespace
+            from models.user import StudentFeatures
+            from models.lesson import Lesson, LessonProgress
+            from models.quiz import Quiz, Attempt
+            from ml_engine.features import apply_attempt
+
+            # create_all only adds missing tables
+            db.create_all()
+
+            if StudentFeatures.query.first():
+                print("✓ student_features already contains data, nothing to backfill")
+                return True
+
+            def empty_features(user_id):
+                return SimpleNamespace(
+                    user_id=user_id,
+                    attempts_count=0,
+                    correct_count=0,
+                    score_sum=0,
+                    points_possible=0,
+                    topic_stats={},
+                    recent_results=[],
+                    recent_head=0,
+                    lessons_completed=0,
+                    last_attempt_at=None
+                )
+
+            print("Replaying attempts into running aggregates...")
+
+            # Stream attempts in chronological order per student
+            rows = db.session.query(
+                Attempt.user_id,
+                Lesson.subject,
+                Attempt.is_correct,
+                Attempt.score,
+                Quiz.points,
+                Attempt.timestamp
+            ).join(Quiz, Attempt.quiz_id == Quiz.id)\
+                .join(Lesson, Quiz.lesson_id == Lesson.id)\
+                .order_by(Attempt.user_id, Attempt.timestamp, Attempt.id)\
+                .yield_per(5000)
+
+            students = {}
+            for user_id, subject, is_correct, score, points, timestamp in rows:
+                features = students.get(user_id)
+                if features is None:
+                    features = students[user_id] = empty_features(user_id)
+                apply_attempt(features, subject or 'general', is_correct, score or 0, points or 0, timestamp)
+
+            completed = db.session.query(LessonProgress.user_id, db.func.count(LessonProgress.id))\
+                .filter(LessonProgress.status == 'completed')\
+                .group_by(LessonProgress.user_id)
+            for user_id, count in completed:
+                features = students.get(user_id)
+                if features is None:
+                    features = students[user_id] = empty_features(user_id)
+                features.lessons_completed = count
+
+            db.session.bulk_insert_mappings(StudentFeatures, [vars(features) for features in students.values()])
+            db.session.commit()
+
+            print(f"✓ Backfilled {len(students)} student_features rows")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Migration failed: {str(e)}")
+            print(f"Error type: {type(e).__name__}")
+            return False
+
+if __name__ == '__main__':
+    print("="*60)
+    print("Database Migration: Backfill student_features")
+    print("="*60)
+    success = migrate_backfill_student_features()
+    print("="*60)
+    if success:
+        print("Migration completed successfully!")
+    else:
+        print("Migration failed. Please check the error above.")
+    print("="*60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,163 @@
+"""
+Expectation-maximization fitting of Bayesian Knowledge Tracing parameters
+All sequences of a topic are processed together: they are sorted by length
+and laid out time-major, so the sequences still running at step t are a
+prefix and each forward/backward step is one NumPy operation over them
+"""
+import numpy as np
+
+# Guess/slip above 0.5 make "knowing" the skill predict worse answers;
+# cap them like standard BKT fitting does to avoid that degenerate optimum
+MAX_GUESS = 0.45
+MAX_SLIP = 0.45
+EPSILON = 1e-6
+
+
+class SequenceBatch:
+    """Correctness sequences of one topic in time-major layout"""
+
+    def __init__(self, observations, lengths):
+        """
+        Args:
+            observations: Flat 0/1 array, sequences concatenated in order
+            lengths: Length of each sequence
+        """
+        observations = np.asarray(observations, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        lengths = lengths[lengths > 0]
+
+        order = np.argsort(-lengths, kind='stable')
+        sorted_lengths = lengths[order]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[order]
+
+        # active[t] = number of sequences with more than t observations
+        self.max_length = int(sorted_lengths[0]) if len(sorted_lengths) else 0
+        steps = np.arange(self.max_length)
+        self.active = np.searchsorted(-sorted_lengths, -steps, side='left')
+        self.offsets = np.concatenate(([0], np.cumsum(self.active)))
+
+        # Gather observations so step t occupies offsets[t]:offsets[t + 1]
+        sequence = np.repeat(np.arange(len(sorted_lengths)), sorted_lengths)
+        step = np.arange(len(sequence)) - np.repeat(np.cumsum(sorted_lengths) - sorted_lengths, sorted_lengths)
+        source = starts[sequence] + step
+        self.observations = np.empty(len(sequence))
+        self.observations[self.offsets[step] + sequence] = observations[source]
+
+        self.n_sequences = len(sorted_lengths)
+        self.n_observations = len(sequence)
+
+        # Observations followed by another step of the same sequence
+        self.not_last = np.ones(self.n_observations, dtype=bool)
+        self.not_last[self.offsets[sorted_lengths - 1] + np.arange(self.n_sequences)] = False
+
+    def step(self, t):
+        return slice(self.offsets[t], self.offsets[t + 1])
+
+
+def _expectation(batch, p_init, p_learn, p_guess, p_slip):
+    """
+    Forward-backward pass; returns sufficient statistics and log-likelihood
+    """
+    obs = batch.observations
+    # Emission probabilities for the unknown and known states
+    emit_unknown = np.where(obs == 1, p_guess, 1 - p_guess)
+    emit_known = np.where(obs == 1, 1 - p_slip, p_slip)
+
+    known = np.empty(batch.n_observations)   # Filtered P(known | o_1..t)
+    scale = np.empty(batch.n_observations)   # P(o_t | o_1..t-1)
+
+    # Forward
+    prior_known = np.full(batch.active[0], p_init)
+    for t in range(batch.max_length):
+        s = batch.step(t)
+        n = batch.active[t]
+        prior_known = prior_known[:n]
+        joint_known = prior_known * emit_known[s]
+        joint_unknown = (1 - prior_known) * emit_unknown[s]
+        scale[s] = joint_known + joint_unknown
+        known[s] = joint_known / scale[s]
+        prior_known = known[s] + (1 - known[s]) * p_learn
+
+    # Backward (scaled so beta stays comparable across steps)
+    beta_known = np.ones(batch.n_observations)
+    beta_unknown = np.ones(batch.n_observations)
+    learn_events = 0.0
+    for t in range(batch.max_length - 2, -1, -1):
+        s = batch.step(t)
+        nxt = batch.step(t + 1)
+        n = batch.active[t + 1]
+        here = slice(s.start, s.start + n)  # Sequences that continue to t + 1
+
+        weighted_known = emit_known[nxt] * beta_known[nxt] / scale[nxt]
+        weighted_unknown = emit_unknown[nxt] * beta_unknown[nxt] / scale[nxt]
+        beta_known[here] = weighted_known
+        beta_unknown[here] = (1 - p_learn) * weighted_unknown + p_learn * weighted_known
+
+        # Expected unknown -> known transitions between t and t + 1
+        learn_events += np.sum((1 - known[here]) * p_learn * weighted_known)
+
+    gamma_known = known * beta_known
+    gamma_unknown = (1 - known) * beta_unknown
+    total = gamma_known + gamma_unknown
+    gamma_known /= total
+    gamma_unknown /= total
+
+    stats = {
+        'initial_known': gamma_known[batch.step(0)].sum(),
+        'learn_events': learn_events,
+        'learn_opportunities': gamma_unknown[batch.not_last].sum(),
+        'guess_correct': (gamma_unknown * obs).sum(),
+        'unknown_total': gamma_unknown.sum(),
+        'slip_wrong': (gamma_known * (1 - obs)).sum(),
+        'known_total': gamma_known.sum()
+    }
+    return stats, np.log(scale).sum()
+
+
+def fit_bkt(observations, lengths, p_init=0.2, p_learn=0.3, p_guess=0.25, p_slip=0.1,
+            max_iter=100, tol=1e-4):
+    """
+    Fit BKT parameters for one topic with Baum-Welch EM
+
+    Args:
+        observations: Flat 0/1 correctness array, student sequences concatenated
+        lengths: Number of attempts in each student sequence
+        p_init, p_learn, p_guess, p_slip: Starting parameters
+        max_iter: Maximum EM iterations
+        tol: Stop when the log-likelihood improves by less than this
+
+    Returns:
+        dict: Fitted parameters plus fit diagnostics
+    """
+    batch = SequenceBatch(observations, lengths)
+    if batch.n_observations == 0:
+        raise ValueError('Cannot fit BKT without observations')
+
+    log_likelihood = -np.inf
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        stats, new_log_likelihood = _expectation(batch, p_init, p_learn, p_guess, p_slip)
+
+        p_init = np.clip(stats['initial_known'] / batch.n_sequences, EPSILON, 1 - EPSILON)
+        if stats['learn_opportunities'] > 0:
+            p_learn = np.clip(stats['learn_events'] / stats['learn_opportunities'], EPSILON, 1 - EPSILON)
+        if stats['unknown_total'] > 0:
+            p_guess = np.clip(stats['guess_correct'] / stats['unknown_total'], EPSILON, MAX_GUESS)
+        if stats['known_total'] > 0:
+            p_slip = np.clip(stats['slip_wrong'] / stats['known_total'], EPSILON, MAX_SLIP)
+
+        improved = new_log_likelihood - log_likelihood
+        log_likelihood = new_log_likelihood
+        if improved < tol:
+            break
+
+    return {
+        'p_init': float(p_init),
+        'p_learn': float(p_learn),
+        'p_guess': float(p_guess),
+        'p_slip': float(p_slip),
+        'log_likelihood': float(log_likelihood),
+        'iterations': iterations,
+        'n_sequences': batch.n_sequences,
+        'n_attempts': batch.n_observations
+    }
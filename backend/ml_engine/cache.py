@@ -0,0 +1,91 @@
+"""
+Per-student recommendation cache with LRU eviction
+Entries are tied to the catalog signature and to the student's state
+version (see ml_engine.features.student_version) they were computed
+against. Every attempt and lesson completion bumps the version in the
+database, so a write handled by any worker misses the cache in all of
+them; write events additionally drop the local entry once they commit.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """Bounded LRU cache of recommendation results keyed by student"""
+
+    def __init__(self, max_entries=10000, max_age=300):
+        self.max_entries = max_entries
+        self.max_age = max_age  # Seconds; bounds memory held by idle entries
+        self._entries = OrderedDict()  # user_id -> (created_at, (catalog_signature, version), {(mode, limit): result})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def configure(self, max_entries=None, max_age=None):
+        """Apply limits from the app config"""
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_age is not None:
+            self.max_age = max_age
+
+    def get(self, user_id, limit, catalog_signature, version, mode='rules'):
+        """Return cached recommendations, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                created_at, key, results = entry
+                if key != (catalog_signature, version) or time.time() - created_at > self.max_age:
+                    del self._entries[user_id]
+                elif (mode, limit) in results:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return results[(mode, limit)]
+            self.misses += 1
+            return None
+
+    def put(self, user_id, limit, catalog_signature, version, recommendations, mode='rules'):
+        """Store recommendations computed against the given catalog signature and student version"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] != (catalog_signature, version):
+                entry = (time.time(), (catalog_signature, version), {})
+                self._entries[user_id] = entry
+            entry[2][(mode, limit)] = recommendations
+            self._entries.move_to_end(user_id)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop a student's cached results after their inputs changed"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for this worker process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions
+            }
+
+
+# Create singleton instance
+recommendation_cache = RecommendationCache()
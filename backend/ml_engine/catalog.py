@@ -0,0 +1,114 @@
+"""
+In-process snapshot of the lesson catalog used by the AI engine
+The snapshot is rebuilt only when a cheap signature query shows that
+lessons or quizzes changed, so every gunicorn worker notices writes made
+by the others without reloading the catalog on each request
+"""
+from database import db
+from models.lesson import Lesson
+from models.quiz import Quiz
+from .prerequisites import PrerequisiteGraph, PrerequisiteCycleError
+from .scoring import LessonScoringMatrix
+from .topic_index import LessonTopicIndex
+
+
+class LessonCatalog:
+    """Lesson dicts and derived indexes, refreshed on catalog changes"""
+
+    def __init__(self):
+        self.signature = None
+        self.lessons = []
+        self.lessons_by_id = {}
+        self.published_lessons = []
+        self.scoring_matrix = LessonScoringMatrix()
+        self.prerequisite_graph = PrerequisiteGraph()
+        self.topic_index = LessonTopicIndex()
+
+    def _current_signature(self):
+        """Aggregate that changes whenever a lesson or quiz is written"""
+        lesson_count, last_update = db.session.query(
+            db.func.count(Lesson.id),
+            db.func.max(Lesson.updated_at)
+        ).one()
+        quiz_count, last_quiz = db.session.query(
+            db.func.count(Quiz.id),
+            db.func.max(Quiz.id)
+        ).one()
+        return (lesson_count, last_update, quiz_count, last_quiz)
+
+    def refresh(self):
+        """Reload the snapshot if the catalog changed since the last build"""
+        signature = self._current_signature()
+        if signature != self.signature:
+            self._rebuild()
+            self.signature = signature
+        return self
+
+    def invalidate(self):
+        """Force a rebuild on the next refresh"""
+        self.signature = None
+
+    def lesson_saved(self, lesson):
+        """
+        Apply a committed lesson create/update without a full rebuild
+
+        The prerequisite graph and topic index are updated incrementally;
+        the scoring matrix is rebuilt from the in-memory dicts. Callers
+        validate cycles with prerequisite_graph.find_cycle before committing.
+
+        The signature is left alone: re-reading it here would also cover
+        writes other workers made since the last refresh, which this patch
+        does not contain, so the next refresh compares against the database
+        and rebuilds.
+        """
+        if self.signature is None:
+            return  # Not built yet, the next refresh loads everything
+
+        try:
+            self.prerequisite_graph.update_lesson(lesson.id, lesson.prerequisites)
+        except PrerequisiteCycleError:
+            # Another worker's write raced ours; fall back to a full rebuild
+            self.invalidate()
+            return
+
+        lesson_data = lesson.to_dict(include_content=False)
+        lessons = [item for item in self.lessons if item['id'] != lesson.id]
+        lessons.append(lesson_data)
+        lessons.sort(key=lambda item: item['id'])
+        self._set_lessons(lessons)
+        self.topic_index.add(lesson_data)
+
+    def lesson_deleted(self, lesson_id):
+        """Drop a committed lesson deletion from the snapshot"""
+        if self.signature is None:
+            return
+
+        self.prerequisite_graph.remove_lesson(lesson_id)
+        self.topic_index.remove(lesson_id)
+        self._set_lessons([item for item in self.lessons if item['id'] != lesson_id])
+
+    def _set_lessons(self, lessons):
+        self.lessons = lessons
+        self.lessons_by_id = {lesson['id']: lesson for lesson in lessons}
+        self.published_lessons = [lesson for lesson in lessons if lesson['is_published']]
+        self.scoring_matrix = LessonScoringMatrix(self.published_lessons)
+
+    def _rebuild(self):
+        quiz_counts = dict(
+            db.session.query(Quiz.lesson_id, db.func.count(Quiz.id))
+            .group_by(Quiz.lesson_id)
+            .all()
+        )
+
+        lessons = [
+            lesson.to_dict(include_content=False, quiz_count=quiz_counts.get(lesson.id, 0))
+            for lesson in Lesson.query.order_by(Lesson.id).all()
+        ]
+
+        self._set_lessons(lessons)
+        self.prerequisite_graph = PrerequisiteGraph(lessons)
+        self.topic_index = LessonTopicIndex(lessons)
+
+
+# Create singleton instance
+lesson_catalog = LessonCatalog()
@@ -0,0 +1,317 @@
+"""
+Item-item collaborative filtering over lesson interactions
+Students' lesson interactions (completed lessons, and lessons whose quizzes
+they attempted) form a sparse student x lesson matrix stored CSR-style in
+NumPy arrays. The lesson x lesson co-occurrence matrix X^T X is built
+sparse from each student's lesson pairs and reduced to the top-N most
+similar lessons per lesson, also CSR, so scoring a student is a gather over
+their lessons' neighbor lists and one np.bincount.
+
+Neighbor lists are not updated incrementally as completions arrive.
+Building is offline only: build_collaborative.py publishes the arrays to
+the model registry and every worker maps the same read-only copy, so
+workers never drift apart and no request pays for X^T X. One completion
+changes the similarity of every pair involving its lesson, which a
+worker could not apply to the shared arrays anyway, so co-occurrence
+catches up on the next scheduled build instead. Between builds a worker
+folds a student's new interactions into that student's own row (for at
+most MAX_UPDATED_ROWS students), so their suggestions follow what they
+just studied.
+"""
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from database import db
+from models.lesson import LessonProgress
+from models.quiz import Quiz, Attempt
+from .registry import model_registry
+
+COMPLETED_WEIGHT = 1.0
+ATTEMPTED_WEIGHT = 0.5
+BUILD_PAIRS = 4_000_000  # Lesson pairs expanded per block of students when building
+ARTIFACT_ARRAYS = (
+    'lesson_ids', 'user_ids', 'indptr', 'indices', 'data',
+    'neighbor_indptr', 'neighbor_indices', 'neighbor_data'
+)
+MAX_UPDATED_ROWS = 10000  # Students whose rows a worker patches between builds
+
+
+def load_interactions():
+    """
+    Read every (student, lesson, weight) interaction with two grouped queries
+
+    Returns:
+        tuple: (user IDs, lesson IDs, weights) as NumPy arrays
+    """
+    completed = db.session.query(LessonProgress.user_id, LessonProgress.lesson_id)\
+        .filter(LessonProgress.status == 'completed')\
+        .all()
+    attempted = db.session.query(Attempt.user_id, Quiz.lesson_id)\
+        .join(Quiz, Attempt.quiz_id == Quiz.id)\
+        .group_by(Attempt.user_id, Quiz.lesson_id)\
+        .all()
+
+    rows = completed + attempted
+    weights = [COMPLETED_WEIGHT] * len(completed) + [ATTEMPTED_WEIGHT] * len(attempted)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+    user_ids, lesson_ids = np.array(rows, dtype=np.int64).T
+    return user_ids, lesson_ids, np.array(weights)
+
+
+def _cooccurrence(indptr, indices, data, n):
+    """
+    Sparse X^T X from each student's lesson pairs
+
+    Students are expanded in blocks of about BUILD_PAIRS pairs, so peak
+    memory follows the number of non-zero co-occurrences, not n^2.
+
+    Returns:
+        tuple: (rows, cols, values) COO entries sorted by row then column
+    """
+    keys = np.empty(0, dtype=np.int64)
+    values = np.empty(0)
+    degree = np.diff(indptr)
+    pairs = np.cumsum(degree.astype(np.int64) ** 2)
+
+    first = 0
+    while first < len(degree):
+        # Extend the block while it stays under the pair budget (at least one student)
+        budget = (pairs[first - 1] if first else 0) + BUILD_PAIRS
+        last = max(int(np.searchsorted(pairs, budget, side='right')), first + 1)
+        lo, hi = indptr[first], indptr[last]
+
+        # Entry e of a student with d lessons pairs with all d entries of that student
+        entry_degree = np.repeat(degree[first:last], degree[first:last])
+        entry_start = np.repeat(indptr[first:last], degree[first:last])
+        left = np.repeat(np.arange(lo, hi), entry_degree)
+        offsets = np.repeat(np.cumsum(entry_degree) - entry_degree, entry_degree)
+        right = np.repeat(entry_start, entry_degree) + np.arange(len(left)) - offsets
+
+        keys, values = _sum_duplicates(
+            np.r_[keys, indices[left] * n + indices[right]],
+            np.r_[values, data[left] * data[right]]
+        )
+        first = last
+
+    if not n:
+        return keys, keys, values
+    return keys // n, keys % n, values
+
+
+def _sum_duplicates(keys, values):
+    """Sort COO keys and add up the values of repeated keys"""
+    if not len(keys):
+        return keys, values
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(values, starts)
+
+
+class ItemItemModel:
+    """Lesson neighbor lists learned from co-occurring student interactions"""
+
+    def __init__(self, neighbors=20):
+        self.neighbors = neighbors
+        self._lock = threading.Lock()
+        self.built_at = None
+        self._reset(np.empty(0, dtype=np.int64))
+
+    def configure(self, neighbors=None):
+        """Apply limits from the app config"""
+        if neighbors is not None:
+            self.neighbors = neighbors
+
+    def _reset(self, lesson_ids):
+        self.lesson_ids = lesson_ids
+        self.position = {int(lesson_id): i for i, lesson_id in enumerate(lesson_ids)}
+        n = len(lesson_ids)
+
+        # CSR over students: row r holds lesson positions/weights of user_ids[r]
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self.data = np.empty(0)
+        self.user_rows = {}
+        self.updated_rows = OrderedDict()  # user_id -> {position: weight} for rows changed since the build, LRU
+
+        # CSR over lessons: row p holds the top-N neighbor positions/similarities of lesson p
+        self.neighbor_indptr = np.zeros(n + 1, dtype=np.int64)
+        self.neighbor_indices = np.empty(0, dtype=np.int64)
+        self.neighbor_data = np.empty(0)
+
+    def refresh(self):
+        """Pick up a newer published build; models are never built in a request"""
+        model_registry.poll()
+        return self
+
+    def build(self, lesson_ids, user_ids, interaction_lessons, weights):
+        """
+        Build the matrix and neighbor lists from interaction arrays
+
+        Run offline by build_collaborative.py, which publishes the result.
+
+        Args:
+            lesson_ids: Every lesson ID that can be recommended
+            user_ids, interaction_lessons, weights: Parallel interaction arrays;
+                duplicate (user, lesson) pairs keep the largest weight
+        """
+        lesson_ids = np.asarray(lesson_ids, dtype=np.int64)
+        interaction_lessons = np.asarray(interaction_lessons, dtype=np.int64)
+        position = np.searchsorted(lesson_ids, interaction_lessons)
+        known = position < len(lesson_ids)
+        known[known] = lesson_ids[position[known]] == interaction_lessons[known]
+        user_ids, position, weights = user_ids[known], position[known], np.asarray(weights, dtype=float)[known]
+
+        # One entry per (user, lesson), keeping the strongest interaction
+        row_starts = np.empty(0, dtype=np.int64)
+        if len(user_ids):
+            order = np.lexsort((position, user_ids))
+            user_ids, position, weights = user_ids[order], position[order], weights[order]
+            starts = np.flatnonzero(np.r_[True, (user_ids[1:] != user_ids[:-1]) | (position[1:] != position[:-1])])
+            weights = np.maximum.reduceat(weights, starts)
+            user_ids, position = user_ids[starts], position[starts]
+            row_starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+
+        indptr = np.r_[row_starts, len(user_ids)].astype(np.int64)
+        n = len(lesson_ids)
+        rows, cols, values = _cooccurrence(indptr, position, weights, n)
+
+        # Cosine similarity of every co-occurring pair, then the top-N per lesson
+        norms = np.zeros(n)
+        diagonal = rows == cols
+        norms[rows[diagonal]] = np.sqrt(values[diagonal])
+        similarity = values / (norms[rows] * norms[cols])
+        keep = ~diagonal & (similarity > 0)
+        rows, cols, similarity = rows[keep], cols[keep], similarity[keep]
+
+        order = np.lexsort((-similarity, rows))
+        rows, cols, similarity = rows[order], cols[order], similarity[order]
+        row_first = np.searchsorted(rows, np.arange(n))
+        rank = np.arange(len(rows)) - row_first[rows]
+        top = rank < self.neighbors
+        rows, cols, similarity = rows[top], cols[top], similarity[top]
+
+        with self._lock:
+            self._reset(lesson_ids)
+            self.user_ids = user_ids[row_starts]
+            self.indptr = indptr
+            self.indices = position
+            self.data = weights
+            self.user_rows = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+            self.neighbor_indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=n))].astype(np.int64)
+            self.neighbor_indices = cols
+            self.neighbor_data = similarity
+            self.built_at = time.time()
+
+    def apply_model(self, artifact):
+        """Adopt arrays published to the model registry by build_collaborative.py"""
+        names = [f'cf_{name}' for name in ARTIFACT_ARRAYS]
+        if not artifact.has(*names):
+            return
+
+        with self._lock:
+            for name in ARTIFACT_ARRAYS:
+                setattr(self, name, artifact.arrays[f'cf_{name}'])
+            self.position = {int(lesson_id): i for i, lesson_id in enumerate(self.lesson_ids)}
+            self.user_rows = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+            self.updated_rows = OrderedDict()
+            self.built_at = artifact.params.get('cf_built_at', time.time())
+
+    def export(self):
+        """
+        Arrays and parameters for publishing to the model registry
+
+        Returns:
+            tuple: ({name: np.ndarray}, params dict)
+        """
+        with self._lock:
+            arrays = {f'cf_{name}': getattr(self, name) for name in ARTIFACT_ARRAYS}
+            return arrays, {'cf_built_at': self.built_at, 'cf_neighbors': self.neighbors}
+
+    def _user_row(self, user_id):
+        """(positions, weights) of a student's interactions"""
+        updated = self.updated_rows.get(user_id)
+        if updated is not None:
+            return np.fromiter(updated, dtype=np.int64), np.fromiter(updated.values(), dtype=float)
+
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        lo, hi = self.indptr[row], self.indptr[row + 1]
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def record(self, user_id, lesson_id, weight):
+        """
+        Fold a new interaction into the student's own row
+
+        Only the student's row changes; the shared neighbor lists are left
+        as published and include the interaction after the next build.
+        Past MAX_UPDATED_ROWS students the least recently patched row falls
+        back to its published version until then.
+        """
+        with self._lock:
+            position = self.position.get(lesson_id)
+            if position is None or self.built_at is None:
+                return  # Unknown lesson; the next build includes it
+
+            positions, weights = self._user_row(user_id)
+            row = dict(zip(positions.tolist(), weights.tolist()))
+            if weight <= row.get(position, 0.0):
+                return
+            row[position] = weight
+            self.updated_rows[user_id] = row
+            self.updated_rows.move_to_end(user_id)
+            while len(self.updated_rows) > MAX_UPDATED_ROWS:
+                self.updated_rows.popitem(last=False)
+
+    def recommend(self, user_id, limit, eligible):
+        """
+        Top lessons for a student by summed neighbor similarity
+
+        Args:
+            user_id: Student ID
+            limit: Maximum number of lessons
+            eligible: Callable lesson_id -> bool filtering candidates
+
+        Returns:
+            list: (lesson_id, score, most similar lesson ID the student studied)
+        """
+        with self._lock:
+            positions, weights = self._user_row(user_id)
+            if len(positions) == 0 or len(self.neighbor_indices) == 0:
+                return []
+
+            # Gather the neighbor lists of the student's lessons
+            starts = self.neighbor_indptr[positions]
+            lengths = self.neighbor_indptr[positions + 1] - starts
+            offsets = np.cumsum(lengths) - lengths
+            entries = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+            neighbors = self.neighbor_indices[entries]
+            contributions = self.neighbor_data[entries] * np.repeat(weights, lengths)
+            sources = np.repeat(positions, lengths)
+
+            scores = np.bincount(neighbors, contributions, minlength=len(self.lesson_ids))
+            scores[positions] = 0
+
+            results = []
+            candidates = np.flatnonzero(scores > 0)
+            for candidate in candidates[np.argsort(-scores[candidates], kind='stable')]:
+                lesson_id = int(self.lesson_ids[candidate])
+                if not eligible(lesson_id):
+                    continue
+
+                # The studied lesson contributing most explains the suggestion
+                source = sources[np.argmax(np.where(neighbors == candidate, contributions, -1))]
+                results.append((lesson_id, float(scores[candidate]), int(self.lesson_ids[source])))
+                if len(results) == limit:
+                    break
+
+            return results
+
+
+# Create singleton instance
+collaborative_model = ItemItemModel()
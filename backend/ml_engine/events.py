@@ -0,0 +1,101 @@
+"""
+Write events that keep the AI engine's derived state in sync
+Routes call these next to the database writes that change an input of
+the engine; state updates join the caller's transaction
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db
+from models.user import StudentProfile
+from .cache import recommendation_cache
+from .catalog import lesson_catalog
+from .collaborative import collaborative_model, COMPLETED_WEIGHT, ATTEMPTED_WEIGHT
+from .features import record_attempts_features, record_lesson_completion
+from .knowledge_state import quiz_topic, record_attempts
+from .recommend import ai_engine
+from .review import review_scheduler
+
+PENDING_INVALIDATIONS = 'recommendation_cache_invalidations'  # Session.info key
+
+
+def _invalidate_after_commit(user_id):
+    """Drop a student's cached recommendations once the current transaction commits"""
+    db.session.info.setdefault(PENDING_INVALIDATIONS, set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    for user_id in session.info.pop(PENDING_INVALIDATIONS, ()):
+        recommendation_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop(PENDING_INVALIDATIONS, None)
+
+
+def attempt_recorded(user_id, quiz, is_correct, score=None, attempted_at=None):
+    """A new Attempt row was added to the session"""
+    attempts_recorded(user_id, [(quiz, is_correct, score, attempted_at)])
+
+
+def attempts_recorded(user_id, graded):
+    """
+    Attempt rows of one student were added to the session
+
+    Args:
+        user_id: Student ID
+        graded: (quiz, is_correct, score, attempted_at) tuples in answer order
+    """
+    results = []
+    for quiz, is_correct, score, attempted_at in graded:
+        points = quiz.points or 0
+        if score is None:
+            score = points if is_correct else 0
+        results.append((quiz, quiz_topic(quiz), is_correct, score, points, attempted_at))
+
+    # Each state table is read once for the whole batch
+    record_attempts(user_id, [(topic, is_correct) for _, topic, is_correct, _, _, _ in results])
+    record_attempts_features(user_id, [item[1:] for item in results])
+    review_scheduler.record_many(user_id, [
+        (quiz.id, is_correct, attempted_at) for quiz, _, is_correct, _, _, attempted_at in results
+    ])
+    for lesson_id in {quiz.lesson_id for quiz, *_ in results}:
+        collaborative_model.record(user_id, lesson_id, ATTEMPTED_WEIGHT)
+
+    StudentProfile.record_attempt(
+        user_id, sum(item[3] for item in results), sum(item[4] for item in results), len(results)
+    )
+    _invalidate_after_commit(user_id)
+
+
+def lesson_completion_changed(user_id, lesson_id, completed=True):
+    """A LessonProgress row moved into or out of the completed state (before commit)"""
+    record_lesson_completion(user_id, completed)
+    if completed:
+        collaborative_model.record(user_id, lesson_id, COMPLETED_WEIGHT)
+    _invalidate_after_commit(user_id)
+
+
+def lesson_saved(lesson):
+    """A lesson was created, edited, published or unpublished (after commit)"""
+    lesson_catalog.lesson_saved(lesson)
+    recommendation_cache.clear()
+
+
+def lesson_deleted(lesson_id):
+    """A lesson was deleted (after commit)"""
+    lesson_catalog.lesson_deleted(lesson_id)
+    recommendation_cache.clear()
+
+
+def quiz_saved(quiz):
+    """A quiz was created or edited (before commit)"""
+    # Recompile so grading only looks feedback up; joins the caller's transaction
+    quiz.option_feedback = ai_engine.compile_feedback({
+        'options': quiz.options,
+        'correct_answer': quiz.correct_answer,
+        'explanation': quiz.explanation,
+        'hint': quiz.hint
+    })
+
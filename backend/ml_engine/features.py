@@ -0,0 +1,147 @@
+"""
+Per-student feature store
+A StudentFeatures row keeps running counts, score sums, per-topic sums and a
+ring buffer of the latest results, updated in the transaction of every
+attempt and lesson completion write, so the ML routes read one row instead
+of re-querying the attempt history.
+"""
+from datetime import datetime
+from database import db
+from models.user import StudentFeatures
+from utils.db_utils import insert_missing
+
+RECENT_WINDOW = 10  # Results kept in the ring buffer (AIEngine's recent accuracy window)
+
+
+def _locked_features(user_id):
+    """
+    Fetch a student's row for update, creating it if missing
+
+    Every write bumps updated_at, even when no count changes, because it
+    versions the student's cached recommendations (see student_version).
+    """
+    query = StudentFeatures.query.filter_by(user_id=user_id).with_for_update().populate_existing()
+    features = query.first()
+    if not features:
+        # A concurrent first write may create the row too; skip the conflict and lock whichever won
+        insert_missing(StudentFeatures, [{
+            'user_id': user_id,
+            'attempts_count': 0,
+            'correct_count': 0,
+            'score_sum': 0,
+            'points_possible': 0,
+            'topic_stats': {},
+            'recent_results': [],
+            'recent_head': 0,
+            'lessons_completed': 0
+        }], ['user_id'])
+        features = query.first()
+    features.updated_at = datetime.utcnow()
+    return features
+
+
+def apply_attempt(features, topic, is_correct, score, points, attempted_at):
+    """Fold one attempt into a StudentFeatures row (or compatible object)"""
+    correct = 1 if is_correct else 0
+    features.attempts_count += 1
+    features.correct_count += correct
+    features.score_sum += score
+    features.points_possible += points
+
+    # JSON columns are reassigned, not mutated, so the change is persisted
+    topics = dict(features.topic_stats or {})
+    stats = topics.get(topic, [0, 0, 0, 0])
+    topics[topic] = [stats[0] + 1, stats[1] + correct, stats[2] + score, stats[3] + points]
+    features.topic_stats = topics
+
+    recent = list(features.recent_results or [])
+    if len(recent) < RECENT_WINDOW:
+        recent.append([correct, score])
+        features.recent_head = 0
+    else:
+        recent[features.recent_head] = [correct, score]
+        features.recent_head = (features.recent_head + 1) % RECENT_WINDOW
+    features.recent_results = recent
+
+    if features.last_attempt_at is None or attempted_at > features.last_attempt_at:
+        features.last_attempt_at = attempted_at
+    return features
+
+
+def record_attempt_features(user_id, topic, is_correct, score, points, attempted_at=None):
+    """
+    Update a student's features for a newly inserted attempt
+
+    The row is only added to the session; the caller commits it together
+    with the attempt.
+
+    Returns:
+        StudentFeatures: The updated row
+    """
+    return record_attempts_features(user_id, [(topic, is_correct, score, points, attempted_at)])
+
+
+def record_attempts_features(user_id, results):
+    """
+    Update a student's features for several new attempts, oldest first
+
+    Args:
+        user_id: Student ID
+        results: (topic, is_correct, score, points, attempted_at) tuples
+
+    Returns:
+        StudentFeatures: The updated row
+    """
+    features = _locked_features(user_id)
+    now = datetime.utcnow()
+    for topic, is_correct, score, points, attempted_at in results:
+        apply_attempt(features, topic, is_correct, score, points, attempted_at or now)
+    return features
+
+
+def record_lesson_completion(user_id, completed):
+    """Count a lesson moving into (or out of) the completed state"""
+    features = _locked_features(user_id)
+    features.lessons_completed = max(features.lessons_completed + (1 if completed else -1), 0)
+    return features
+
+
+def student_version(user_id):
+    """
+    Version of a student's recommendation inputs, read with one indexed query
+
+    Changes with every committed attempt or lesson completion, whichever
+    worker handled it.
+
+    Returns:
+        tuple or None: (attempts, lessons completed, updated_at), or None
+            before the first write
+    """
+    return db.session.query(
+        StudentFeatures.attempts_count,
+        StudentFeatures.lessons_completed,
+        StudentFeatures.updated_at
+    ).filter_by(user_id=user_id).first()
+
+
+def load_features(user_id):
+    """
+    Load a student's features in the format AIEngine expects
+
+    Returns:
+        dict or None: StudentFeatures.to_dict(), or None before the first write
+    """
+    return load_features_many([user_id])[user_id]
+
+
+def load_features_many(user_ids):
+    """
+    Load the features of many students with one query
+
+    Returns:
+        dict: {user_id: load_features() result}
+    """
+    features = {user_id: None for user_id in user_ids}
+    for row in StudentFeatures.query.filter(StudentFeatures.user_id.in_(list(user_ids))):
+        features[row.user_id] = row.to_dict()
+    return features
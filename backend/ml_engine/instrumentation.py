@@ -0,0 +1,433 @@
+"""
+Latency histograms and call counters for the AI engine
+AIEngine methods are wrapped with @instrumented, routes time their stages
+with metrics.stage(...), and SQL statements are timed per Flask endpoint,
+so a slow /api/ml/recommend can be split into SQL, data preparation and
+scoring. /metrics renders everything in the Prometheus text format.
+
+Series are recorded in each worker process. With a shared directory
+configured (METRICS_DIR, off by default; needs fcntl, so POSIX only), every worker writes a snapshot of its series
+there every few seconds and /metrics sums the snapshots of all workers,
+so any worker answers a scrape with the same monotonic totals. Snapshots
+of exited workers are folded into one archive file, so their counts are
+kept and the directory does not grow with restarts. Without fcntl, or if
+the directory cannot be written, /metrics falls back to per-worker series.
+"""
+import os
+import json
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Locks the shared metrics directory; not available on Windows
+except ImportError:
+    fcntl = None
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Seconds
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative counts; rendered cumulatively)"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    """Monotonic counter"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class MetricsRegistry:
+    """Named histograms and counters with labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Guards every series update and render
+        self._families = {}  # name -> (kind, help, buckets)
+        self._series = {}  # name -> {label tuple: Histogram or Counter}
+        self.changes = 0  # Bumped on every update; tells the flusher there is news
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """Declare a metric family ('histogram' or 'counter')"""
+        self._families[name] = (kind, help_text, buckets)
+        self._series.setdefault(name, {})
+
+    def series(self, name, **labels):
+        """
+        Get or create one labelled series
+
+        Hot paths keep the returned Histogram/Counter and update it under
+        metrics.lock instead of resolving labels on every call.
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self._series[name]
+            value = series.get(key)
+            if value is None:
+                kind, _, bounds = self._families[name]
+                value = series[key] = Histogram(bounds) if kind == 'histogram' else Counter()
+            return value
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation"""
+        histogram = self.series(name, **labels)
+        with self.lock:
+            histogram.observe(value)
+            self.changes += 1
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter"""
+        counter = self.series(name, **labels)
+        with self.lock:
+            counter.inc(amount)
+            self.changes += 1
+
+    @contextmanager
+    def stage(self, route, stage):
+        """Time one stage of a route: with metrics.stage('recommend', 'sql'): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('ml_route_stage_seconds', time.perf_counter() - started, route=route, stage=stage)
+
+    def reset(self):
+        """Drop every recorded value (families stay declared)"""
+        with self.lock:
+            for series in self._series.values():
+                for key, value in series.items():
+                    series[key] = type(value)(value.bounds) if isinstance(value, Histogram) else Counter()
+            self.changes += 1
+
+    def snapshot(self):
+        """
+        Every series as JSON-serializable data
+
+        Returns:
+            dict: {name: [[label pairs, value]]}; a value is a counter's
+                number or a histogram's [bucket counts, sum, count]
+        """
+        with self.lock:
+            return _dump(self._series)
+
+    def merge(self, totals, snapshot):
+        """Add a snapshot into {name: {label tuple: Histogram or Counter}} totals"""
+        for name, entries in snapshot.items():
+            if name not in self._families:
+                continue  # Dropped since the snapshot was written
+            kind, _, bounds = self._families[name]
+            series = totals.setdefault(name, {})
+            for key, value in entries:
+                key = tuple(tuple(pair) for pair in key)
+                if kind == 'histogram':
+                    total = series.setdefault(key, Histogram(bounds))
+                    counts, value_sum, count = value
+                    if len(counts) != len(total.counts):
+                        continue  # Written with other buckets
+                    total.counts = [a + b for a, b in zip(total.counts, counts)]
+                    total.sum += value_sum
+                    total.count += count
+                else:
+                    series.setdefault(key, Counter()).inc(value)
+        return totals
+
+    def render(self, series=None):
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4)
+
+        Args:
+            series: Optional merged series (see merge); defaults to this process
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        with self.lock:
+            series = self._series if series is None else series
+            for name, (kind, help_text, bounds) in sorted(self._families.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(series.get(name, {}).items()):
+                    if kind == 'counter':
+                        lines.append(f'{name}{_labels(key)} {_number(value.value)}')
+                        continue
+
+                    cumulative = 0
+                    for bound, count in zip(bounds, value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(key, le=_number(bound))} {cumulative}')
+                    lines.append(f'{name}_bucket{_labels(key, le="+Inf")} {value.count}')
+                    lines.append(f'{name}_sum{_labels(key)} {_number(value.sum)}')
+                    lines.append(f'{name}_count{_labels(key)} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+
+class SharedMetrics:
+    """Aggregates the metrics of every worker process through a shared directory"""
+
+    ARCHIVE = 'archive.json'  # Summed snapshots of exited workers
+
+    def __init__(self, registry, directory=None, flush_interval=5):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval  # Seconds between snapshot writes
+        self._pid = None
+        self._flushed_changes = None
+        self._failed = False  # Set when the directory cannot be used
+
+    @property
+    def enabled(self):
+        """Whether metrics are shared across workers"""
+        return bool(self.directory) and fcntl is not None and not self._failed
+
+    def configure(self, directory=None, flush_interval=None):
+        """Apply settings from the app config"""
+        if directory is not None:
+            self.directory = directory
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'worker-{pid}.json')
+
+    def start(self):
+        """
+        Start this process's flusher thread
+
+        Safe to call on every request: it only starts a thread once per
+        process, including in workers forked after the app was created.
+        """
+        if not self.enabled or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._flushed_changes = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            # E.g. a read-only filesystem; keep serving with per-worker metrics
+            print(f"[metrics] Shared metrics disabled, {self.directory} is not usable: {str(e)}")
+            self._failed = True
+            return
+        thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+        thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[metrics] Snapshot not written: {str(e)}")
+
+    def flush(self):
+        """Write this process's snapshot if anything changed since the last write"""
+        changes = self.registry.changes
+        if changes == self._flushed_changes:
+            return
+        path = self._path(os.getpid())
+        _write_json(path, self.registry.snapshot())
+        self._flushed_changes = changes
+
+    def collect(self):
+        """
+        Sum the snapshots of all workers, folding exited ones into the archive
+
+        Returns:
+            dict or None: Merged series for MetricsRegistry.render, or None
+                when shared metrics are unavailable (render this worker's)
+        """
+        self.start()
+        if not self.enabled:
+            return None
+        try:
+            return self._collect()
+        except OSError as e:
+            print(f"[metrics] Falling back to this worker's metrics: {str(e)}")
+            return None
+
+    def _collect(self):
+        self.flush()
+        totals = {}
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, self.ARCHIVE)
+            archive = _read_json(archive_path)
+            archive_changed = False
+
+            for name in os.listdir(self.directory):
+                if not (name.startswith('worker-') and name.endswith('.json')):
+                    continue
+                snapshot = _read_json(os.path.join(self.directory, name))
+                pid = int(name[len('worker-'):-len('.json')])
+                if pid != os.getpid() and not _alive(pid):
+                    archive = _dump(self.registry.merge(self.registry.merge({}, archive), snapshot))
+                    archive_changed = True
+                    os.remove(os.path.join(self.directory, name))
+                    continue
+                self.registry.merge(totals, snapshot)
+
+            if archive_changed:
+                _write_json(archive_path, archive)
+        return self.registry.merge(totals, archive)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)  # Readers never see a partial snapshot
+
+
+def _dump(series):
+    """{name: {label tuple: Histogram or Counter}} as snapshot data"""
+    return {
+        name: [
+            [list(map(list, key)), [value.counts, value.sum, value.count] if isinstance(value, Histogram) else value.value]
+            for key, value in entries.items()
+        ]
+        for name, entries in series.items()
+    }
+
+
+# Create singleton instances
+metrics = MetricsRegistry()
+shared_metrics = SharedMetrics(metrics)
+metrics.describe('aiengine_method_seconds', 'histogram', 'Latency of AIEngine methods', LATENCY_BUCKETS)
+metrics.describe('aiengine_method_calls_total', 'counter', 'AIEngine method calls')
+metrics.describe('aiengine_method_errors_total', 'counter', 'AIEngine method calls that raised')
+metrics.describe('aiengine_input_size', 'histogram', 'Input sizes passed to AIEngine methods', SIZE_BUCKETS)
+metrics.describe('ml_route_stage_seconds', 'histogram', 'Latency of ML route stages', LATENCY_BUCKETS)
+metrics.describe('sql_query_seconds', 'histogram', 'Latency of SQL statements per Flask endpoint', LATENCY_BUCKETS)
+
+
+def _argument_getter(signature, path):
+    """Build a fast getter for 'param' or 'param.key' from call arguments"""
+    name, _, key = path.partition('.')
+    position = list(signature.parameters).index(name)
+
+    def get(args, kwargs):
+        value = args[position] if position < len(args) else kwargs.get(name)
+        if key and isinstance(value, dict):
+            value = value.get(key)
+        return value
+
+    return get
+
+
+def instrumented(**inputs):
+    """
+    Record latency, call count and input sizes of a method
+
+    Args:
+        inputs: Input name -> argument path whose len() is recorded, e.g.
+            attempts='student_data.attempts', lessons='available_lessons'
+    """
+    def decorator(fn):
+        method = fn.__name__
+        signature = inspect.signature(fn)
+        latency = metrics.series('aiengine_method_seconds', method=method)
+        calls = metrics.series('aiengine_method_calls_total', method=method)
+        errors = metrics.series('aiengine_method_errors_total', method=method)
+        sizes = [
+            (_argument_getter(signature, path), metrics.series('aiengine_input_size', method=method, input=name))
+            for name, path in inputs.items()
+        ]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with metrics.lock:
+                    metrics.changes += 1
+                    latency.observe(elapsed)
+                    calls.inc()
+                    if failed:
+                        errors.inc()
+                    for get, histogram in sizes:
+                        value = get(args, kwargs)
+                        if value is not None and hasattr(value, '__len__'):
+                            histogram.observe(len(value))
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_sqlalchemy(engine):
+    """Time every SQL statement and attribute it to the current Flask endpoint"""
+    from flask import has_request_context, request
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is None:
+            return
+        endpoint = (request.endpoint or 'unknown') if has_request_context() else 'none'
+        metrics.observe('sql_query_seconds', time.perf_counter() - started, endpoint=endpoint)
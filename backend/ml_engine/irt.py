@@ -0,0 +1,198 @@
+"""
+Item Response Theory calibration
+Fits the 1PL (Rasch) or 2PL logistic model
+
+    P(correct | student s, item i) = sigmoid(a_i * (theta_s - b_i))
+
+to the sparse response data in the attempts table by marginal maximum
+likelihood (Bock-Aitkin EM over a quadrature grid for theta). Responses are
+kept as three parallel arrays (student index, item index, correctness), so
+each step is a few vectorized operations and segment reductions no matter
+how sparse the student x item matrix is. Student abilities are the
+expected a posteriori (EAP) estimates under the fitted items.
+
+Per-response work runs over blocks of CHUNK_SIZE responses, so memory does
+not grow with the number of responses beyond the three input arrays and
+their two orderings: besides the students x nodes posterior and the
+items x nodes expected counts, each step holds a few
+CHUNK_SIZE x N_NODES float64 blocks (about 16 MB each by default).
+"""
+import numpy as np
+
+# Quadrature grid for the standard-normal ability distribution
+N_NODES = 31
+NODES = np.linspace(-4, 4, N_NODES)
+LOG_WEIGHTS = -0.5 * NODES ** 2 - np.log(np.sum(np.exp(-0.5 * NODES ** 2)))
+
+# Weak priors keep items answered by few students (or always right/wrong) finite
+DIFFICULTY_PRIOR_VAR = 4.0
+LOG_DISCRIMINATION_PRIOR_VAR = 0.25
+MAX_STEP = 1.0
+NEWTON_STEPS = 5
+CHUNK_SIZE = 65536  # Responses per E-step block
+
+
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class _Responses:
+    """Responses sorted by student, plus the orderings needed for item sums"""
+
+    def __init__(self, students, items, y, n_students, n_items):
+        order = np.argsort(students, kind='stable')
+        self.students = students[order]
+        self.items = items[order]
+        self.y = y[order]
+        self.n_students = n_students
+        self.n_items = n_items
+
+        # Row of the (item, outcome) log-probability table for each response
+        self.outcome_rows = 2 * self.items + self.y.astype(np.intp)
+        self.student_chunks = _chunks(self.students)
+
+        by_item = np.argsort(self.items, kind='stable')
+        self.students_by_item = self.students[by_item]
+        self.y_by_item = self.y[by_item]
+        self.item_chunks = _chunks(self.items[by_item])
+
+
+def _segments(sorted_keys):
+    """Start offsets and keys of runs in a sorted key array"""
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return starts, sorted_keys[starts]
+
+
+def _chunks(sorted_keys):
+    """
+    Split a sorted key array into blocks of CHUNK_SIZE
+
+    Returns:
+        list: (start, stop, run starts within the block, run keys) tuples;
+            a key split across two blocks appears in both
+    """
+    chunks = []
+    for start in range(0, len(sorted_keys), CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, len(sorted_keys))
+        chunks.append((start, stop) + _segments(sorted_keys[start:stop]))
+    return chunks
+
+
+def _student_posterior(responses, difficulty, discrimination):
+    """
+    Posterior over the quadrature nodes for every student
+
+    Returns:
+        tuple: (posterior [students x nodes], marginal log-likelihood)
+    """
+    p = sigmoid(discrimination[:, None] * (NODES[None, :] - difficulty[:, None]))
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    # Interleave log(1 - p) and log(p) so row 2 * item + outcome is a response's term
+    table = np.empty((2 * len(p), N_NODES))
+    table[0::2] = np.log(1 - p)
+    table[1::2] = np.log(p)
+
+    log_joint = np.zeros((responses.n_students, N_NODES))
+    for start, stop, starts, ids in responses.student_chunks:
+        # Keys are unique within a block, so += adds each run once
+        log_joint[ids] += np.add.reduceat(table[responses.outcome_rows[start:stop]], starts, axis=0)
+    log_joint += LOG_WEIGHTS
+    log_marginal = np.logaddexp.reduce(log_joint, axis=1)
+    posterior = np.exp(log_joint - log_marginal[:, None])
+    return posterior, log_marginal.sum()
+
+
+def _expected_counts(responses, posterior):
+    """
+    Expected responses and correct responses per item and node
+
+    Returns:
+        tuple: (expected_n, expected_r), both [items x nodes]
+    """
+    expected_n = np.zeros((responses.n_items, N_NODES))
+    expected_r = np.zeros((responses.n_items, N_NODES))
+    for start, stop, starts, ids in responses.item_chunks:
+        response_posterior = posterior[responses.students_by_item[start:stop]]
+        expected_n[ids] += np.add.reduceat(response_posterior, starts, axis=0)
+        response_posterior *= responses.y_by_item[start:stop, None]
+        expected_r[ids] += np.add.reduceat(response_posterior, starts, axis=0)
+    return expected_n, expected_r
+
+
+def fit_irt(students, items, correct, n_students, n_items, model='2pl', max_iter=200, tol=1e-3):
+    """
+    Estimate item parameters and student abilities
+
+    Args:
+        students: Student index (0..n_students-1) of each response
+        items: Item index (0..n_items-1) of each response
+        correct: 0/1 outcome of each response
+        n_students, n_items: Number of distinct students and items
+        model: '1pl' (discrimination fixed at 1) or '2pl'
+        max_iter: Maximum EM iterations
+        tol: Stop when no item parameter moves more than this
+
+    Returns:
+        dict: 'theta', 'theta_se', 'difficulty', 'discrimination' arrays plus
+            'iterations' and 'log_likelihood'
+    """
+    if model not in ('1pl', '2pl'):
+        raise ValueError(f"Unknown IRT model: {model}")
+
+    students = np.asarray(students, dtype=np.intp)
+    items = np.asarray(items, dtype=np.intp)
+    y = np.asarray(correct, dtype=np.float64)
+    if len(y) == 0:
+        raise ValueError('Cannot calibrate IRT without responses')
+
+    responses = _Responses(students, items, y, n_students, n_items)
+
+    difficulty = np.zeros(n_items)
+    log_a = np.zeros(n_items)
+
+    iterations = 0
+    log_likelihood = -np.inf
+    for iterations in range(1, max_iter + 1):
+        # E-step: expected responses and correct responses per item and node
+        posterior, log_likelihood = _student_posterior(responses, difficulty, np.exp(log_a))
+        expected_n, expected_r = _expected_counts(responses, posterior)
+
+        # M-step: a few damped Newton steps per item, all items at once
+        previous_b, previous_log_a = difficulty.copy(), log_a.copy()
+        for _ in range(NEWTON_STEPS):
+            a = np.exp(log_a)
+            gap = NODES[None, :] - difficulty[:, None]
+            p = sigmoid(a[:, None] * gap)
+            residual = expected_r - expected_n * p
+            information = expected_n * p * (1 - p)
+
+            gradient = -(a[:, None] * residual).sum(axis=1) - difficulty / DIFFICULTY_PRIOR_VAR
+            curvature = (a[:, None] ** 2 * information).sum(axis=1) + 1 / DIFFICULTY_PRIOR_VAR
+            difficulty += np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+
+            if model == '2pl':
+                z = a[:, None] * (NODES[None, :] - difficulty[:, None])
+                p = sigmoid(z)
+                residual = expected_r - expected_n * p
+                information = expected_n * p * (1 - p)
+                gradient = (residual * z).sum(axis=1) - log_a / LOG_DISCRIMINATION_PRIOR_VAR
+                curvature = (information * z ** 2).sum(axis=1) + 1 / LOG_DISCRIMINATION_PRIOR_VAR
+                log_a += np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+
+        change = max(np.abs(difficulty - previous_b).max(), np.abs(log_a - previous_log_a).max())
+        if change < tol:
+            break
+
+    discrimination = np.exp(log_a)
+    posterior, log_likelihood = _student_posterior(responses, difficulty, discrimination)
+    theta = posterior @ NODES
+    theta_se = np.sqrt(np.maximum(posterior @ NODES ** 2 - theta ** 2, 0))
+
+    return {
+        'theta': theta,
+        'theta_se': theta_se,
+        'difficulty': difficulty,
+        'discrimination': discrimination,
+        'iterations': iterations,
+        'log_likelihood': float(log_likelihood)
+    }
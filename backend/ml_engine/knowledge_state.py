@@ -0,0 +1,113 @@
+"""
+Persisted Bayesian Knowledge Tracing state per student and topic
+"""
+from models.user import SkillMastery
+from utils.db_utils import insert_missing
+from .recommend import ai_engine
+
+
+def quiz_topic(quiz):
+    """Topic used for knowledge tracing: the subject of the quiz's lesson"""
+    lesson = quiz.lesson
+    return lesson.subject if lesson and lesson.subject else 'general'
+
+
+def record_attempt(user_id, topic, is_correct):
+    """
+    Apply one BKT update for a newly inserted attempt
+
+    The row is only added to the session; the caller commits it together
+    with the attempt so both land in the same transaction.
+
+    Returns:
+        SkillMastery: The updated state row
+    """
+    return record_attempts(user_id, [(topic, is_correct)])[topic]
+
+
+def _locked_states(user_id, topics):
+    """Fetch a student's state rows for the given topics, locked for update"""
+    return {
+        state.topic: state for state in SkillMastery.query.filter(
+            SkillMastery.user_id == user_id,
+            SkillMastery.topic.in_(topics)
+        ).with_for_update().populate_existing()
+    }
+
+
+def record_attempts(user_id, results):
+    """
+    Apply BKT updates for several new attempts of one student, in order
+
+    The state rows of every topic involved are loaded with one
+    SELECT ... FOR UPDATE, so concurrent submissions for the same topic
+    apply their updates one after the other. Missing rows are created
+    with an insert that skips (user, topic) conflicts and then locked.
+    A posterior that was started under other BKT parameters than the
+    current ones stays marked as such (params_version None), so it is
+    not mistaken for one computed under the fitted parameters.
+
+    Args:
+        user_id: Student ID
+        results: (topic, is_correct) pairs, oldest first
+
+    Returns:
+        dict: {topic: updated SkillMastery row}
+    """
+    topics = {topic for topic, _ in results}
+    states = _locked_states(user_id, topics)
+
+    missing = topics - set(states)
+    if missing:
+        insert_missing(SkillMastery, [
+            {
+                'user_id': user_id,
+                'topic': topic,
+                'p_mastery': ai_engine.initial_mastery(topic),
+                'params_version': ai_engine.params_version(topic),
+                'attempts_count': 0,
+                'correct_count': 0
+            }
+            for topic in missing
+        ], ['user_id', 'topic'])
+        states.update(_locked_states(user_id, missing))
+
+    for topic, is_correct in results:
+        state = states[topic]
+        if state.params_version != ai_engine.params_version(topic):
+            state.params_version = None
+        state.p_mastery = ai_engine.update_mastery(state.p_mastery, is_correct, topic)
+        state.attempts_count += 1
+        if is_correct:
+            state.correct_count += 1
+
+    return states
+
+
+def load_mastery(user_id):
+    """
+    Load a student's stored mastery state in the format AIEngine expects
+
+    Returns:
+        dict: {topic: {'p_mastery': float, 'params_version': str or None,
+                       'attempts': int, 'correct': int}}
+    """
+    return load_mastery_many([user_id])[user_id]
+
+
+def load_mastery_many(user_ids):
+    """
+    Load the stored mastery state of many students with one query
+
+    Returns:
+        dict: {user_id: load_mastery() result}, {} for students without state
+    """
+    states = {user_id: {} for user_id in user_ids}
+    for row in SkillMastery.query.filter(SkillMastery.user_id.in_(list(user_ids))):
+        states[row.user_id][row.topic] = {
+            'p_mastery': row.p_mastery,
+            'params_version': row.params_version,
+            'attempts': row.attempts_count,
+            'correct': row.correct_count
+        }
+    return states
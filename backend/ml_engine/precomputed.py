@@ -0,0 +1,132 @@
+"""
+Storage for recommendations materialized by precompute_recommendations.py
+"""
+from datetime import datetime
+from database import db
+from models.user import StudentProfile, SkillMastery
+from models.lesson import LessonProgress, StudentRecommendation
+from .features import load_features_many
+from .knowledge_state import load_mastery_many
+from .scoring import scoring_model
+
+
+def load_student_data(user_ids):
+    """
+    Gather recommend_lessons input for many students with one query per table
+
+    Used by both live /recommend and precompute_recommendations.py, so
+    stored and live recommendations score the same inputs.
+
+    Returns:
+        dict: {user_id: student_data}
+    """
+    mastery = load_mastery_many(user_ids)
+    features = load_features_many(user_ids)
+    student_data = {
+        user_id: {
+            'profile': {},
+            'attempts': [],
+            'completed_lessons': [],
+            'mastery': mastery[user_id],
+            'features': features[user_id]
+        }
+        for user_id in user_ids
+    }
+
+    for profile in StudentProfile.query.filter(StudentProfile.user_id.in_(user_ids)):
+        student_data[profile.user_id]['profile'] = profile.to_dict()
+
+    completed = db.session.query(LessonProgress.user_id, LessonProgress.lesson_id).filter(
+        LessonProgress.user_id.in_(user_ids),
+        LessonProgress.status == 'completed'
+    )
+    for user_id, lesson_id in completed:
+        student_data[user_id]['completed_lessons'].append(lesson_id)
+
+    return student_data
+
+
+def store_recommendations(results, computed_at=None):
+    """
+    Replace the stored recommendations of the given students in bulk
+
+    Args:
+        results: {user_id: recommend_lessons output}
+        computed_at: Time the inputs were read; defaults to now
+    """
+    computed_at = computed_at or datetime.utcnow()
+    user_ids = list(results)
+
+    StudentRecommendation.query.filter(
+        StudentRecommendation.user_id.in_(user_ids)
+    ).delete(synchronize_session=False)
+
+    db.session.bulk_insert_mappings(StudentRecommendation, [
+        {
+            'user_id': user_id,
+            'lesson_id': item['id'],
+            'rank': rank,
+            'score': item['recommendation_score'],
+            'reason': item['recommendation_reason'][:255],
+            'computed_at': computed_at
+        }
+        for user_id, recommendations in results.items()
+        for rank, item in enumerate(recommendations)
+    ])
+
+
+def load_recommendations(user_id, limit, catalog, max_age):
+    """
+    Serve stored recommendations if nothing they depend on changed since
+
+    Stored rows are stale when they are older than max_age, or when the
+    student's knowledge state, lesson completions, the lesson catalog or
+    the scoring spec changed after they were computed.
+
+    Returns:
+        list or None: recommend_lessons-shaped output, or None if stale
+    """
+    rows = StudentRecommendation.query.filter_by(user_id=user_id)\
+        .order_by(StudentRecommendation.rank)\
+        .limit(limit)\
+        .all()
+    if not rows or len(rows) < limit:
+        return None
+
+    computed_at = rows[0].computed_at
+    if computed_at < datetime.utcnow() - max_age:
+        return None
+
+    catalog_updated = catalog.signature[1] if catalog.signature else None
+    if catalog_updated and catalog_updated > computed_at:
+        return None
+
+    spec_updated = scoring_model.current().updated_at
+    if spec_updated and spec_updated > computed_at:
+        return None  # Scored with weights retuned since
+
+    mastery_updated = db.session.query(db.func.max(SkillMastery.updated_at))\
+        .filter(SkillMastery.user_id == user_id).scalar()
+    if mastery_updated and mastery_updated > computed_at:
+        return None
+
+    completed_since = db.session.query(LessonProgress.id).filter(
+        LessonProgress.user_id == user_id,
+        LessonProgress.completed_at > computed_at
+    ).first()
+    if completed_since:
+        return None
+
+    recommendations = []
+    for row in rows:
+        lesson = catalog.lessons_by_id.get(row.lesson_id)
+        if lesson is None or not lesson['is_published']:
+            return None  # Removed or unpublished since; fall back to live scoring
+        recommendations.append({
+            **lesson,
+            'recommendation_reason': row.reason,
+            # The column is a Float; serve whole scores as ints like recommend_lessons
+            'recommendation_score': int(row.score) if row.score.is_integer() else row.score
+        })
+    return recommendations
+
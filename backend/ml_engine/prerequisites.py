@@ -0,0 +1,185 @@
+"""
+Compiled lesson prerequisite graph
+Each lesson gets a bit position in topological order and a mask of the
+bits it requires, so a student's completed lessons become a single integer
+and eligibility is one AND/compare instead of a list scan per prerequisite
+"""
+from collections import defaultdict, deque
+
+
+class PrerequisiteCycleError(ValueError):
+    """Raised when prerequisites would make a lesson depend on itself"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        path = ' -> '.join(str(lesson_id) for lesson_id in cycle)
+        super().__init__(f'Prerequisites form a cycle: {path}')
+
+
+class PrerequisiteGraph:
+    """Topologically ordered prerequisite DAG with bitset completion checks"""
+
+    def __init__(self, lessons=None):
+        self.compile(lessons or [])
+
+    def compile(self, lessons):
+        """Build the graph from lesson dicts with 'id' and 'prerequisites'"""
+        self.prerequisites = {}
+        self.dependents = defaultdict(set)
+        for lesson in lessons:
+            prereqs = list(dict.fromkeys(lesson.get('prerequisites') or []))
+            self.prerequisites[lesson['id']] = prereqs
+            for prereq in prereqs:
+                self.dependents[prereq].add(lesson['id'])
+
+        # Bits follow topological order; unknown prerequisite IDs still get a
+        # bit so lessons that reference them stay locked
+        self.bit = {}
+        for lesson_id in self.topological_order():
+            self.bit[lesson_id] = len(self.bit)
+
+        self.required = {
+            lesson_id: self._mask(prereqs)
+            for lesson_id, prereqs in self.prerequisites.items()
+        }
+
+    def topological_order(self):
+        """
+        Lesson IDs with prerequisites before dependents (Kahn's algorithm)
+
+        Nodes caught in a pre-existing cycle are appended at the end in ID
+        order rather than dropped, so legacy data still compiles.
+        """
+        nodes = set(self.prerequisites)
+        for prereqs in self.prerequisites.values():
+            nodes.update(prereqs)
+
+        indegree = {node: len(self.prerequisites.get(node, ())) for node in nodes}
+        ready = deque(sorted(node for node, degree in indegree.items() if degree == 0))
+        order = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for dependent in sorted(self.dependents.get(node, ())):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(nodes):
+            seen = set(order)
+            order.extend(sorted(node for node in nodes if node not in seen))
+        return order
+
+    def _bit_for(self, lesson_id):
+        if lesson_id not in self.bit:
+            self.bit[lesson_id] = len(self.bit)
+        return self.bit[lesson_id]
+
+    def _mask(self, lesson_ids):
+        mask = 0
+        for lesson_id in lesson_ids:
+            mask |= 1 << self._bit_for(lesson_id)
+        return mask
+
+    def completion_mask(self, completed_lessons):
+        """Bitset of a student's completed lessons"""
+        mask = 0
+        for lesson_id in completed_lessons:
+            bit = self.bit.get(lesson_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def prerequisites_met(self, lesson_id, completed_mask):
+        """True if every prerequisite of the lesson is in the completion bitset"""
+        required = self.required.get(lesson_id, 0)
+        return required & completed_mask == required
+
+    def has_prerequisites(self, lesson_id):
+        return self.required.get(lesson_id, 0) != 0
+
+    def unlocked_next(self, completed_lessons):
+        """
+        Lessons whose prerequisites are now all completed
+
+        Only dependents of completed lessons are visited, so the cost follows
+        the student's progress rather than the catalog size.
+
+        Returns:
+            list: Uncompleted lesson IDs in topological order
+        """
+        completed_mask = self.completion_mask(completed_lessons)
+        candidates = set()
+        for lesson_id in completed_lessons:
+            candidates.update(self.dependents.get(lesson_id, ()))
+
+        unlocked = [
+            lesson_id for lesson_id in candidates
+            if not completed_mask >> self.bit[lesson_id] & 1
+            and self.prerequisites_met(lesson_id, completed_mask)
+        ]
+        unlocked.sort(key=lambda lesson_id: self.bit[lesson_id])
+        return unlocked
+
+    def find_cycle(self, lesson_id, prerequisites):
+        """
+        Check whether giving a lesson these prerequisites creates a cycle
+
+        Returns:
+            list or None: The cycle as lesson IDs, or None if the graph stays acyclic
+        """
+        # A cycle exists if lesson_id is reachable from a new prerequisite
+        # by following prerequisite edges
+        parent = {}
+        stack = []
+        for prereq in dict.fromkeys(prerequisites):
+            if prereq not in parent:
+                parent[prereq] = lesson_id
+                stack.append(prereq)
+
+        while stack:
+            node = stack.pop()
+            if node == lesson_id:
+                cycle = [lesson_id]
+                current = parent[lesson_id]
+                while current != lesson_id:
+                    cycle.append(current)
+                    current = parent[current]
+                cycle.append(lesson_id)
+                cycle.reverse()
+                return cycle
+            for prereq in self.prerequisites.get(node, ()):
+                if prereq not in parent:
+                    parent[prereq] = node
+                    stack.append(prereq)
+        return None
+
+    def update_lesson(self, lesson_id, prerequisites):
+        """
+        Incrementally replace one lesson's prerequisites
+
+        New lessons are appended to the bit order; bit positions of existing
+        lessons never move, so masks held by callers stay valid.
+
+        Raises:
+            PrerequisiteCycleError: If the new prerequisites create a cycle
+        """
+        prerequisites = list(dict.fromkeys(prerequisites or []))
+        cycle = self.find_cycle(lesson_id, prerequisites)
+        if cycle:
+            raise PrerequisiteCycleError(cycle)
+
+        for prereq in self.prerequisites.get(lesson_id, ()):
+            self.dependents[prereq].discard(lesson_id)
+        for prereq in prerequisites:
+            self.dependents[prereq].add(lesson_id)
+
+        self.prerequisites[lesson_id] = prerequisites
+        self._bit_for(lesson_id)
+        self.required[lesson_id] = self._mask(prerequisites)
+
+    def remove_lesson(self, lesson_id):
+        """Drop a deleted lesson; dependents keep requiring its bit"""
+        for prereq in self.prerequisites.pop(lesson_id, ()):
+            self.dependents[prereq].discard(lesson_id)
+        self.required.pop(lesson_id, None)
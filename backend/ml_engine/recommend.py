@@ -1,56 +1,110 @@
 """
 AI/ML Engine for Personalized Learning Recommendations
-Simplified version without numpy dependency
+Per-student methods work on plain dicts; batch methods use NumPy arrays
 """
 from datetime import datetime, timedelta
 from collections import defaultdict
+import numpy as np
+from .instrumentation import instrumented
+from .scoring import LessonScoringMatrix, StudentContext, scoring_model
+from .topic_index import LessonTopicIndex
 
 class AIEngine:
     """AI Engine for adaptive learning recommendations"""
     
     def __init__(self):
         # Bayesian Knowledge Tracing parameters
-        self.p_learn = 0.3  # Probability of learning
+        self.p_learn = 0.1  # Probability of learning
         self.p_guess = 0.25  # Probability of guessing correctly
         self.p_slip = 0.1   # Probability of making a mistake
+        self.p_init = 0.2   # Prior probability the skill is already known
+        
+        # Per-topic parameters fitted by train_bkt.py; topics without a fit
+        # use the defaults above, and report mastery from their accuracy
+        # (see _mastery_probabilities)
+        self.topic_params = {}
+        # Version stamp of the fitted parameters; stored posteriors are only
+        # comparable with them when they carry the same stamp
+        self.bkt_version = None
         
         # Difficulty levels
         self.difficulties = ['beginner', 'intermediate', 'advanced']
         
-    def evaluate_performance(self, attempts_data):
+    @instrumented(attempts='attempts_data')
+    def evaluate_performance(self, attempts_data, mastery_state=None):
         """
         Evaluate student performance and provide feedback
         
         Args:
             attempts_data: List of recent quiz attempts with scores and correctness
+            mastery_state: Optional stored BKT state, {topic: {'p_mastery', 'attempts', 'correct'}}
             
         Returns:
             dict: Evaluation results with feedback and weak areas
         """
         if not attempts_data:
-            return {
-                'overall_performance': 'No data',
-                'mastery_level': 0,
-                'weak_areas': [],
-                'feedback': 'Start taking quizzes to get personalized feedback!',
-                'confidence': 0
-            }
+            return self._no_evaluation()
         
         # Calculate metrics
         total_attempts = len(attempts_data)
         correct_count = sum(1 for a in attempts_data if a.get('is_correct', False))
-        accuracy = (correct_count / total_attempts) * 100 if total_attempts > 0 else 0
         
         # Calculate recent performance (last 10 attempts)
         recent_attempts = attempts_data[-10:]
         recent_correct = sum(1 for a in recent_attempts if a.get('is_correct', False))
-        recent_accuracy = (recent_correct / len(recent_attempts)) * 100 if recent_attempts else 0
         
         # Determine mastery level using BKT
-        mastery_level = self._calculate_mastery(attempts_data)
+        if mastery_state:
+            mastery_level = self._aggregate_mastery(mastery_state)
+            weak_areas = self._weak_topics(mastery_state)
+        else:
+            mastery_level = self._calculate_mastery(attempts_data)
+            weak_areas = self._identify_weak_areas(attempts_data)
         
-        # Identify weak areas
-        weak_areas = self._identify_weak_areas(attempts_data)
+        return self._evaluation(
+            total_attempts, correct_count, len(recent_attempts), recent_correct, mastery_level, weak_areas
+        )
+    
+    @instrumented()
+    def evaluate_from_features(self, features, mastery_state=None):
+        """
+        Evaluate student performance from stored running aggregates
+        
+        Args:
+            features: StudentFeatures.to_dict() (see ml_engine.features), or None
+            mastery_state: Optional stored BKT state, {topic: {'p_mastery', 'attempts', 'correct'}}
+            
+        Returns:
+            dict: Same shape as evaluate_performance, in O(1) of the history length
+        """
+        if not features or not features['attempts']:
+            return self._no_evaluation()
+        
+        recent = features['recent']
+        mastery_level, weak_areas = self._features_state(features, mastery_state)
+        
+        return self._evaluation(
+            features['attempts'],
+            features['correct'],
+            len(recent),
+            sum(correct for correct, _ in recent),
+            mastery_level,
+            weak_areas
+        )
+    
+    def _no_evaluation(self):
+        return {
+            'overall_performance': 'No data',
+            'mastery_level': 0,
+            'weak_areas': [],
+            'feedback': 'Start taking quizzes to get personalized feedback!',
+            'confidence': 0
+        }
+    
+    def _evaluation(self, total_attempts, correct_count, recent_total, recent_correct, mastery_level, weak_areas):
+        """Build the evaluation result from attempt counts"""
+        accuracy = (correct_count / total_attempts) * 100 if total_attempts > 0 else 0
+        recent_accuracy = (recent_correct / recent_total) * 100 if recent_total else 0
         
         # Generate feedback
         feedback = self._generate_feedback(accuracy, recent_accuracy, mastery_level, weak_areas)
@@ -70,7 +124,87 @@ class AIEngine:
             'trend': 'improving' if recent_accuracy > accuracy else 'declining' if recent_accuracy < accuracy else 'stable'
         }
     
-    def recommend_lessons(self, student_data, available_lessons, limit=5):
+    @instrumented(attempts='user_ids')
+    def evaluate_performance_batch(self, user_ids, scores, is_correct, timestamps, recent_window=10,
+                                   topics=None, mastery_states=None):
+        """
+        Evaluate many students at once from columnar attempt data
+        
+        Mastery follows evaluate_from_features: a student's stored BKT state
+        is used when given, otherwise the attempts are replayed per
+        (student, topic) with each topic's parameters.
+        
+        Args:
+            user_ids: Array of student IDs, one entry per attempt
+            scores: Array of attempt scores
+            is_correct: Array of attempt correctness flags
+            timestamps: Array of attempt times (any sortable dtype)
+            recent_window: Number of latest attempts used for recent accuracy
+            topics: Optional array of attempt topics (see knowledge_state.quiz_topic)
+            mastery_states: Optional {user_id: stored BKT state} (see knowledge_state.load_mastery)
+            
+        Returns:
+            dict: Columnar metrics with one row per distinct user_id
+        """
+        user_ids = np.asarray(user_ids)
+        if user_ids.size == 0:
+            return {
+                'user_id': user_ids,
+                'total_attempts': np.zeros(0, dtype=np.int64),
+                'accuracy': np.zeros(0),
+                'recent_accuracy': np.zeros(0),
+                'average_score': np.zeros(0),
+                'mastery_level': np.zeros(0),
+                'confidence': np.zeros(0),
+                'trend': np.zeros(0, dtype='<U9')
+            }
+        
+        # Group attempts by student, oldest first within each group
+        order = np.lexsort((np.asarray(timestamps), user_ids))
+        users = user_ids[order]
+        correct = np.asarray(is_correct, dtype=bool)[order]
+        score_values = np.asarray(scores, dtype=float)[order]
+        
+        unique_users, starts, counts = np.unique(users, return_index=True, return_counts=True)
+        group = np.repeat(np.arange(len(unique_users)), counts)
+        correct_values = correct.astype(float)
+        
+        # Overall accuracy and average score
+        accuracy = np.add.reduceat(correct_values, starts) / counts * 100
+        average_score = np.add.reduceat(score_values, starts) / counts
+        
+        # Recent accuracy over the last `recent_window` attempts of each student
+        position = np.arange(users.size) - np.repeat(starts, counts)
+        recent = position >= np.repeat(counts - recent_window, counts)
+        recent_correct = np.bincount(group[recent], weights=correct_values[recent], minlength=len(unique_users))
+        recent_accuracy = recent_correct / np.minimum(counts, recent_window) * 100
+        
+        mastery_level = self._topic_batch_mastery(
+            user_ids, np.asarray(is_correct, dtype=bool), np.asarray(timestamps), topics, unique_users, counts
+        )
+        for i, user_id in enumerate(unique_users.tolist()):
+            state = (mastery_states or {}).get(user_id)
+            if state:
+                mastery_level[i] = self._aggregate_mastery(state)
+        confidence = np.minimum(counts / 20, 1.0) * 100
+        trend = np.where(
+            recent_accuracy > accuracy, 'improving',
+            np.where(recent_accuracy < accuracy, 'declining', 'stable')
+        )
+        
+        return {
+            'user_id': unique_users,
+            'total_attempts': counts,
+            'accuracy': np.round(accuracy, 2),
+            'recent_accuracy': np.round(recent_accuracy, 2),
+            'average_score': np.round(average_score, 2),
+            'mastery_level': np.round(mastery_level, 2),
+            'confidence': np.round(confidence, 2),
+            'trend': trend
+        }
+    
+    @instrumented(attempts='student_data.attempts', lessons='available_lessons')
+    def recommend_lessons(self, student_data, available_lessons, limit=5, matrix=None, spec=None):
         """
         Recommend next lessons based on student performance
         
@@ -78,20 +212,30 @@ class AIEngine:
             student_data: Student profile and performance data
             available_lessons: List of available lessons
             limit: Maximum number of recommendations
+            matrix: Optional prebuilt LessonScoringMatrix over available_lessons
+            spec: Optional ScoringSpec; defaults to the live scoring_model spec
             
         Returns:
             list: Recommended lessons with reasons
         """
-        if not available_lessons:
+        if matrix is None:
+            matrix = LessonScoringMatrix(available_lessons)
+        if not len(matrix) or limit <= 0:
             return []
+        if spec is None:
+            spec = scoring_model.current()
         
-        student_profile = student_data.get('profile', {})
         attempts = student_data.get('attempts', [])
-        completed_lessons = student_data.get('completed_lessons', [])
+        features = student_data.get('features')
+        completed_lessons = set(student_data.get('completed_lessons', []))
+        mastery_state = student_data.get('mastery')
         
         # Calculate student's current level
-        avg_score = student_profile.get('average_score', 0)
-        mastery_level = self._calculate_mastery(attempts)
+        if mastery_state or features:
+            mastery_level, weak_areas = self._features_state(features, mastery_state)
+        else:
+            mastery_level = self._calculate_mastery(attempts)
+            weak_areas = self._identify_weak_areas(attempts)
         
         # Determine appropriate difficulty
         if mastery_level < 40:
@@ -101,67 +245,86 @@ class AIEngine:
         else:
             target_difficulty = 'advanced'
         
-        # Score lessons
-        lesson_scores = []
-        for lesson in available_lessons:
-            if lesson['id'] in completed_lessons:
-                continue
-                
-            score = 0
-            reason = []
-            
-            # Match difficulty level
-            if lesson.get('difficulty') == target_difficulty:
-                score += 50
-                reason.append(f"Matches your {target_difficulty} level")
-            
-            # Prefer lessons in weak subjects
-            weak_areas = self._identify_weak_areas(attempts)
-            if lesson.get('subject') in weak_areas:
-                score += 30
-                reason.append("Helps improve weak areas")
-            
-            # Check prerequisites
-            prereqs = lesson.get('prerequisites', [])
-            if all(p in completed_lessons for p in prereqs):
-                score += 20
-                reason.append("Prerequisites completed")
-            elif prereqs:
-                score -= 30
-                reason.append("Missing prerequisites")
-            
-            lesson_scores.append({
-                'lesson': lesson,
-                'score': score,
-                'reason': ' | '.join(reason) if reason else 'Recommended for you'
+        # Score every lesson at once: feature columns x weight vector
+        context = StudentContext(matrix, target_difficulty, set(weak_areas), completed_lessons)
+        columns = spec.feature_columns(context)
+        scores = spec.score(columns)
+        
+        eligible = ~np.isin(matrix.lesson_ids, context.completed_ids)
+        k = min(limit, int(eligible.sum()))
+        if k == 0:
+            return []
+        scores[~eligible] = -np.inf
+        
+        # Top-k in linear time; ties at the cut keep catalog order like a stable sort
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        rows = np.concatenate([above, tied])
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        
+        recommendations = []
+        for row in rows:
+            score = float(scores[row])
+            recommendations.append({
+                **matrix.lessons[row],
+                'recommendation_reason': spec.reason([column[row] for column in columns], context),
+                'recommendation_score': int(score) if score.is_integer() else round(score, 4)
             })
         
-        # Sort by score and return top recommendations
-        lesson_scores.sort(key=lambda x: x['score'], reverse=True)
+        return recommendations
+    
+    @instrumented(lessons='lessons_by_id')
+    def recommend_collaborative(self, user_id, student_data, model, lessons_by_id, limit=5, graph=None):
+        """
+        Recommend lessons that students with similar histories studied
+        
+        Args:
+            user_id: Student ID
+            student_data: Student data with 'completed_lessons'
+            model: Built ItemItemModel
+            lessons_by_id: Lesson dicts by ID from the catalog
+            limit: Maximum number of recommendations
+            graph: Optional compiled PrerequisiteGraph; locked lessons are skipped
+            
+        Returns:
+            list: Recommended lessons with reasons
+        """
+        completed_lessons = set(student_data.get('completed_lessons', []))
+        if graph is not None:
+            completed_mask = graph.completion_mask(completed_lessons)
+        
+        def eligible(lesson_id):
+            lesson = lessons_by_id.get(lesson_id)
+            if lesson is None or not lesson['is_published'] or lesson_id in completed_lessons:
+                return False
+            return graph is None or graph.prerequisites_met(lesson_id, completed_mask)
         
         recommendations = []
-        for item in lesson_scores[:limit]:
+        for lesson_id, score, source_id in model.recommend(user_id, limit, eligible):
+            source = lessons_by_id.get(source_id)
+            reason = f"Students who studied {source['title']} also studied this" if source else 'Recommended for you'
             recommendations.append({
-                **item['lesson'],
-                'recommendation_reason': item['reason'],
-                'recommendation_score': item['score']
+                **lessons_by_id[lesson_id],
+                'recommendation_reason': reason,
+                'recommendation_score': round(score, 4)
             })
         
         return recommendations
     
-    def detect_learning_gaps(self, attempts, lessons):
+    @instrumented(attempts='attempts', lessons='lessons')
+    def detect_learning_gaps(self, attempts, lessons, topic_index=None):
         """
         Detect knowledge gaps based on performance
         
         Args:
             attempts: Student's quiz attempts
             lessons: Available lessons
+            topic_index: Prebuilt LessonTopicIndex over the lessons (optional)
             
         Returns:
             list: Identified learning gaps with suggestions
         """
-        gaps = []
-        
         # Group attempts by topic/subject
         topic_performance = defaultdict(list)
         for attempt in attempts:
@@ -169,27 +332,46 @@ class AIEngine:
             score = attempt.get('score', 0)
             topic_performance[topic].append(score)
         
+        return self.detect_learning_gaps_from_aggregates([
+            {'topic': topic, 'average_score': sum(scores) / len(scores), 'attempts_count': len(scores)}
+            for topic, scores in topic_performance.items()
+            if scores
+        ], lessons, topic_index)
+    
+    @instrumented(topics='topic_stats', lessons='lessons')
+    def detect_learning_gaps_from_aggregates(self, topic_stats, lessons, topic_index=None):
+        """
+        Detect knowledge gaps from per-topic score aggregates
+        
+        Args:
+            topic_stats: List of dicts with 'topic', 'average_score' (0-100)
+                and 'attempts_count', e.g. from a GROUP BY query
+            lessons: Available lessons
+            topic_index: Prebuilt LessonTopicIndex over the lessons (optional)
+            
+        Returns:
+            list: Identified learning gaps with suggestions
+        """
+        gaps = []
+        
+        if topic_index is None:
+            topic_index = LessonTopicIndex(lessons)
+        
         # Identify weak topics
-        for topic, scores in topic_performance.items():
-            if not scores:
-                continue
-                
-            avg_score = sum(scores) / len(scores)
+        for stats in topic_stats:
+            topic = stats['topic']
+            avg_score = stats['average_score']
             
             if avg_score < 60:
                 # Find related lessons
-                related_lessons = [
-                    l for l in lessons 
-                    if l.get('subject', '').lower() == topic.lower() 
-                    or topic.lower() in l.get('title', '').lower()
-                ]
+                related_lessons = topic_index.lookup(topic, limit=3)
                 
                 gaps.append({
                     'topic': topic,
                     'average_score': round(avg_score, 2),
                     'severity': 'high' if avg_score < 40 else 'medium',
-                    'attempts_count': len(scores),
-                    'suggested_lessons': [l['id'] for l in related_lessons[:3]],
+                    'attempts_count': stats['attempts_count'],
+                    'suggested_lessons': related_lessons,
                     'description': f"Your average score in {topic} is {avg_score:.1f}%. Consider reviewing related lessons."
                 })
         
@@ -198,6 +380,7 @@ class AIEngine:
         
         return gaps
     
+    @instrumented()
     def generate_adaptive_hint(self, question, student_performance, difficulty='medium'):
         """
         Generate contextual hints based on student performance
@@ -242,6 +425,68 @@ class AIEngine:
         
         return hint
     
+    @instrumented()
+    def generate_feedback(self, quiz_data, user_answer, correct_answer):
+        """
+        Generate feedback for one submitted answer
+        
+        Args:
+            quiz_data: Quiz dictionary including options and explanation
+            user_answer: Index of the chosen option
+            correct_answer: Index of the correct option
+            
+        Returns:
+            str: Feedback text
+        """
+        options = quiz_data.get('options') or []
+        if isinstance(user_answer, int) and 0 <= user_answer < len(options):
+            return self._option_feedback(quiz_data, user_answer, correct_answer)
+        
+        feedback = ["That answer isn't one of the options."]
+        if 0 <= correct_answer < len(options):
+            feedback.append(f"The correct answer is \"{options[correct_answer]}\".")
+        if quiz_data.get('explanation'):
+            feedback.append(quiz_data['explanation'])
+        return ' '.join(feedback)
+    
+    @instrumented()
+    def compile_feedback(self, quiz_data):
+        """
+        Precompute the feedback for every option of a quiz
+        
+        Args:
+            quiz_data: Quiz dictionary including options and explanation
+            
+        Returns:
+            list: Feedback text indexed by option
+        """
+        correct_answer = quiz_data.get('correct_answer', 0)
+        return [
+            self._option_feedback(quiz_data, index, correct_answer)
+            for index in range(len(quiz_data.get('options') or []))
+        ]
+    
+    def _option_feedback(self, quiz_data, index, correct_answer):
+        """Feedback for choosing option `index`"""
+        options = quiz_data['options']
+        explanation = quiz_data.get('explanation')
+        
+        if index == correct_answer:
+            feedback = ["Correct! Well done."]
+            if explanation:
+                feedback.append(explanation)
+            return ' '.join(feedback)
+        
+        feedback = [f"Not quite. You chose \"{options[index]}\"."]
+        if 0 <= correct_answer < len(options):
+            feedback.append(f"The correct answer is \"{options[correct_answer]}\".")
+        if explanation:
+            feedback.append(explanation)
+        elif quiz_data.get('hint'):
+            feedback.append(f"Hint: {quiz_data['hint']}")
+        return ' '.join(feedback)
+    
+    @instrumented(attempts='student_data.attempts')
     def predict_success_probability(self, student_data, quiz_data):
         """
         Predict probability of success on a quiz
@@ -253,55 +498,297 @@ class AIEngine:
         Returns:
             float: Probability of success (0-100)
         """
-        # Base probability on recent performance
-        attempts = student_data.get('attempts', [])
-        if not attempts:
-            return 50.0  # Neutral starting point
+        return float(self.predict_success_batch(student_data, [quiz_data])[0])
+    
+    @instrumented(attempts='student_data.attempts', quizzes='quizzes')
+    def predict_success_batch(self, student_data, quizzes):
+        """
+        Predict probability of success on many quizzes at once
         
-        # Calculate recent success rate
-        recent = attempts[-5:] if len(attempts) >= 5 else attempts
-        success_count = sum(1 for a in recent if a.get('score', 0) >= 70)
-        base_probability = (success_count / len(recent)) * 100
+        The student's state is derived once and the per-quiz scoring is
+        vectorized, so scoring a whole lesson costs about as much as one quiz.
         
-        # Adjust for quiz difficulty
-        quiz_difficulty = quiz_data.get('difficulty', 'intermediate')
-        mastery = self._calculate_mastery(attempts)
+        When the student has a calibrated IRT ability ('ability') and a quiz
+        has calibrated item parameters ('irt': (difficulty, discrimination)),
+        the 2PL logistic model is used for that quiz instead of the heuristic.
+        
+        Args:
+            student_data: Student's profile and performance
+            quizzes: List of quiz dicts with 'difficulty' and 'topic'
+            
+        Returns:
+            np.ndarray: Probability of success (0-100) per quiz, in input order
+        """
+        probability = self._predict_success_heuristic(student_data, quizzes)
+        
+        theta = student_data.get('ability')
+        if theta is None:
+            return probability
+        
+        calibrated = [i for i, quiz in enumerate(quizzes) if quiz.get('irt')]
+        if calibrated:
+            difficulty, discrimination = np.array([quizzes[i]['irt'] for i in calibrated], dtype=float).T
+            probability[calibrated] = np.round(
+                100 / (1 + np.exp(-discrimination * (theta - difficulty))), 2
+            )
         
-        if quiz_difficulty == 'beginner' and mastery > 40:
-            adjustment = 20
-        elif quiz_difficulty == 'advanced' and mastery < 60:
-            adjustment = -20
+        return probability
+    
+    def _predict_success_heuristic(self, student_data, quizzes):
+        """Mastery/recent-performance estimate used for uncalibrated quizzes"""
+        n = len(quizzes)
+        attempts = student_data.get('attempts', [])
+        mastery_state = student_data.get('mastery')
+        
+        if mastery_state:
+            # Probability of a correct answer under the stored BKT posterior,
+            # resolved once per distinct topic
+            overall = self._aggregate_mastery(mastery_state) / 100
+            probabilities = self._mastery_probabilities(mastery_state)
+            topic_rows = {}
+            inverse = np.empty(n, dtype=np.intp)
+            for i, quiz in enumerate(quizzes):
+                inverse[i] = topic_rows.setdefault(quiz.get('topic'), len(topic_rows))
+            
+            p_known = np.empty(len(topic_rows))
+            p_guess = np.empty(len(topic_rows))
+            p_slip = np.empty(len(topic_rows))
+            for topic, row in topic_rows.items():
+                p_known[row] = probabilities.get(topic, overall)
+                _, _, p_guess[row], p_slip[row] = self._bkt_params(topic)
+            
+            p_correct = p_known * (1 - p_slip) + (1 - p_known) * p_guess
+            base_probability = p_correct[inverse] * 100
+            mastery = p_known[inverse] * 100
+        elif attempts:
+            # Base probability on recent performance
+            recent = attempts[-5:] if len(attempts) >= 5 else attempts
+            success_count = sum(1 for a in recent if a.get('score', 0) >= 70)
+            base_probability = np.full(n, (success_count / len(recent)) * 100)
+            mastery = np.full(n, self._calculate_mastery(attempts))
         else:
-            adjustment = 0
+            return np.full(n, 50.0)  # Neutral starting point
         
-        # Final probability
-        probability = max(0, min(100, base_probability + adjustment))
+        # Adjust for quiz difficulty
+        difficulty = np.array([q.get('difficulty', 'intermediate') for q in quizzes], dtype=object)
+        adjustment = np.select(
+            [(difficulty == 'beginner') & (mastery > 40), (difficulty == 'advanced') & (mastery < 60)],
+            [20, -20],
+            0
+        )
         
-        return round(probability, 2)
+        # Final probability
+        return np.round(np.clip(base_probability + adjustment, 0, 100), 2)
     
     # Helper methods
     
-    def _calculate_mastery(self, attempts):
-        """Calculate mastery level using simplified BKT"""
-        if not attempts:
-            return 0.0
+    def apply_model(self, artifact):
+        """
+        Use the per-topic BKT parameters of a model registry version
         
-        # Simple approach: weighted average of recent performance
-        total = len(attempts)
-        recent_weight = 0.7
-        overall_weight = 0.3
+        train_bkt.py publishes them as 'bkt_params' (one row of
+        p_init, p_learn, p_guess, p_slip per topic in params['bkt_topics']).
+        """
+        if not artifact.has('bkt_params'):
+            return
         
-        # Overall performance
-        overall_score = sum(a.get('score', 0) for a in attempts) / total if total > 0 else 0
+        self.topic_params = {
+            topic: tuple(float(value) for value in row)
+            for topic, row in zip(artifact.params.get('bkt_topics', []), artifact.arrays['bkt_params'])
+        }
+        self.bkt_version = artifact.params.get('bkt_version')
+    
+    def params_version(self, topic):
+        """Version stamp of the parameters used for a topic, None for the defaults"""
+        return self.bkt_version if topic in self.topic_params else None
+    
+    def _bkt_params(self, topic=None):
+        """(p_init, p_learn, p_guess, p_slip) for a topic"""
+        params = self.topic_params.get(topic)
+        if params is None:
+            return self.p_init, self.p_learn, self.p_guess, self.p_slip
+        return params
+    
+    def initial_mastery(self, topic=None):
+        """Prior mastery for a topic the student has not attempted yet"""
+        return self._bkt_params(topic)[0]
+    
+    def update_mastery(self, p_mastery, is_correct, topic=None):
+        """
+        Apply one Bayesian Knowledge Tracing step
+        
+        Args:
+            p_mastery: Prior probability that the skill is known
+            is_correct: Whether the observed answer was correct
+            topic: Topic whose fitted parameters to use, if any
+            
+        Returns:
+            float: Posterior probability after the learning transition
+        """
+        _, p_learn, p_guess, p_slip = self._bkt_params(topic)
+        if is_correct:
+            known = p_mastery * (1 - p_slip)
+            posterior = known / (known + (1 - p_mastery) * p_guess)
+        else:
+            known = p_mastery * p_slip
+            posterior = known / (known + (1 - p_mastery) * (1 - p_guess))
+        
+        return posterior + (1 - posterior) * p_learn
+    
+    def _update_mastery_array(self, p_mastery, is_correct, p_learn, p_guess, p_slip):
+        """Vectorized update_mastery over arrays of states, observations and parameters"""
+        known = np.where(is_correct, p_mastery * (1 - p_slip), p_mastery * p_slip)
+        unknown = np.where(is_correct, (1 - p_mastery) * p_guess, (1 - p_mastery) * (1 - p_guess))
+        posterior = known / (known + unknown)
+        
+        return posterior + (1 - posterior) * p_learn
+    
+    def _batch_mastery(self, correct, starts, counts, params):
+        """
+        Replay grouped attempt sequences through BKT in lock-step
         
-        # Recent performance (last 10 or all if less)
-        recent = attempts[-10:] if len(attempts) > 10 else attempts
-        recent_score = sum(a.get('score', 0) for a in recent) / len(recent) if recent else 0
+        Groups are ordered by length so the groups still active at each
+        step form a prefix; total work is proportional to the attempt count.
         
-        # Weighted mastery
-        mastery = (recent_score * recent_weight) + (overall_score * overall_weight)
+        Args:
+            params: (groups, 4) array of p_init, p_learn, p_guess, p_slip
+        """
+        by_length = np.argsort(-counts, kind='stable')
+        sorted_starts = starts[by_length]
+        negative_counts = -counts[by_length]
+        p_init, p_learn, p_guess, p_slip = params[by_length].T
+        
+        p_mastery = p_init.copy()
+        for step in range(-negative_counts[0]):
+            active = np.searchsorted(negative_counts, -step, side='left')
+            observed = correct[sorted_starts[:active] + step]
+            p_mastery[:active] = self._update_mastery_array(
+                p_mastery[:active], observed, p_learn[:active], p_guess[:active], p_slip[:active]
+            )
+        
+        result = np.empty_like(p_mastery)
+        result[by_length] = p_mastery
+        return result
+    
+    def _topic_batch_mastery(self, user_ids, correct, timestamps, topics, unique_users, counts):
+        """
+        Mastery level (0-100) per student from attempts grouped by (student, topic)
         
-        return mastery
+        Takes the unsorted attempt columns; unique_users and counts are the
+        caller's per-student grouping. Topic probabilities follow _mastery_probabilities (BKT posterior for
+        fitted topics, accuracy otherwise) and are attempt-weighted like
+        _aggregate_mastery.
+        """
+        if topics is None:
+            topics = np.full(len(user_ids), None, dtype=object)
+        topic_names, topic_codes = np.unique(np.asarray(topics, dtype=object).astype(str), return_inverse=True)
+        topic_names = [None if name == 'None' else name for name in topic_names.tolist()]
+        
+        order = np.lexsort((timestamps, topic_codes, user_ids))
+        users, codes, observed = user_ids[order], topic_codes[order], correct[order]
+        
+        starts = np.flatnonzero(np.r_[True, (users[1:] != users[:-1]) | (codes[1:] != codes[:-1])])
+        group_counts = np.diff(np.r_[starts, len(order)])
+        group_topics = [topic_names[code] for code in codes[starts].tolist()]
+        
+        params = np.array([self._bkt_params(topic) for topic in group_topics], dtype=float).reshape(-1, 4)
+        posterior = self._batch_mastery(observed, starts, group_counts, params)
+        
+        # Unfitted topics: mastery implied by the smoothed accuracy
+        group_correct = np.add.reduceat(observed.astype(float), starts)
+        accuracy = (group_correct + 1) / (group_counts + 2)
+        p_guess, p_slip = params[:, 2], params[:, 3]
+        from_accuracy = np.clip((accuracy - p_guess) / (1 - p_slip - p_guess), 0, 1)
+        fitted = np.array([topic in self.topic_params for topic in group_topics], dtype=bool)
+        probability = np.where(fitted, posterior, from_accuracy)
+        
+        group_user = np.searchsorted(unique_users, users[starts])
+        weighted = np.bincount(group_user, probability * group_counts, minlength=len(unique_users))
+        return weighted / counts * 100
+    
+    def _p_correct(self, p_mastery, topic=None):
+        """Probability of a correct answer given the mastery probability"""
+        _, _, p_guess, p_slip = self._bkt_params(topic)
+        return p_mastery * (1 - p_slip) + (1 - p_mastery) * p_guess
+    
+    def _accuracy_mastery(self, correct, attempts, topic=None):
+        """
+        Mastery probability implied by accuracy alone
+        
+        Inverts P(correct) = m * (1 - slip) + (1 - m) * guess for the
+        smoothed accuracy, so a student answering at chance reads as 0 and
+        one never slipping as 1.
+        """
+        if not attempts:
+            return 0.0
+        _, _, p_guess, p_slip = self._bkt_params(topic)
+        accuracy = (correct + 1) / (attempts + 2)
+        return min(max((accuracy - p_guess) / (1 - p_slip - p_guess), 0.0), 1.0)
+    
+    def _mastery_probabilities(self, mastery_state):
+        """
+        Mastery probability per stored topic state
+        
+        BKT without forgetting drifts towards 1 for any student who keeps
+        answering, so the posterior is only trusted for topics whose
+        parameters train_bkt.py fitted to real data, and only when it was
+        computed under those parameters (its 'params_version' matches);
+        other states use their stored accuracy.
+        
+        Returns:
+            dict: {topic: probability}
+        """
+        return {
+            topic: state['p_mastery'] if 'correct' not in state or (
+                state.get('params_version') is not None
+                and state['params_version'] == self.params_version(topic)
+            ) else self._accuracy_mastery(state['correct'], state['attempts'], topic)
+            for topic, state in mastery_state.items()
+        }
+    
+    def _calculate_mastery(self, attempts):
+        """Mastery level (0-100) from attempts without a stored state"""
+        correct = sum(1 for attempt in attempts if attempt.get('is_correct', False))
+        return self._accuracy_mastery(correct, len(attempts)) * 100
+    
+    def _aggregate_mastery(self, mastery_state):
+        """Attempt-weighted mastery (0-100) across stored topic states"""
+        total = sum(state['attempts'] for state in mastery_state.values())
+        if total == 0:
+            return 0.0
+        
+        probabilities = self._mastery_probabilities(mastery_state)
+        weighted = sum(probabilities[topic] * state['attempts'] for topic, state in mastery_state.items())
+        return (weighted / total) * 100
+    
+    def _weak_topics(self, mastery_state):
+        """Topics whose mastery is below 60% (weakest first)"""
+        weak = [
+            (p_mastery, topic)
+            for topic, p_mastery in self._mastery_probabilities(mastery_state).items()
+            if p_mastery < 0.6
+        ]
+        weak.sort()
+        
+        return [topic for _, topic in weak[:3]]  # Return top 3 weak topics
+    
+    def _features_state(self, features, mastery_state=None):
+        """(mastery level, weak topics), preferring stored BKT state over features"""
+        if mastery_state:
+            return self._aggregate_mastery(mastery_state), self._weak_topics(mastery_state)
+        if not features:
+            return 0.0, []
+        
+        # No stored knowledge state: replay the recent results and use topic averages
+        mastery_level = self._calculate_mastery([{'is_correct': correct} for correct, _ in features['recent']])
+        weak = []
+        for topic, (attempts, _, score_sum, points_possible) in features['topics'].items():
+            average = score_sum / points_possible * 100 if points_possible else 0
+            if attempts and average < 60:
+                weak.append((average, topic))
+        weak.sort()
+        
+        return mastery_level, [topic for _, topic in weak[:3]]
     
     def _identify_weak_areas(self, attempts):
         """Identify topics where student is struggling"""
@@ -0,0 +1,263 @@
+"""
+Versioned registry of trained model artifacts
+Each version is a directory of .npy arrays plus a manifest.json with the
+scalar parameters. Arrays are opened with np.load(mmap_mode='r'), so every
+worker process maps the same file pages instead of holding its own copy.
+
+    <ML_MODEL_DIR>/
+        CURRENT                     # Name of the live version
+        versions/20261017T043812/
+            manifest.json
+            bkt_params.npy
+            ...
+
+Publishing writes a new version directory and then replaces CURRENT with
+os.replace, which is atomic. Workers poll CURRENT and swap to the new
+version on their next request without restarting. Publishers and prune
+hold an exclusive lock on PUBLISH_LOCK, so concurrent training scripts
+each build on the previous version instead of overwriting it.
+"""
+import os
+import json
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+try:
+    import fcntl  # Locks publishing across processes on POSIX
+except ImportError:
+    fcntl = None
+    try:
+        import msvcrt  # Same on Windows
+    except ImportError:
+        msvcrt = None
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+PUBLISH_LOCK = '.publish.lock'
+
+
+class ModelArtifact:
+    """One loaded model version: JSON parameters plus memory-mapped arrays"""
+
+    def __init__(self, version, path, manifest):
+        self.version = version
+        self.path = path
+        self.created_at = manifest.get('created_at')
+        self.params = manifest.get('params', {})
+        self.arrays = {
+            name: self._open(os.path.join(path, f'{name}.npy'))
+            for name in manifest.get('arrays', [])
+        }
+
+    @staticmethod
+    def _open(path):
+        try:
+            return np.load(path, mmap_mode='r')
+        except ValueError:
+            return np.load(path)  # Empty arrays cannot be memory-mapped
+
+    def has(self, *names):
+        return all(name in self.arrays for name in names)
+
+    def __repr__(self):
+        return f'<ModelArtifact {self.version} arrays={sorted(self.arrays)}>'
+
+
+class ModelRegistry:
+    """Publishes model versions and hot-swaps the live one in each worker"""
+
+    def __init__(self, root=None, check_interval=10):
+        self.root = root
+        self.check_interval = check_interval  # Seconds between CURRENT checks
+        self.artifact = None
+        self._current_stat = None
+        self._checked_at = 0.0
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def configure(self, root=None, check_interval=None):
+        """Apply settings from the app config"""
+        if root is not None:
+            self.root = root
+        if check_interval is not None:
+            self.check_interval = check_interval
+
+    def subscribe(self, callback):
+        """Call callback(artifact) whenever a new version goes live"""
+        self._subscribers.append(callback)
+        if self.artifact is not None:
+            callback(self.artifact)
+
+    def _versions_dir(self):
+        return os.path.join(self.root, 'versions')
+
+    def _current_path(self):
+        return os.path.join(self.root, CURRENT_FILE)
+
+    @contextmanager
+    def _publish_lock(self):
+        """Hold the registry's exclusive publish lock (blocks until free)"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, PUBLISH_LOCK), 'a+') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                lock.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK gives up after about 10 seconds
+            try:
+                yield
+            finally:
+                if fcntl is None and msvcrt is not None:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def current_version(self):
+        """Name of the live version, or None if nothing was published"""
+        try:
+            with open(self._current_path()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def poll(self, force=False):
+        """
+        Load the live version if CURRENT changed since the last check
+
+        Cheap enough to call on every request: it stats one file at most
+        once per check_interval.
+
+        Returns:
+            ModelArtifact or None: The live artifact
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return self.artifact
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self._current_path())
+                current_stat = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                current_stat = None
+
+            if current_stat == self._current_stat and not force:
+                return self.artifact
+            self._current_stat = current_stat
+
+            version = self.current_version()
+            if version is None or (self.artifact and self.artifact.version == version):
+                return self.artifact
+
+            artifact = self.load(version)
+            self.artifact = artifact
+
+        for callback in self._subscribers:
+            callback(artifact)
+        return artifact
+
+    def load(self, version):
+        """Open a published version"""
+        path = os.path.join(self._versions_dir(), version)
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        return ModelArtifact(version, path, manifest)
+
+    def publish(self, arrays=None, params=None, base=True):
+        """
+        Write a new version and make it live
+
+        Args:
+            arrays: {name: np.ndarray} to store
+            params: JSON-serializable scalar parameters
+            base: Carry over arrays/params of the live version that are not
+                being replaced, so each version is a complete model
+
+        Returns:
+            str: The new version name
+        """
+        with self._publish_lock():
+            return self._publish(arrays, params, base)
+
+    def _publish(self, arrays, params, base):
+        arrays = dict(arrays or {})
+        params = dict(params or {})
+
+        previous = None
+        if base:
+            version = self.current_version()
+            previous = self.load(version) if version else None
+
+        os.makedirs(self._versions_dir(), exist_ok=True)
+        version = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        staging = os.path.join(self._versions_dir(), f'.{version}.tmp')
+        os.makedirs(staging)
+
+        try:
+            if previous is not None:
+                params = {**previous.params, **params}
+                for name in previous.arrays:
+                    if name not in arrays:
+                        # Unchanged arrays are linked rather than copied
+                        source = os.path.join(previous.path, f'{name}.npy')
+                        target = os.path.join(staging, f'{name}.npy')
+                        try:
+                            os.link(source, target)
+                        except OSError:
+                            shutil.copyfile(source, target)
+
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+
+            names = sorted(set(arrays) | set(previous.arrays if previous else ()))
+            with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+                json.dump({
+                    'version': version,
+                    'created_at': datetime.utcnow().isoformat(),
+                    'arrays': names,
+                    'params': params
+                }, f)
+
+            os.rename(staging, os.path.join(self._versions_dir(), version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # Swap the pointer atomically; readers see the old or the new name
+        tmp_path = self._current_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self._current_path())
+        return version
+
+    def prune(self, keep=3):
+        """Delete all but the newest `keep` versions (never the live one)"""
+        with self._publish_lock():
+            return self._prune(keep)
+
+    def _prune(self, keep):
+        live = self.current_version()
+        try:
+            versions = sorted(
+                name for name in os.listdir(self._versions_dir()) if not name.startswith('.')
+            )
+        except FileNotFoundError:
+            return []
+
+        removed = [name for name in versions[:max(len(versions) - keep, 0)] if name != live]
+        for name in removed:
+            shutil.rmtree(os.path.join(self._versions_dir(), name), ignore_errors=True)
+        return removed
+
+
+# Create singleton instance
+model_registry = ModelRegistry()
@@ -0,0 +1,229 @@
+"""
+SM-2 spaced-repetition scheduling of quiz reviews
+Each (student, quiz) pair has a ReviewItem row holding its SM-2 state and
+next due time. Every worker keeps a min-heap of due times for the students
+it served recently, loaded once from the (user_id, due_at) index, so an
+attempt is an O(log n) push and "what is due now" pops only the due items
+instead of scanning the student's attempt history.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from database import db
+from models.quiz import ReviewItem
+from utils.db_utils import insert_missing
+
+INITIAL_EASINESS = 2.5
+MIN_EASINESS = 1.3
+CORRECT_QUALITY = 4  # SM-2 response quality (0-5) assigned to a correct attempt
+INCORRECT_QUALITY = 1
+MAX_INTERVAL_DAYS = 365.0  # Long streaks would otherwise overflow datetime
+
+
+def schedule_review(easiness, interval_days, repetitions, quality):
+    """
+    Apply one SM-2 review
+
+    Args:
+        easiness: Current easiness factor
+        interval_days: Current interval
+        repetitions: Consecutive successful reviews so far
+        quality: Response quality from 0 (blackout) to 5 (perfect)
+
+    Returns:
+        tuple: (easiness, interval_days, repetitions) after the review
+    """
+    easiness = max(MIN_EASINESS, easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    if quality < 3:
+        return easiness, 1.0, 0
+
+    repetitions += 1
+    if repetitions == 1:
+        interval_days = 1.0
+    elif repetitions == 2:
+        interval_days = 6.0
+    else:
+        interval_days = min(round(interval_days * easiness, 2), MAX_INTERVAL_DAYS)
+    return easiness, interval_days, repetitions
+
+
+def apply_review(item, is_correct, reviewed_at):
+    """Update a ReviewItem for one attempt and set its next due time"""
+    quality = CORRECT_QUALITY if is_correct else INCORRECT_QUALITY
+    item.easiness, item.interval_days, item.repetitions = schedule_review(
+        item.easiness, item.interval_days, item.repetitions, quality
+    )
+    if not is_correct:
+        item.lapses += 1
+    item.last_reviewed_at = reviewed_at
+    item.due_at = reviewed_at + timedelta(days=item.interval_days)
+    return item
+
+
+class _StudentQueue:
+    """Min-heap of (due_at, quiz_id) with lazy deletion of superseded entries"""
+
+    def __init__(self, rows):
+        self.loaded_at = time.time()
+        self.due_at = {quiz_id: due_at for quiz_id, due_at in rows}
+        self.heap = [(due_at, quiz_id) for quiz_id, due_at in self.due_at.items()]
+        heapq.heapify(self.heap)
+
+    def push(self, quiz_id, due_at):
+        self.due_at[quiz_id] = due_at
+        heapq.heappush(self.heap, (due_at, quiz_id))
+
+        # Rebuild once stale entries dominate so the heap stays O(items)
+        if len(self.heap) > 2 * len(self.due_at) + 16:
+            self.heap = [(due, quiz) for quiz, due in self.due_at.items()]
+            heapq.heapify(self.heap)
+
+    def _drop_stale(self):
+        while self.heap and self.due_at.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now, limit):
+        """Items due at or before now, most overdue first, plus the next due time"""
+        popped = []
+        self._drop_stale()
+        while self.heap and len(popped) < limit and self.heap[0][0] <= now:
+            popped.append(heapq.heappop(self.heap))
+            self._drop_stale()
+
+        next_due = self.heap[0][0] if self.heap else None
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return [(quiz_id, due_at) for due_at, quiz_id in popped], next_due
+
+
+def _locked_items(user_id, quiz_ids):
+    """Fetch a student's review rows for the given quizzes, locked for update"""
+    return {
+        item.quiz_id: item for item in ReviewItem.query.filter(
+            ReviewItem.user_id == user_id,
+            ReviewItem.quiz_id.in_(quiz_ids)
+        ).with_for_update().populate_existing()
+    }
+
+
+class ReviewScheduler:
+    """Per-student review queues for the students this worker served recently"""
+
+    def __init__(self, max_students=10000, max_age=300):
+        self.max_students = max_students
+        self.max_age = max_age  # Seconds; bounds staleness from other workers' writes
+        self._queues = OrderedDict()  # user_id -> _StudentQueue
+        self._lock = threading.Lock()
+
+    def configure(self, max_students=None, max_age=None):
+        """Apply limits from the app config"""
+        if max_students is not None:
+            self.max_students = max_students
+        if max_age is not None:
+            self.max_age = max_age
+
+    def _cached_queue(self, user_id):
+        queue = self._queues.get(user_id)
+        if queue is None or time.time() - queue.loaded_at > self.max_age:
+            return None
+        self._queues.move_to_end(user_id)
+        return queue
+
+    def _load_queue(self, user_id):
+        """Build a student's queue from the (user_id, due_at) index"""
+        rows = db.session.query(ReviewItem.quiz_id, ReviewItem.due_at)\
+            .filter(ReviewItem.user_id == user_id)\
+            .all()
+        queue = _StudentQueue(rows)
+        with self._lock:
+            self._queues[user_id] = queue
+            self._queues.move_to_end(user_id)
+            while len(self._queues) > self.max_students:
+                self._queues.popitem(last=False)
+        return queue
+
+    def record(self, user_id, quiz_id, is_correct, reviewed_at=None):
+        """
+        Schedule the next review of a quiz after an attempt
+
+        The row is only added to the session; the caller commits it together
+        with the attempt.
+
+        Returns:
+            ReviewItem: The updated review state
+        """
+        return self.record_many(user_id, [(quiz_id, is_correct, reviewed_at)])[quiz_id]
+
+    def record_many(self, user_id, results):
+        """
+        Schedule reviews for several attempts of one student, oldest first
+
+        The review rows of every quiz involved are loaded with one
+        SELECT ... FOR UPDATE, so concurrent attempts on the same quiz apply
+        their reviews one after the other. Missing rows are created with an
+        insert that skips (user, quiz) conflicts and then locked.
+
+        Args:
+            user_id: Student ID
+            results: (quiz_id, is_correct, reviewed_at) tuples
+
+        Returns:
+            dict: {quiz_id: updated ReviewItem}
+        """
+        now = datetime.utcnow()
+        quiz_ids = {quiz_id for quiz_id, _, _ in results}
+        items = _locked_items(user_id, quiz_ids)
+
+        missing = quiz_ids - set(items)
+        if missing:
+            insert_missing(ReviewItem, [
+                {
+                    'user_id': user_id,
+                    'quiz_id': quiz_id,
+                    'easiness': INITIAL_EASINESS,
+                    'interval_days': 0.0,
+                    'repetitions': 0,
+                    'lapses': 0,
+                    'due_at': now
+                }
+                for quiz_id in missing
+            ], ['user_id', 'quiz_id'])
+            items.update(_locked_items(user_id, missing))
+
+        for quiz_id, is_correct, reviewed_at in results:
+            apply_review(items[quiz_id], is_correct, reviewed_at or now)
+
+        with self._lock:
+            queue = self._queues.get(user_id)
+            if queue is not None:
+                for quiz_id, item in items.items():
+                    queue.push(quiz_id, item.due_at)
+        return items
+
+    def due(self, user_id, limit=10, now=None):
+        """
+        Quizzes due for review, most overdue first
+
+        Returns:
+            tuple: ([(quiz_id, due_at)], due time of the next item not returned or None)
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            queue = self._cached_queue(user_id)
+        if queue is None:
+            queue = self._load_queue(user_id)  # Query outside the lock
+
+        with self._lock:
+            return queue.pop_due(now, limit)
+
+    def invalidate(self, user_id):
+        """Drop a student's queue so the next lookup reloads it"""
+        with self._lock:
+            self._queues.pop(user_id, None)
+
+
+# Create singleton instance
+review_scheduler = ReviewScheduler()
@@ -0,0 +1,243 @@
+"""
+Declarative scoring model for rule-based lesson recommendations
+A scoring spec lists weighted lesson features; it is compiled into a weight
+vector and evaluated against the feature columns of every candidate lesson
+at once with NumPy. Reason strings are only built for the returned top-k.
+
+The spec is a JSON file (RECOMMENDATION_SCORING_SPEC) that each worker
+reloads when its mtime changes, so weights can be retuned without a deploy:
+
+    {
+        "features": [
+            {"name": "difficulty_match", "weight": 50, "reason": "Matches your {target_difficulty} level"},
+            {"name": "weak_subject", "weight": 30, "reason": "Helps improve weak areas"},
+            {"name": "popularity", "weight": 5, "reason": "Popular with other students", "reason_min": 0.8}
+        ],
+        "default_reason": "Recommended for you"
+    }
+
+A reason is listed when its feature value is above reason_min (default 0).
+Without a spec file DEFAULT_SCORING_SPEC is used.
+"""
+import os
+import json
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+DIFFICULTY_CODES = {'beginner': 0, 'intermediate': 1, 'advanced': 2}
+
+DEFAULT_SCORING_SPEC = {
+    'features': [
+        {'name': 'difficulty_match', 'weight': 50, 'reason': 'Matches your {target_difficulty} level'},
+        {'name': 'weak_subject', 'weight': 30, 'reason': 'Helps improve weak areas'},
+        {'name': 'prerequisites_met', 'weight': 20, 'reason': 'Prerequisites completed'},
+        {'name': 'missing_prerequisites', 'weight': -30, 'reason': 'Missing prerequisites'}
+    ],
+    'default_reason': 'Recommended for you'
+}
+
+
+class LessonScoringMatrix:
+    """Per-lesson columns the scoring features are computed from, in catalog order"""
+
+    def __init__(self, lessons=None):
+        self.build(lessons or [])
+
+    def build(self, lessons):
+        """Rebuild the columns from a list of lesson dicts"""
+        self.lessons = lessons
+        self.lesson_ids = np.array([lesson['id'] for lesson in lessons], dtype=np.int64)
+        self.difficulty = np.array(
+            [DIFFICULTY_CODES.get(lesson.get('difficulty'), -1) for lesson in lessons], dtype=np.int8
+        )
+
+        self.subjects = {}  # subject -> code
+        self.subject = np.array(
+            [self.subjects.setdefault(lesson.get('subject'), len(self.subjects)) for lesson in lessons],
+            dtype=np.int32
+        )
+
+        # Prerequisites as (lesson row, prerequisite lesson ID) pairs
+        rows, prerequisite_ids = [], []
+        for row, lesson in enumerate(lessons):
+            for prerequisite_id in lesson.get('prerequisites') or []:
+                rows.append(row)
+                prerequisite_ids.append(prerequisite_id)
+        self.prerequisite_rows = np.array(rows, dtype=np.int64)
+        self.prerequisite_ids = np.array(prerequisite_ids, dtype=np.int64)
+
+        views = np.log1p(np.array([lesson.get('views_count') or 0 for lesson in lessons], dtype=np.float64))
+        self.popularity = views / views.max() if len(views) and views.max() > 0 else views
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def missing_prerequisites(self, completed_ids):
+        """Number of uncompleted prerequisites per lesson"""
+        if not len(self.prerequisite_ids):
+            return np.zeros(len(self), dtype=np.int64)
+        missing = ~np.isin(self.prerequisite_ids, completed_ids)
+        return np.bincount(self.prerequisite_rows[missing], minlength=len(self))
+
+
+class StudentContext:
+    """What the features need to know about one student, computed once per call"""
+
+    def __init__(self, matrix, target_difficulty, weak_areas, completed_lessons):
+        self.matrix = matrix
+        self.target_difficulty = target_difficulty
+        self.weak_areas = weak_areas
+        self.completed_ids = np.fromiter(completed_lessons, dtype=np.int64, count=len(completed_lessons))
+        self._missing = None
+
+    @property
+    def missing(self):
+        if self._missing is None:
+            self._missing = self.matrix.missing_prerequisites(self.completed_ids)
+        return self._missing
+
+
+def _difficulty_match(context):
+    return context.matrix.difficulty == DIFFICULTY_CODES.get(context.target_difficulty, -2)
+
+
+def _weak_subject(context):
+    codes = [context.matrix.subjects[s] for s in context.weak_areas if s in context.matrix.subjects]
+    return np.isin(context.matrix.subject, codes)
+
+
+def _prerequisites_met(context):
+    return context.missing == 0
+
+
+def _missing_prerequisites(context):
+    return context.missing > 0
+
+
+def _popularity(context):
+    return context.matrix.popularity
+
+
+# Feature name -> callable(StudentContext) returning one value per lesson
+FEATURES = {
+    'difficulty_match': _difficulty_match,
+    'weak_subject': _weak_subject,
+    'prerequisites_met': _prerequisites_met,
+    'missing_prerequisites': _missing_prerequisites,
+    'popularity': _popularity
+}
+
+
+class ScoringSpec:
+    """A validated scoring spec compiled into feature names and a weight vector"""
+
+    def __init__(self, spec, version='default', updated_at=None):
+        features = spec.get('features')
+        if not isinstance(features, list) or not features:
+            raise ValueError('Scoring spec needs a non-empty "features" list')
+
+        unknown = [item.get('name') for item in features if item.get('name') not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown scoring features: {', '.join(map(str, unknown))}")
+
+        self.version = version
+        self.updated_at = updated_at  # UTC time of the spec file, None for the default
+        self.names = [item['name'] for item in features]
+        self.weights = np.array([float(item.get('weight', 0)) for item in features])
+        self.reasons = [item.get('reason') for item in features]
+        self.reason_min = np.array([float(item.get('reason_min', 0)) for item in features])
+        self.default_reason = spec.get('default_reason', 'Recommended for you')
+
+    def feature_columns(self, context):
+        """
+        Evaluate every feature of the spec for all lessons
+
+        Returns:
+            list: One array of per-lesson values per feature
+        """
+        return [FEATURES[name](context) for name in self.names]
+
+    def score(self, columns):
+        """Weighted sum of the feature columns, one score per lesson"""
+        scores = np.zeros(len(columns[0]))
+        for column, weight in zip(columns, self.weights):
+            if weight:
+                scores += weight * column
+        return scores
+
+    def reason(self, values, context):
+        """Reason string for one lesson's feature values"""
+        parts = [
+            template.format(target_difficulty=context.target_difficulty)
+            for template, value, minimum in zip(self.reasons, values, self.reason_min)
+            if template and value > minimum
+        ]
+        return ' | '.join(parts) if parts else self.default_reason
+
+
+class ScoringModel:
+    """Holds the live scoring spec and reloads it when the spec file changes"""
+
+    def __init__(self, path=None, check_interval=10):
+        self.path = path
+        self.check_interval = check_interval  # Seconds between spec file checks
+        self.spec = ScoringSpec(DEFAULT_SCORING_SPEC)
+        self._stat = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, path=None, check_interval=None):
+        """Apply settings from the app config"""
+        if path is not None:
+            self.path = path
+        if check_interval is not None:
+            self.check_interval = check_interval
+        self._checked_at = 0.0
+
+    def current(self):
+        """
+        The live spec, reloaded if the file changed since the last check
+
+        Stats the spec file at most once per check_interval. An invalid file
+        is reported and the previous spec stays live.
+
+        Returns:
+            ScoringSpec: Compiled spec
+        """
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < self.check_interval:
+            return self.spec
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+                current_stat = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                current_stat = None
+
+            if current_stat == self._stat:
+                return self.spec
+            self._stat = current_stat
+
+            if current_stat is None:
+                self.spec = ScoringSpec(DEFAULT_SCORING_SPEC)
+                return self.spec
+
+            try:
+                with open(self.path) as f:
+                    spec = json.load(f)
+                self.spec = ScoringSpec(
+                    spec,
+                    version=str(current_stat[1]),
+                    updated_at=datetime.utcfromtimestamp(current_stat[1] / 1e9)
+                )
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                print(f"[ScoringModel] Keeping the previous spec, {self.path} is invalid: {str(e)}")
+            return self.spec
+
+
+# Create singleton instance
+scoring_model = ScoringModel()
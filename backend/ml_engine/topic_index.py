@@ -0,0 +1,97 @@
+"""
+Inverted index from topics to lessons
+Maps lesson subjects, title words and tag words to lesson IDs so "lessons
+for topic X" is a few set lookups instead of a scan over every lesson
+"""
+import re
+from collections import defaultdict
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _words(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+class LessonTopicIndex:
+    """Subject, title and tag postings over lesson dicts"""
+
+    def __init__(self, lessons=None):
+        self.build(lessons or [])
+
+    def build(self, lessons):
+        """Rebuild the index from a list of lesson dicts"""
+        self.subjects = defaultdict(set)   # Normalized subject -> lesson IDs
+        self.words = defaultdict(set)      # Title/tag word -> lesson IDs
+        self.entries = {}                  # Lesson ID -> (subject key, words) for removal
+        self.results = {}                  # Topic -> sorted IDs, cleared on every write
+
+        for lesson in lessons:
+            self.add(lesson)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, lesson):
+        """Index a lesson dict, replacing any previous entry for its ID"""
+        lesson_id = lesson['id']
+        self.remove(lesson_id)
+        self.results.clear()
+
+        subject = (lesson.get('subject') or '').strip().lower()
+        words = set(_words(lesson.get('title')))
+        for tag in lesson.get('tags') or []:
+            words.update(_words(str(tag)))
+
+        self.subjects[subject].add(lesson_id)
+        for word in words:
+            self.words[word].add(lesson_id)
+        self.entries[lesson_id] = (subject, words)
+
+    def remove(self, lesson_id):
+        """Drop a lesson from the index if present"""
+        entry = self.entries.pop(lesson_id, None)
+        if entry is None:
+            return
+        self.results.clear()
+
+        subject, words = entry
+        self._discard(self.subjects, subject, lesson_id)
+        for word in words:
+            self._discard(self.words, word, lesson_id)
+
+    def lookup(self, topic, limit=None):
+        """
+        Lessons related to a topic
+
+        A lesson matches when its subject equals the topic or when every
+        word of the topic appears in its title or tags.
+
+        Args:
+            topic: Topic or subject name
+            limit: Maximum number of IDs to return
+
+        Returns:
+            list: Matching lesson IDs in ascending order
+        """
+        key = topic.strip().lower()
+        ids = self.results.get(key)
+        if ids is None:
+            matches = set(self.subjects.get(key, ()))
+
+            words = _words(key)
+            if words:
+                postings = sorted((self.words.get(word, set()) for word in words), key=len)
+                matches |= postings[0].intersection(*postings[1:])
+
+            ids = self.results[key] = sorted(matches)
+
+        return ids[:limit] if limit is not None else list(ids)
+
+    @staticmethod
+    def _discard(postings, key, lesson_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(lesson_id)
+            if not ids:
+                del postings[key]
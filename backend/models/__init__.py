@@ -1,14 +1,20 @@
 # This file makes the models directory a Python package
-from .user import User, StudentProfile
-from .lesson import Lesson, LessonProgress
-from .quiz import Quiz, Attempt, QuizSession
+from .user import User, StudentProfile, SkillMastery, StudentAbility, StudentFeatures
+from .lesson import Lesson, LessonProgress, StudentRecommendation
+from .quiz import Quiz, Attempt, ItemCalibration, ReviewItem, QuizSession
 
 __all__ = [
     'User',
     'StudentProfile',
+    'SkillMastery',
+    'StudentAbility',
+    'StudentFeatures',
     'Lesson',
     'LessonProgress',
+    'StudentRecommendation',
     'Quiz',
     'Attempt',
+    'ItemCalibration',
+    'ReviewItem',
     'QuizSession'
 ]
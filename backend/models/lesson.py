@@ -22,8 +22,8 @@ class Lesson(db.Model):
     # Relationships
     quizzes = db.relationship('Quiz', backref='lesson', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self, include_content=True):
-        """Convert lesson to dictionary"""
+    def to_dict(self, include_content=True, quiz_count=None):
+        """Convert lesson to dictionary (pass quiz_count to skip the count query)"""
         data = {
             'id': self.id,
             'title': self.title,
@@ -37,7 +37,7 @@ class Lesson(db.Model):
             'created_by': self.created_by,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'quiz_count': self.quizzes.count()
+            'quiz_count': self.quizzes.count() if quiz_count is None else quiz_count
         }
         
         if include_content:
@@ -94,3 +94,19 @@ class LessonProgress(db.Model):
     
     def __repr__(self):
         return f'<LessonProgress user={self.user_id} lesson={self.lesson_id}>'
+
+
+class StudentRecommendation(db.Model):
+    """Precomputed lesson recommendation for a student (see precompute_recommendations.py)"""
+    __tablename__ = 'student_recommendations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='CASCADE'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 0 = best recommendation
+    score = db.Column(db.Float, nullable=False)
+    reason = db.Column(db.String(255))
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<StudentRecommendation user={self.user_id} lesson={self.lesson_id} rank={self.rank}>'
@@ -15,10 +15,12 @@ class Quiz(db.Model):
     difficulty = db.Column(db.String(20), default='beginner')
     points = db.Column(db.Integer, default=10)
     hint = db.Column(db.Text, nullable=True)  # Optional hint
+    option_feedback = db.Column(db.JSON, nullable=True)  # Precompiled feedback per option, see events.quiz_saved
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     attempts = db.relationship('Attempt', backref='quiz', lazy='dynamic', cascade='all, delete-orphan')
+    review_items = db.relationship('ReviewItem', backref='quiz', lazy='dynamic', cascade='all, delete-orphan')
     
     def to_dict(self, include_answer=False):
         """Convert quiz to dictionary"""
@@ -41,8 +43,17 @@ class Quiz(db.Model):
         return data
     
     def check_answer(self, user_answer):
-        """Check if the provided answer is correct"""
-        return user_answer == self.correct_answer
+        """Check if the provided answer is correct (an integer index of one of the options)"""
+        if not isinstance(user_answer, int) or isinstance(user_answer, bool):
+            return False
+        return 0 <= user_answer < len(self.options or []) and user_answer == self.correct_answer
+    
+    def feedback_for(self, user_answer):
+        """Precompiled feedback for the chosen option, or None if not compiled"""
+        feedback = self.option_feedback
+        if feedback and isinstance(user_answer, int) and 0 <= user_answer < len(feedback):
+            return feedback[user_answer]
+        return None
     
     def __repr__(self):
         return f'<Quiz {self.id} for Lesson {self.lesson_id}>'
@@ -62,6 +73,12 @@ class Attempt(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     synced = db.Column(db.Boolean, default=True)  # For offline sync tracking
     feedback = db.Column(db.Text, nullable=True)  # AI-generated feedback
+    client_attempt_id = db.Column(db.String(64), nullable=True)  # Idempotency key from the offline client
+    session_id = db.Column(db.Integer, db.ForeignKey('quiz_sessions.id'), nullable=True, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'client_attempt_id', name='_user_client_attempt_uc'),
+    )
     
     def to_dict(self):
         """Convert attempt to dictionary"""
@@ -69,6 +86,8 @@ class Attempt(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'quiz_id': self.quiz_id,
+            'client_attempt_id': self.client_attempt_id,
+            'session_id': self.session_id,
             'user_answer': self.user_answer,
             'is_correct': self.is_correct,
             'score': self.score,
@@ -82,6 +101,66 @@ class Attempt(db.Model):
         return f'<Attempt user={self.user_id} quiz={self.quiz_id} correct={self.is_correct}>'
 
 
+class ItemCalibration(db.Model):
+    """Item Response Theory parameters per quiz, fitted by calibrate_irt.py"""
+    __tablename__ = 'item_calibrations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, unique=True)
+    difficulty = db.Column(db.Float, nullable=False)  # b: ability with a 50% chance of success
+    discrimination = db.Column(db.Float, nullable=False, default=1.0)  # a: slope (1.0 under 1PL)
+    responses_count = db.Column(db.Integer, default=0)
+    calibrated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert item parameters to dictionary"""
+        return {
+            'quiz_id': self.quiz_id,
+            'difficulty': self.difficulty,
+            'discrimination': self.discrimination,
+            'responses': self.responses_count,
+            'calibrated_at': self.calibrated_at.isoformat() if self.calibrated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ItemCalibration quiz={self.quiz_id} b={self.difficulty:.2f} a={self.discrimination:.2f}>'
+
+
+class ReviewItem(db.Model):
+    """SM-2 spaced-repetition state per student and quiz"""
+    __tablename__ = 'review_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False)
+    easiness = db.Column(db.Float, nullable=False, default=2.5)  # SM-2 easiness factor (>= 1.3)
+    interval_days = db.Column(db.Float, nullable=False, default=0.0)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)  # Consecutive successful reviews
+    lapses = db.Column(db.Integer, nullable=False, default=0)  # Times the item was forgotten
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'quiz_id', name='_user_quiz_review_uc'),
+        db.Index('ix_review_items_user_due', 'user_id', 'due_at'),
+    )
+    
+    def to_dict(self):
+        """Convert review state to dictionary"""
+        return {
+            'quiz_id': self.quiz_id,
+            'easiness': round(self.easiness, 3),
+            'interval_days': self.interval_days,
+            'repetitions': self.repetitions,
+            'lapses': self.lapses,
+            'due_at': self.due_at.isoformat(),
+            'last_reviewed_at': self.last_reviewed_at.isoformat() if self.last_reviewed_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ReviewItem user={self.user_id} quiz={self.quiz_id} due={self.due_at}>'
+
+
 class QuizSession(db.Model):
     """Track complete quiz sessions for a lesson"""
     __tablename__ = 'quiz_sessions'
@@ -97,6 +176,45 @@ class QuizSession(db.Model):
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        db.Index('ix_quiz_sessions_user_lesson', 'user_id', 'lesson_id'),
+    )
+    
+    @classmethod
+    def open_for(cls, user_id, lesson_id):
+        """The student's most recent unfinished session for a lesson, or None"""
+        return cls.query.filter_by(
+            user_id=user_id,
+            lesson_id=lesson_id,
+            completed_at=None
+        ).order_by(cls.started_at.desc()).first()
+    
+    @classmethod
+    def record_attempt(cls, session_id, correct, score, time_taken):
+        """
+        Add linked attempts to a session's running totals
+        
+        A single UPDATE with column increments, like StudentProfile's
+        totals, so completing the session never re-reads its attempts.
+        Joins the caller's transaction.
+        
+        Args:
+            session_id: QuizSession ID
+            correct: Number of correct attempts
+            score: Points earned
+            time_taken: Seconds spent
+        """
+        db.session.execute(
+            db.update(cls)
+            .where(cls.id == session_id)
+            .values(
+                correct_answers=db.func.coalesce(cls.correct_answers, 0) + correct,
+                total_score=db.func.coalesce(cls.total_score, 0) + score,
+                time_taken_seconds=db.func.coalesce(cls.time_taken_seconds, 0) + time_taken
+            )
+            .execution_options(synchronize_session='fetch')
+        )
+    
     def to_dict(self):
         """Convert session to dictionary"""
         return {
@@ -113,11 +231,10 @@ class QuizSession(db.Model):
         }
     
     def calculate_score(self):
-        """Calculate final score and percentage"""
+        """Calculate final score and percentage (the caller commits)"""
         if self.total_questions > 0:
             self.percentage = (self.correct_answers / self.total_questions) * 100
         self.completed_at = datetime.utcnow()
-        db.session.commit()
     
     def __repr__(self):
         return f'<QuizSession user={self.user_id} lesson={self.lesson_id}>'
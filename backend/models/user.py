@@ -63,8 +63,10 @@ class StudentProfile(db.Model):
     preferences = db.Column(db.JSON, default={})  # Learning preferences, pace, style
     achievements = db.Column(db.JSON, default=[])  # Badges and milestones
     total_lessons_completed = db.Column(db.Integer, default=0)
-    total_quizzes_taken = db.Column(db.Integer, default=0)
-    average_score = db.Column(db.Float, default=0.0)
+    total_quizzes_taken = db.Column(db.Integer, default=0)  # Attempts submitted
+    total_points_earned = db.Column(db.Integer, default=0)
+    total_points_possible = db.Column(db.Integer, default=0)
+    average_score = db.Column(db.Float, default=0.0)  # 100 * earned / possible, kept with the totals
     # parent_pin = db.Column(db.String(6))  # 6-digit PIN for parent access - TEMPORARILY COMMENTED
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -81,11 +83,46 @@ class StudentProfile(db.Model):
             'achievements': self.achievements,
             'total_lessons_completed': self.total_lessons_completed,
             'total_quizzes_taken': self.total_quizzes_taken,
+            'total_points_earned': self.total_points_earned,
+            'total_points_possible': self.total_points_possible,
             'average_score': self.average_score,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
     
+    @classmethod
+    def record_attempt(cls, user_id, score, points, count=1):
+        """
+        Add attempts to a student's running totals
+
+        A single UPDATE with column increments, so concurrent submissions
+        never lose an update and the cost does not depend on the history.
+        Joins the caller's transaction; users without a profile are skipped.
+
+        average_score is assigned first: MySQL evaluates SET clauses left to
+        right with the columns already updated, while other databases use
+        the old values throughout, and both read the old totals this way.
+
+        Args:
+            user_id: Student ID
+            score: Points earned by the attempts
+            points: Points the quizzes were worth
+            count: Number of attempts
+        """
+        earned = cls.total_points_earned + score
+        possible = cls.total_points_possible + points
+        db.session.execute(
+            db.update(cls)
+            .where(cls.user_id == user_id)
+            .ordered_values(
+                (cls.average_score, db.case((possible > 0, earned * 100.0 / possible), else_=0.0)),
+                (cls.total_quizzes_taken, cls.total_quizzes_taken + count),
+                (cls.total_points_earned, earned),
+                (cls.total_points_possible, possible)
+            )
+            .execution_options(synchronize_session='fetch')
+        )
+    
     def add_achievement(self, achievement_name, achievement_data):
         """Add a new achievement/badge"""
         if not isinstance(self.achievements, list):
@@ -101,3 +138,95 @@ class StudentProfile(db.Model):
     
     def __repr__(self):
         return f'<StudentProfile user_id={self.user_id}>'
+
+
+class SkillMastery(db.Model):
+    """Bayesian Knowledge Tracing state per student and topic"""
+    __tablename__ = 'skill_mastery'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    topic = db.Column(db.String(100), nullable=False)  # Lesson subject the quiz belongs to
+    p_mastery = db.Column(db.Float, nullable=False)  # Posterior probability the skill is known
+    params_version = db.Column(db.String(32), nullable=True)  # bkt_version p_mastery was computed under, None = defaults
+    attempts_count = db.Column(db.Integer, default=0)
+    correct_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Unique constraint
+    __table_args__ = (db.UniqueConstraint('user_id', 'topic', name='_user_topic_uc'),)
+    
+    def to_dict(self):
+        """Convert mastery state to dictionary"""
+        return {
+            'topic': self.topic,
+            'p_mastery': self.p_mastery,
+            'attempts': self.attempts_count,
+            'correct': self.correct_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<SkillMastery user={self.user_id} topic={self.topic} p={self.p_mastery:.2f}>'
+
+
+class StudentAbility(db.Model):
+    """Item Response Theory ability estimate per student"""
+    __tablename__ = 'student_abilities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    theta = db.Column(db.Float, nullable=False)  # Latent ability on the logit scale
+    responses_count = db.Column(db.Integer, default=0)
+    calibrated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert ability estimate to dictionary"""
+        return {
+            'user_id': self.user_id,
+            'theta': self.theta,
+            'responses': self.responses_count,
+            'calibrated_at': self.calibrated_at.isoformat() if self.calibrated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<StudentAbility user={self.user_id} theta={self.theta:.2f}>'
+
+
+class StudentFeatures(db.Model):
+    """Running per-student aggregates maintained on every attempt and lesson write"""
+    __tablename__ = 'student_features'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    attempts_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)  # Points earned
+    points_possible = db.Column(db.Integer, nullable=False, default=0)
+    topic_stats = db.Column(db.JSON, nullable=False, default=dict)  # {topic: [attempts, correct, score_sum, points_possible]}
+    recent_results = db.Column(db.JSON, nullable=False, default=list)  # Ring buffer of [is_correct, score]
+    recent_head = db.Column(db.Integer, nullable=False, default=0)  # Next ring buffer slot to overwrite
+    lessons_completed = db.Column(db.Integer, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def recent(self):
+        """Ring buffer contents, oldest first"""
+        results = self.recent_results or []
+        return results[self.recent_head:] + results[:self.recent_head]
+    
+    def to_dict(self):
+        """Convert features to the dictionary AIEngine expects"""
+        return {
+            'attempts': self.attempts_count,
+            'correct': self.correct_count,
+            'score_sum': self.score_sum,
+            'points_possible': self.points_possible,
+            'topics': self.topic_stats or {},
+            'recent': self.recent(),
+            'lessons_completed': self.lessons_completed,
+            'last_attempt_at': self.last_attempt_at.isoformat() if self.last_attempt_at else None
+        }
+    
+    def __repr__(self):
+        return f'<StudentFeatures user={self.user_id} attempts={self.attempts_count}>'
@@ -0,0 +1,191 @@
+"""
+Precompute lesson recommendations for every student
+Streams student IDs, scores them in shards across a process pool and
+writes the results to the student_recommendations table in bulk.
+/api/ml/recommend serves these rows while they are fresh.
+
+Progress is checkpointed after every shard as the highest student ID up
+to which every shard is done, so an interrupted run resumes after it even
+if students were added or --shard-size changed in between:
+
+    python precompute_recommendations.py --workers 4
+    python precompute_recommendations.py --reset   # start a new run
+"""
+import os
+import sys
+import json
+import argparse
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), 'instance', 'precompute_checkpoint.json')
+
+# Per-process Flask app, created once by the pool initializer
+_worker_app = None
+
+
+def _init_worker():
+    """Give each worker process its own app and database connections"""
+    global _worker_app
+    from app import create_app
+    from database import db
+
+    _worker_app = create_app()
+    with _worker_app.app_context():
+        db.engine.dispose()  # Never reuse connections inherited from the parent
+
+
+def process_shard(user_ids, limit):
+    """
+    Score one shard of students and store the results
+
+    Returns:
+        tuple: (last user ID of the shard, number of students written)
+    """
+    from database import db
+    from ml_engine.recommend import ai_engine
+    from ml_engine.catalog import lesson_catalog
+    from ml_engine.precomputed import load_student_data, store_recommendations
+
+    with _worker_app.app_context():
+        try:
+            computed_at = datetime.utcnow()
+            catalog = lesson_catalog.refresh()
+            student_data = load_student_data(user_ids)
+
+            results = {
+                user_id: ai_engine.recommend_lessons(
+                    data,
+                    catalog.published_lessons,
+                    limit=limit,
+                    matrix=catalog.scoring_matrix
+                )
+                for user_id, data in student_data.items()
+            }
+
+            store_recommendations(results, computed_at)
+            db.session.commit()
+            return user_ids[-1], len(results)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        checkpoint.setdefault('done_through', 0)
+        return checkpoint
+    return {'started_at': datetime.utcnow().isoformat(), 'done_through': 0}
+
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves it half written"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def iter_shards(shard_size, after=0):
+    """Stream student IDs above `after` in ID order, one keyset-paginated shard at a time"""
+    from database import db
+    from models.user import User
+
+    last_id = after
+    while True:
+        shard = [
+            user_id for (user_id,) in db.session.query(User.id)
+            .filter(User.role == 'student', User.id > last_id)
+            .order_by(User.id)
+            .limit(shard_size)
+        ]
+        if not shard:
+            return
+        yield shard
+        last_id = shard[-1]
+
+
+def precompute(workers, shard_size, limit, checkpoint_path):
+    from app import create_app
+
+    app = create_app()
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint['done_through']:
+        print(f"Resuming run started at {checkpoint['started_at']} "
+              f"(students up to ID {checkpoint['done_through']} done)")
+
+    written = 0
+    submitted = deque()  # Last user ID of each unrecorded shard, in ID order
+    completed = set()
+    with app.app_context(), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = set()
+        for shard in iter_shards(shard_size, checkpoint['done_through']):
+            # Bound in-flight shards so memory stays flat for any student count
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += _record(finished, submitted, completed, checkpoint, checkpoint_path)
+
+            pending.add(pool.submit(process_shard, shard, limit))
+            submitted.append(shard[-1])
+
+        finished, _ = wait(pending)
+        written += _record(finished, submitted, completed, checkpoint, checkpoint_path)
+
+    # Run complete; the next invocation starts fresh
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return written
+
+
+def _record(finished, submitted, completed, checkpoint, checkpoint_path):
+    written = 0
+    for future in finished:
+        shard_end, count = future.result()
+        completed.add(shard_end)
+        written += count
+
+    # Shards finish out of order; only move past shards whose predecessors are done
+    while submitted and submitted[0] in completed:
+        completed.remove(submitted[0])
+        checkpoint['done_through'] = submitted.popleft()
+    save_checkpoint(checkpoint_path, checkpoint)
+    print(f"   ✅ Students up to ID {checkpoint['done_through']} done")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute lesson recommendations for all students')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--shard-size', type=int, default=500, help='Students per shard')
+    parser.add_argument('--limit', type=int, default=10, help='Recommendations stored per student')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Checkpoint file path')
+    parser.add_argument('--reset', action='store_true', help='Ignore any existing checkpoint')
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print("="*60)
+    print("  PRECOMPUTE STUDENT RECOMMENDATIONS")
+    print("="*60)
+
+    try:
+        written = precompute(args.workers, args.shard_size, args.limit, args.checkpoint)
+    except Exception as e:
+        print(f"\n❌ Precompute failed: {str(e)}")
+        print("   Re-run the same command to resume from the last checkpoint")
+        sys.exit(1)
+
+    print(f"\n✅ Stored recommendations for {written} students")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,44 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_req
 from database import db
 from models.user import User
 from models.lesson import Lesson, LessonProgress
+from ml_engine import events
+from ml_engine.catalog import lesson_catalog
+from ml_engine.prerequisites import PrerequisiteCycleError
 from utils.security import role_required, sanitize_input, paginate_query, success_response, error_response
 
 lesson_bp = Blueprint('lessons', __name__)
 
+
+def _prerequisites_error(prerequisites, lesson_id=None):
+    """
+    Validate a lesson's prerequisite list
+
+    Args:
+        prerequisites: Lesson IDs from the request
+        lesson_id: ID of the lesson being updated (None when creating)
+
+    Returns:
+        str or None: Error message, or None if the prerequisites are valid
+    """
+    if not isinstance(prerequisites, list) or not all(
+        isinstance(prereq, int) and not isinstance(prereq, bool) for prereq in prerequisites
+    ):
+        return 'Prerequisites must be a list of lesson IDs'
+
+    existing = {
+        row[0] for row in db.session.query(Lesson.id).filter(Lesson.id.in_(set(prerequisites))).all()
+    } if prerequisites else set()
+    missing = sorted(set(prerequisites) - existing)
+    if missing:
+        return f'Unknown prerequisite lessons: {missing}'
+
+    # A new lesson has no dependents yet, so only updates can close a cycle
+    if lesson_id is not None:
+        cycle = lesson_catalog.prerequisite_graph.find_cycle(lesson_id, prerequisites)
+        if cycle:
+            return str(PrerequisiteCycleError(cycle))
+    return None
+
 @lesson_bp.route('', methods=['GET'])
 def get_lessons():
     """Get all lessons with optional filtering (public endpoint)"""
@@ -108,6 +142,14 @@ def create_lesson():
             if field not in data:
                 return error_response(f'Missing required field: {field}', 400)
         
+        # Bring the catalog snapshot up to date before applying this write
+        lesson_catalog.refresh()
+        
+        prerequisites = data.get('prerequisites') or []
+        prerequisites_error = _prerequisites_error(prerequisites)
+        if prerequisites_error:
+            return error_response(prerequisites_error, 400)
+        
         # Create lesson
         lesson = Lesson(
             title=sanitize_input(data['title']),
@@ -115,7 +157,7 @@ def create_lesson():
             content=data['content'],  # Don't sanitize markdown content too aggressively
             difficulty=data['difficulty'],
             duration_minutes=data.get('duration_minutes', 30),
-            prerequisites=data.get('prerequisites', []),
+            prerequisites=prerequisites,
             tags=data.get('tags', []),
             is_published=data.get('is_published', True),
             created_by=user_id
@@ -123,6 +165,7 @@ def create_lesson():
         
         db.session.add(lesson)
         db.session.commit()
+        events.lesson_saved(lesson)
         
         return success_response(
             lesson.to_dict(),
@@ -155,6 +198,9 @@ def update_lesson(lesson_id):
         
         data = request.get_json()
         
+        # Bring the catalog snapshot up to date before applying this write
+        lesson_catalog.refresh()
+        
         # Update fields
         if 'title' in data:
             lesson.title = sanitize_input(data['title'])
@@ -167,13 +213,20 @@ def update_lesson(lesson_id):
         if 'duration_minutes' in data:
             lesson.duration_minutes = data['duration_minutes']
         if 'prerequisites' in data:
-            lesson.prerequisites = data['prerequisites']
+            # Reject unknown lessons and prerequisites that would make the
+            # lesson depend on itself
+            prerequisites = data['prerequisites'] or []
+            prerequisites_error = _prerequisites_error(prerequisites, lesson.id)
+            if prerequisites_error:
+                return error_response(prerequisites_error, 400)
+            lesson.prerequisites = prerequisites
         if 'tags' in data:
             lesson.tags = data['tags']
         if 'is_published' in data:
             lesson.is_published = data['is_published']
         
         db.session.commit()
+        events.lesson_saved(lesson)
         
         return success_response(
             lesson.to_dict(),
@@ -205,6 +258,7 @@ def delete_lesson(lesson_id):
         
         db.session.delete(lesson)
         db.session.commit()
+        events.lesson_deleted(lesson_id)
         
         return success_response(None, 'Lesson deleted successfully')
         
@@ -240,6 +294,8 @@ def update_progress(lesson_id):
             )
             db.session.add(progress)
         
+        was_completed = progress.status == 'completed'
+        
         # Update progress
         if 'progress_percentage' in data:
             progress.progress_percentage = min(data['progress_percentage'], 100)
@@ -257,6 +313,9 @@ def update_progress(lesson_id):
         from datetime import datetime
         progress.last_accessed = datetime.utcnow()
         
+        if (progress.status == 'completed') != was_completed:
+            events.lesson_completion_changed(user_id, lesson_id, progress.status == 'completed')
+        
         db.session.commit()
         
         return success_response(
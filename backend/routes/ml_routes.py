@@ -1,47 +1,38 @@
 """
 ML/AI routes for recommendations and performance evaluation
 """
-from flask import Blueprint, request, jsonify
+import numpy as np
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
-from models.user import User
+from models.user import User, StudentAbility
 from models.lesson import Lesson, LessonProgress
-from models.quiz import Quiz, Attempt
+from models.quiz import Quiz, Attempt, ItemCalibration, ReviewItem
 from ml_engine.recommend import ai_engine
+from ml_engine.knowledge_state import load_mastery, load_mastery_many
+from ml_engine.features import load_features, student_version
+from ml_engine.catalog import lesson_catalog
+from ml_engine.cache import recommendation_cache
+from ml_engine.precomputed import load_recommendations, load_student_data
+from ml_engine.collaborative import collaborative_model
+from ml_engine.review import review_scheduler
+from ml_engine.instrumentation import metrics
 from utils.security import success_response, error_response
 
 ml_bp = Blueprint('ml', __name__)
 
+RECOMMENDATION_MODES = ('rules', 'collaborative')
+
 @ml_bp.route('/evaluate', methods=['POST'])
 @jwt_required()
 def evaluate_performance():
     """Evaluate student performance using AI"""
     try:
         user_id = int(get_jwt_identity())  # Convert string to int
-        data = request.get_json()
         
-        # Get student's quiz attempts
-        limit = data.get('limit', 50)  # Last 50 attempts
-        attempts = Attempt.query.filter_by(user_id=user_id)\
-            .order_by(Attempt.timestamp.desc())\
-            .limit(limit)\
-            .all()
-        
-        # Convert to dict format for AI engine
-        attempts_data = []
-        for attempt in attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            attempts_data.append({
-                'quiz_id': attempt.quiz_id,
-                'is_correct': attempt.is_correct,
-                'score': attempt.score,
-                'timestamp': attempt.timestamp.isoformat(),
-                'difficulty': quiz.difficulty if quiz else 'beginner',
-                'lesson_id': quiz.lesson_id if quiz else None
-            })
-        
-        # Evaluate using AI engine
-        evaluation = ai_engine.evaluate_performance(attempts_data)
+        # Running aggregates and knowledge state are maintained on every attempt
+        evaluation = ai_engine.evaluate_from_features(load_features(user_id), load_mastery(user_id))
         
         return success_response(evaluation, 'Performance evaluated successfully')
         
@@ -56,58 +47,129 @@ def recommend_lessons():
     try:
         user_id = int(get_jwt_identity())  # Convert string to int
         data = request.get_json()
+        limit = data.get('limit', 5)
+        mode = data.get('mode', 'rules')  # rules or collaborative
+        
+        if mode not in RECOMMENDATION_MODES:
+            return error_response(f"mode must be one of: {', '.join(RECOMMENDATION_MODES)}", 400)
+        
+        # Published lessons come from the cached catalog snapshot
+        with metrics.stage('recommend', 'catalog'):
+            catalog = lesson_catalog.refresh()
+        
+        # Serve repeat requests from the cache until an input changes
+        with metrics.stage('recommend', 'cache'):
+            version = student_version(user_id)
+            cached = recommendation_cache.get(user_id, limit, catalog.signature, version, mode)
+        if cached is not None:
+            return success_response({
+                'recommendations': cached,
+                'total': len(cached),
+                'mode': mode
+            }, 'Recommendations generated successfully')
+        
+        # Rows materialized by precompute_recommendations.py, if still fresh
+        if mode == 'rules':
+            with metrics.stage('recommend', 'precomputed'):
+                recommendations = load_recommendations(
+                    user_id, limit, catalog, current_app.config['RECOMMENDATION_PRECOMPUTE_MAX_AGE']
+                )
+            if recommendations is not None:
+                recommendation_cache.put(user_id, limit, catalog.signature, version, recommendations)
+                return success_response({
+                    'recommendations': recommendations,
+                    'total': len(recommendations),
+                    'mode': mode
+                }, 'Recommendations generated successfully')
+        
+        with metrics.stage('recommend', 'student_data'):
+            user = User.query.get(user_id)
+            if not user:
+                return error_response('User not found', 404)
+            
+            # Same inputs as precompute_recommendations.py
+            student_data = load_student_data([user_id])[user_id]
+        
+        recommendations = []
+        if mode == 'collaborative':
+            with metrics.stage('recommend', 'collaborative_model'):
+                model = collaborative_model.refresh()
+            with metrics.stage('recommend', 'scoring'):
+                recommendations = ai_engine.recommend_collaborative(
+                    user_id,
+                    student_data,
+                    model,
+                    catalog.lessons_by_id,
+                    limit=limit,
+                    graph=catalog.prerequisite_graph
+                )
+        
+        # Rule-based recommendations, also filling up collaborative results
+        # for students with little history
+        if len(recommendations) < limit:
+            chosen = {item['id'] for item in recommendations}
+            with metrics.stage('recommend', 'scoring'):
+                rule_based = ai_engine.recommend_lessons(
+                    student_data,
+                    catalog.published_lessons,
+                    limit=limit + len(chosen),
+                    matrix=catalog.scoring_matrix
+                )
+            recommendations += [item for item in rule_based if item['id'] not in chosen][:limit - len(chosen)]
+        
+        recommendation_cache.put(user_id, limit, catalog.signature, version, recommendations, mode)
         
-        user = User.query.get(user_id)
-        if not user:
-            return error_response('User not found', 404)
-        
-        # Gather student data
-        student_data = {
-            'profile': user.student_profile.to_dict() if user.student_profile else {},
-            'attempts': [],
-            'completed_lessons': []
-        }
-        
-        # Get recent attempts
-        attempts = Attempt.query.filter_by(user_id=user_id)\
-            .order_by(Attempt.timestamp.desc())\
-            .limit(100)\
-            .all()
+        return success_response({
+            'recommendations': recommendations,
+            'total': len(recommendations),
+            'mode': mode
+        }, 'Recommendations generated successfully')
         
-        for attempt in attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            student_data['attempts'].append({
-                'is_correct': attempt.is_correct,
-                'score': attempt.score,
-                'difficulty': quiz.difficulty if quiz else 'beginner'
-            })
+    except Exception as e:
+        return error_response(f'Recommendation failed: {str(e)}', 500)
+
+
+@ml_bp.route('/unlocked-lessons', methods=['GET'])
+@jwt_required()
+def get_unlocked_lessons():
+    """Get lessons whose prerequisites the student has just completed"""
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
         
-        # Get completed lessons
-        completed = LessonProgress.query.filter_by(
+        completed = db.session.query(LessonProgress.lesson_id).filter_by(
             user_id=user_id,
             status='completed'
         ).all()
-        student_data['completed_lessons'] = [p.lesson_id for p in completed]
         
-        # Get available lessons
-        available_lessons = Lesson.query.filter_by(is_published=True).all()
-        lessons_data = [lesson.to_dict(include_content=False) for lesson in available_lessons]
+        catalog = lesson_catalog.refresh()
+        unlocked_ids = catalog.prerequisite_graph.unlocked_next([row[0] for row in completed])
         
-        # Get recommendations
-        limit = data.get('limit', 5)
-        recommendations = ai_engine.recommend_lessons(
-            student_data,
-            lessons_data,
-            limit=limit
-        )
+        lessons = [
+            catalog.lessons_by_id[lesson_id] for lesson_id in unlocked_ids
+            if lesson_id in catalog.lessons_by_id and catalog.lessons_by_id[lesson_id]['is_published']
+        ]
         
-        return success_response({
-            'recommendations': recommendations,
-            'total': len(recommendations)
-        }, 'Recommendations generated successfully')
+        return success_response({'lessons': lessons, 'total': len(lessons)})
         
     except Exception as e:
-        return error_response(f'Recommendation failed: {str(e)}', 500)
+        return error_response(f'Failed to fetch unlocked lessons: {str(e)}', 500)
+
+
+@ml_bp.route('/recommend/cache-stats', methods=['GET'])
+@jwt_required()
+def get_recommendation_cache_stats():
+    """Get recommendation cache counters for this worker"""
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
+        user = User.query.get(user_id)
+        
+        if not user or user.role not in ['teacher', 'admin']:
+            return error_response('Teacher/Admin account required', 403)
+        
+        return success_response(recommendation_cache.stats())
+        
+    except Exception as e:
+        return error_response(f'Failed to load cache stats: {str(e)}', 500)
 
 
 @ml_bp.route('/learning-gaps', methods=['GET'])
@@ -117,26 +179,34 @@ def detect_learning_gaps():
     try:
         user_id = int(get_jwt_identity())  # Convert string to int
         
-        # Get all student attempts
-        attempts = Attempt.query.filter_by(user_id=user_id).all()
-        
-        attempts_data = []
-        for attempt in attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            if quiz:
-                attempts_data.append({
-                    'quiz_id': attempt.quiz_id,
-                    'lesson_id': quiz.lesson_id,
-                    'is_correct': attempt.is_correct,
-                    'difficulty': quiz.difficulty
-                })
-        
-        # Get all lessons
-        lessons = Lesson.query.all()
-        lessons_data = [l.to_dict(include_content=False) for l in lessons]
+        # Average percentage score and attempt count per lesson subject,
+        # aggregated by the database in a single query
+        percentage = Attempt.score * 100.0 / db.func.nullif(db.func.coalesce(Quiz.points, 10), 0)
+        rows = db.session.query(
+            Lesson.subject,
+            db.func.avg(percentage),
+            db.func.count(Attempt.id)
+        ).select_from(Attempt)\
+            .join(Quiz, Attempt.quiz_id == Quiz.id)\
+            .join(Lesson, Quiz.lesson_id == Lesson.id)\
+            .filter(Attempt.user_id == user_id)\
+            .group_by(Lesson.subject)\
+            .all()
         
-        # Detect gaps
-        gaps = ai_engine.detect_learning_gaps(attempts_data, lessons_data)
+        topic_stats = [
+            {
+                'topic': subject or 'general',
+                'average_score': float(average or 0),
+                'attempts_count': count
+            }
+            for subject, average, count in rows
+        ]
+        
+        # Detect gaps against the cached lesson catalog
+        catalog = lesson_catalog.refresh()
+        gaps = ai_engine.detect_learning_gaps_from_aggregates(
+            topic_stats, catalog.lessons, catalog.topic_index
+        )
         
         return success_response(gaps, 'Learning gaps identified')
         
@@ -144,6 +214,54 @@ def detect_learning_gaps():
         return error_response(f'Gap detection failed: {str(e)}', 500)
 
 
+@ml_bp.route('/review/due', methods=['GET'])
+@jwt_required()
+def get_due_reviews():
+    """Get the quizzes a student should review now (SM-2 schedule)"""
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
+        limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+        now = datetime.utcnow()
+        
+        # Most overdue first, popped from the student's review heap
+        due, next_due_at = review_scheduler.due(user_id, limit, now)
+        quiz_ids = [quiz_id for quiz_id, _ in due]
+        
+        quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_(quiz_ids))} if quiz_ids else {}
+        items = {
+            item.quiz_id: item
+            for item in ReviewItem.query.filter(ReviewItem.user_id == user_id, ReviewItem.quiz_id.in_(quiz_ids))
+        } if quiz_ids else {}
+        
+        # The heap may predate a review handled by another worker; the rows
+        # just read decide what is due and in which order
+        if any(quiz_id not in items or items[quiz_id].due_at != due_at for quiz_id, due_at in due):
+            review_scheduler.invalidate(user_id)  # Reload the heap on the next request
+        fresh = sorted(
+            (items[quiz_id] for quiz_id, _ in due
+             if quiz_id in quizzes and quiz_id in items and items[quiz_id].due_at <= now),
+            key=lambda item: (item.due_at, item.quiz_id)
+        )
+        
+        reviews = []
+        for item in fresh:
+            review = item.to_dict()
+            review['overdue_hours'] = round((now - item.due_at).total_seconds() / 3600, 1)
+            reviews.append({
+                'quiz': quizzes[item.quiz_id].to_dict(include_answer=False),
+                'review': review
+            })
+        
+        return success_response({
+            'reviews': reviews,
+            'total': len(reviews),
+            'next_due_at': next_due_at.isoformat() if next_due_at else None
+        })
+        
+    except Exception as e:
+        return error_response(f'Failed to load due reviews: {str(e)}', 500)
+
+
 @ml_bp.route('/adaptive-hint', methods=['POST'])
 @jwt_required()
 def get_adaptive_hint():
@@ -178,6 +296,87 @@ def get_adaptive_hint():
         return error_response(f'Failed to generate hint: {str(e)}', 500)
 
 
+@ml_bp.route('/predict-success', methods=['POST'])
+@jwt_required()
+def predict_success():
+    """Predict success probability for every quiz of a lesson or a list of quizzes"""
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
+        data = request.get_json() or {}
+        
+        lesson_id = data.get('lesson_id')
+        quiz_ids = data.get('quiz_ids')
+        if not lesson_id and not quiz_ids:
+            return error_response('lesson_id or quiz_ids is required', 400)
+        if quiz_ids is not None and not (
+            isinstance(quiz_ids, list)
+            and all(isinstance(q, int) and not isinstance(q, bool) for q in quiz_ids)
+        ):
+            return error_response('quiz_ids must be a list of integers', 400)
+        
+        # One query for the quizzes, their lesson subjects and IRT parameters
+        query = db.session.query(
+            Quiz.id,
+            Quiz.difficulty,
+            Lesson.subject,
+            ItemCalibration.difficulty.label('irt_difficulty'),
+            ItemCalibration.discrimination
+        ).join(Lesson, Quiz.lesson_id == Lesson.id)\
+            .outerjoin(ItemCalibration, ItemCalibration.quiz_id == Quiz.id)
+        if quiz_ids:
+            query = query.filter(Quiz.id.in_(quiz_ids))
+        else:
+            query = query.filter(Quiz.lesson_id == lesson_id)
+        rows = query.order_by(Quiz.id).all()
+        
+        if quiz_ids:
+            # Keep the caller's order
+            position = {quiz_id: i for i, quiz_id in enumerate(quiz_ids)}
+            rows.sort(key=lambda row: position[row.id])
+        
+        student_data = {
+            'attempts': [],
+            'mastery': load_mastery(user_id),
+            'ability': db.session.query(StudentAbility.theta).filter_by(user_id=user_id).scalar()
+        }
+        
+        # Recent attempts are only needed when no knowledge state is stored yet
+        if not student_data['mastery']:
+            recent = db.session.query(Attempt.is_correct, Attempt.score)\
+                .filter(Attempt.user_id == user_id)\
+                .order_by(Attempt.timestamp.desc())\
+                .limit(100)\
+                .all()
+            student_data['attempts'] = [
+                {'is_correct': is_correct, 'score': score}
+                for is_correct, score in reversed(recent)
+            ]
+        
+        probabilities = ai_engine.predict_success_batch(student_data, [
+            {
+                'difficulty': row.difficulty,
+                'topic': row.subject or 'general',
+                'irt': (row.irt_difficulty, row.discrimination) if row.irt_difficulty is not None else None
+            }
+            for row in rows
+        ])
+        
+        return success_response({
+            'predictions': [
+                {
+                    'quiz_id': row.id,
+                    'difficulty': row.difficulty,
+                    'success_probability': float(probability)
+                }
+                for row, probability in zip(rows, probabilities)
+            ],
+            'total': len(rows)
+        })
+        
+    except Exception as e:
+        return error_response(f'Prediction failed: {str(e)}', 500)
+
+
 @ml_bp.route('/student/dashboard', methods=['GET'])
 @jwt_required()
 def get_student_dashboard():
@@ -192,25 +391,8 @@ def get_student_dashboard():
         # Get profile
         profile = user.student_profile.to_dict() if user.student_profile else {}
         
-        # Get recent attempts
-        recent_attempts = Attempt.query.filter_by(user_id=user_id)\
-            .order_by(Attempt.timestamp.desc())\
-            .limit(50)\
-            .all()
-        
-        attempts_data = []
-        for attempt in recent_attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            attempts_data.append({
-                'is_correct': attempt.is_correct,
-                'score': attempt.score,
-                'timestamp': attempt.timestamp.isoformat(),
-                'difficulty': quiz.difficulty if quiz else 'beginner',
-                'lesson_id': quiz.lesson_id if quiz else None
-            })
-        
-        # AI Evaluation
-        evaluation = ai_engine.evaluate_performance(attempts_data)
+        # AI Evaluation from the stored running aggregates
+        evaluation = ai_engine.evaluate_from_features(load_features(user_id), load_mastery(user_id))
         
         # Get progress on lessons
         lesson_progress = LessonProgress.query.filter_by(user_id=user_id).all()
@@ -312,3 +494,80 @@ def get_teacher_analytics():
         
     except Exception as e:
         return error_response(f'Failed to load analytics: {str(e)}', 500)
+
+
+@ml_bp.route('/teacher/cohort-evaluation', methods=['GET'])
+@jwt_required()
+def get_cohort_evaluation():
+    """
+    Evaluate every student who attempted the teacher's quizzes in one pass
+    
+    All figures are scoped to the teacher's lessons: accuracy and trend
+    come from attempts on their quizzes, and mastery from the students'
+    stored knowledge state for the topics of those quizzes only.
+    """
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
+        user = User.query.get(user_id)
+        
+        if not user or user.role not in ['teacher', 'admin']:
+            return error_response('Teacher/Admin account required', 403)
+        
+        # Load the cohort's attempts as columns in a single query
+        rows = db.session.query(
+            Attempt.user_id,
+            Attempt.score,
+            Attempt.is_correct,
+            Attempt.timestamp,
+            db.func.coalesce(db.func.nullif(Lesson.subject, ''), 'general')
+        ).join(Quiz, Attempt.quiz_id == Quiz.id)\
+            .join(Lesson, Quiz.lesson_id == Lesson.id)\
+            .filter(Lesson.created_by == user_id)\
+            .all()
+        
+        if not rows:
+            return success_response({'students': [], 'total': 0})
+        
+        # Mastery comes from the stored knowledge state, as in /evaluate,
+        # limited to the topics each student attempted in these lessons
+        user_ids, scores, is_correct, timestamps, topics = zip(*rows)
+        cohort_topics = {}
+        for student_id, topic in zip(user_ids, topics):
+            cohort_topics.setdefault(student_id, set()).add(topic)
+        mastery_states = {
+            student_id: {topic: state for topic, state in stored.items() if topic in cohort_topics[student_id]}
+            for student_id, stored in load_mastery_many(cohort_topics).items()
+        }
+        
+        results = ai_engine.evaluate_performance_batch(
+            np.array(user_ids, dtype=np.int64),
+            np.array(scores, dtype=float),
+            np.array(is_correct, dtype=bool),
+            np.array(timestamps, dtype='datetime64[us]'),
+            topics=np.array(topics, dtype=object),
+            mastery_states=mastery_states
+        )
+        
+        names = dict(
+            db.session.query(User.id, User.name)
+            .filter(User.id.in_(results['user_id'].tolist()))
+            .all()
+        )
+        
+        students = []
+        for i, student_id in enumerate(results['user_id'].tolist()):
+            students.append({
+                'user_id': student_id,
+                'name': names.get(student_id),
+                'total_attempts': int(results['total_attempts'][i]),
+                'accuracy': float(results['accuracy'][i]),
+                'recent_accuracy': float(results['recent_accuracy'][i]),
+                'mastery_level': float(results['mastery_level'][i]),
+                'confidence': float(results['confidence'][i]),
+                'trend': str(results['trend'][i])
+            })
+        
+        return success_response({'students': students, 'total': len(students)})
+        
+    except Exception as e:
+        return error_response(f'Failed to evaluate cohort: {str(e)}', 500)
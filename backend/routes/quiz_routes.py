@@ -1,7 +1,7 @@
 """
 Quiz routes for taking quizzes and managing quiz attempts
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from database import db
@@ -9,7 +9,9 @@ from models.user import User, StudentProfile
 from models.lesson import Lesson
 from models.quiz import Quiz, Attempt, QuizSession
 from ml_engine.recommend import ai_engine
+from ml_engine import events
 from utils.security import role_required, success_response, error_response
+from utils.offline_sync import sync_attempts, read_chunks
 
 quiz_bp = Blueprint('quiz', __name__)
 
@@ -60,6 +62,79 @@ def get_quiz(quiz_id):
         return error_response(f'Failed to fetch quiz: {str(e)}', 500)
 
 
+def _grade_attempt(user_id, quiz, user_answer, time_taken):
+    """
+    Grade an answer against a quiz
+    
+    Returns:
+        Attempt: Unsaved attempt with score and feedback
+    """
+    is_correct = quiz.check_answer(user_answer)
+    
+    # Look up the precompiled feedback; generate it only for quizzes
+    # saved before feedback was compiled or for out-of-range answers
+    feedback = quiz.feedback_for(user_answer)
+    if feedback is None:
+        feedback = ai_engine.generate_feedback(
+            quiz.to_dict(include_answer=True),
+            user_answer,
+            quiz.correct_answer
+        )
+    
+    return Attempt(
+        user_id=user_id,
+        quiz_id=quiz.id,
+        user_answer=user_answer,
+        is_correct=is_correct,
+        score=quiz.points if is_correct else 0,
+        time_taken_seconds=time_taken,
+        synced=True,
+        feedback=feedback
+    )
+
+
+def _attempt_result(attempt, quiz):
+    """Attempt dict with the correct answer and explanation revealed"""
+    result = attempt.to_dict()
+    result['correct_answer'] = quiz.correct_answer
+    result['explanation'] = quiz.explanation
+    result['correct_option'] = quiz.options[quiz.correct_answer] if quiz.correct_answer < len(quiz.options) else None
+    return result
+
+
+def _link_attempts(session, attempts):
+    """Attach attempts to a session and add them to its running totals"""
+    for attempt in attempts:
+        attempt.session_id = session.id
+    QuizSession.record_attempt(
+        session.id,
+        sum(1 for a in attempts if a.is_correct),
+        sum(a.score for a in attempts),
+        sum(a.time_taken_seconds or 0 for a in attempts)
+    )
+
+
+def _close_session(session, user_id):
+    """
+    Close a session from its running totals and complete the lesson on a pass
+    
+    Joins the caller's transaction; the caller commits.
+    """
+    session.calculate_score()
+    
+    # Update lesson progress
+    from models.lesson import LessonProgress
+    progress = LessonProgress.query.filter_by(
+        user_id=user_id,
+        lesson_id=session.lesson_id
+    ).first()
+    
+    if progress:
+        if session.percentage >= 70 and progress.status != 'completed':  # 70% passing grade
+            progress.mark_complete()
+            events.lesson_completion_changed(user_id, session.lesson_id)
+
+
 @quiz_bp.route('/<int:quiz_id>/attempt', methods=['POST'])
 @jwt_required()
 def attempt_quiz(quiz_id):
@@ -79,53 +154,37 @@ def attempt_quiz(quiz_id):
         user_answer = data['answer']
         time_taken = data.get('time_taken_seconds', 0)
         
-        # Check if answer is correct
-        is_correct = quiz.check_answer(user_answer)
-        score = quiz.points if is_correct else 0
-        
-        # Generate AI feedback
-        feedback = ai_engine.generate_feedback(
-            quiz.to_dict(include_answer=True),
-            user_answer,
-            quiz.correct_answer
-        )
-        
-        # Create attempt record
-        attempt = Attempt(
-            user_id=user_id,
-            quiz_id=quiz_id,
-            user_answer=user_answer,
-            is_correct=is_correct,
-            score=score,
-            time_taken_seconds=time_taken,
-            synced=True,
-            feedback=feedback
-        )
-        
+        # Count the attempt towards the given session, or else the
+        # student's open session for this lesson
+        if data.get('session_id') is not None:
+            session = QuizSession.query.get(data['session_id'])
+            if not session or session.user_id != user_id or session.lesson_id != quiz.lesson_id:
+                return error_response('Session not found for this quiz', 400)
+            if session.completed_at is not None:
+                return error_response('Session already completed', 409)
+        else:
+            session = QuizSession.open_for(user_id, quiz.lesson_id)
+        
+        # A session counts each question once; a repeated answer is still
+        # stored, but only outside the session's totals
+        if session and Attempt.query.filter_by(session_id=session.id, quiz_id=quiz.id).first():
+            if data.get('session_id') is not None:
+                return error_response('Quiz already answered in this session', 409)
+            session = None
+        
+        # Grade the answer and create the attempt record
+        attempt = _grade_attempt(user_id, quiz, user_answer, time_taken)
         db.session.add(attempt)
+        if session:
+            _link_attempts(session, [attempt])
         
-        # Update student profile statistics
-        user = User.query.get(user_id)
-        if user.role == 'student' and user.student_profile:
-            profile = user.student_profile
-            profile.total_quizzes_taken += 1
-            
-            # Recalculate average score
-            all_attempts = Attempt.query.filter_by(user_id=user_id).all()
-            if all_attempts:
-                total_score = sum(a.score for a in all_attempts)
-                max_possible = len(all_attempts) * 10  # Assuming 10 points per quiz
-                profile.average_score = (total_score / max_possible) * 100 if max_possible > 0 else 0
+        # Update profile totals, the knowledge state and cached recommendations
+        events.attempt_recorded(user_id, quiz, attempt.is_correct, attempt.score)
         
         db.session.commit()
         
         # Return result with feedback
-        result = attempt.to_dict()
-        result['correct_answer'] = quiz.correct_answer
-        result['explanation'] = quiz.explanation
-        result['correct_option'] = quiz.options[quiz.correct_answer] if quiz.correct_answer < len(quiz.options) else None
-        
-        return success_response(result, 'Quiz attempt submitted successfully')
+        return success_response(_attempt_result(attempt, quiz), 'Quiz attempt submitted successfully')
         
     except Exception as e:
         db.session.rollback()
@@ -185,30 +244,11 @@ def complete_quiz_session(session_id):
         if session.user_id != user_id:
             return error_response('Unauthorized', 403)
         
-        # Get all attempts for this session
-        attempts = Attempt.query.filter(
-            Attempt.user_id == user_id,
-            Attempt.timestamp >= session.started_at
-        ).join(Quiz).filter(
-            Quiz.lesson_id == session.lesson_id
-        ).all()
-        
-        # Calculate session statistics
-        session.correct_answers = sum(1 for a in attempts if a.is_correct)
-        session.total_score = sum(a.score for a in attempts)
-        session.time_taken_seconds = sum(a.time_taken_seconds for a in attempts)
-        session.calculate_score()
-        
-        # Update lesson progress
-        from models.lesson import LessonProgress
-        progress = LessonProgress.query.filter_by(
-            user_id=user_id,
-            lesson_id=session.lesson_id
-        ).first()
+        if session.completed_at is not None:
+            return success_response(session.to_dict(), 'Quiz session already completed')
         
-        if progress:
-            if session.percentage >= 70:  # 70% passing grade
-                progress.mark_complete()
+        # Totals were kept up to date as attempts were linked
+        _close_session(session, user_id)
         
         db.session.commit()
         
@@ -219,6 +259,97 @@ def complete_quiz_session(session_id):
         return error_response(f'Failed to complete session: {str(e)}', 500)
 
 
+@quiz_bp.route('/session/<int:session_id>/submit', methods=['POST'])
+@jwt_required()
+def submit_quiz_session(session_id):
+    """
+    Submit every answer of a quiz session in one request
+    
+    Grades the answers against the lesson's answer key, inserts the
+    attempts, updates the profile and closes the session in a single
+    transaction, replacing one /<quiz_id>/attempt call per question plus
+    /session/<id>/complete on slow connections.
+    
+    Body: {"answers": [{"quiz_id": 1, "answer": 2, "time_taken_seconds": 30}, ...]}
+    """
+    try:
+        user_id = int(get_jwt_identity())  # Convert string to int
+        data = request.get_json() or {}
+        
+        # Locked so a concurrent /attempt or submit cannot add to the
+        # session between the checks below and the commit
+        session = QuizSession.query.filter_by(id=session_id).with_for_update().first()
+        if not session:
+            return error_response('Session not found', 404)
+        
+        if session.user_id != user_id:
+            return error_response('Unauthorized', 403)
+        
+        if session.completed_at is not None:
+            return error_response('Session already completed', 409)
+        
+        answers = data.get('answers')
+        if not isinstance(answers, list) or not answers:
+            return error_response('Answers are required', 400)
+        
+        for item in answers:
+            if not isinstance(item, dict) or 'quiz_id' not in item or 'answer' not in item:
+                return error_response('Each answer needs quiz_id and answer', 400)
+            if not isinstance(item['quiz_id'], int) or not isinstance(item['answer'], int):
+                return error_response('quiz_id and answer must be integers', 400)
+        
+        quiz_ids = [item['quiz_id'] for item in answers]
+        if len(set(quiz_ids)) != len(quiz_ids):
+            return error_response('Each quiz can only be answered once per session', 400)
+        
+        # Answers already recorded through /attempt count towards the
+        # session's totals; submitting them again would count them twice
+        answered = sorted(
+            quiz_id for quiz_id, in db.session.query(Attempt.quiz_id).filter(
+                Attempt.session_id == session.id,
+                Attempt.quiz_id.in_(quiz_ids)
+            ).distinct()
+        )
+        if answered:
+            return error_response(f'Quizzes already answered in this session: {answered}', 409)
+        
+        # Quiz rows (feedback, explanations, topics) in one query, which
+        # also checks that every quiz belongs to the session's lesson
+        quizzes = {
+            quiz.id: quiz for quiz in Quiz.query.filter(
+                Quiz.lesson_id == session.lesson_id,
+                Quiz.id.in_(quiz_ids)
+            )
+        }
+        unknown = [quiz_id for quiz_id in quiz_ids if quiz_id not in quizzes]
+        if unknown:
+            return error_response(f'Quizzes not in this session: {unknown}', 400)
+        
+        attempts = [
+            _grade_attempt(user_id, quizzes[item['quiz_id']], item['answer'], item.get('time_taken_seconds', 0))
+            for item in answers
+        ]
+        db.session.add_all(attempts)  # One multi-row INSERT ... RETURNING on PostgreSQL
+        _link_attempts(session, attempts)
+        
+        events.attempts_recorded(user_id, [
+            (quizzes[attempt.quiz_id], attempt.is_correct, attempt.score, None) for attempt in attempts
+        ])
+        
+        _close_session(session, user_id)
+        
+        db.session.commit()
+        
+        return success_response({
+            'session': session.to_dict(),
+            'results': [_attempt_result(attempt, quizzes[attempt.quiz_id]) for attempt in attempts]
+        }, 'Quiz session submitted')
+        
+    except Exception as e:
+        db.session.rollback()
+        return error_response(f'Failed to submit session: {str(e)}', 500)
+
+
 @quiz_bp.route('', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
@@ -251,6 +382,7 @@ def create_quiz():
             hint=data.get('hint')
         )
         
+        events.quiz_saved(quiz)
         db.session.add(quiz)
         db.session.commit()
         
@@ -293,6 +425,8 @@ def update_quiz(quiz_id):
         if 'hint' in data:
             quiz.hint = data['hint']
         
+        # Invalidate the precompiled feedback by recompiling it
+        events.quiz_saved(quiz)
         db.session.commit()
         
         return success_response(
@@ -328,62 +462,85 @@ def delete_quiz(quiz_id):
 @quiz_bp.route('/sync/offline', methods=['POST'])
 @jwt_required()
 def sync_offline_attempts():
-    """Sync offline quiz attempts"""
+    """
+    Sync offline quiz attempts
+    
+    Idempotent: attempts are keyed by their client_attempt_id, so a retried
+    batch is stored once. Answers are re-graded on the server.
+    
+    Large backlogs can be sent as application/x-ndjson, one attempt per
+    line; see _sync_ndjson.
+    """
     try:
         user_id = int(get_jwt_identity())  # Convert string to int
-        data = request.get_json()
+        if request.mimetype in NDJSON_MIMETYPES:
+            return _sync_ndjson(user_id)
+        
+        data = request.get_json() or {}
         
         attempts_data = data.get('attempts', [])
         if not attempts_data:
             return error_response('No attempts to sync', 400)
         
-        synced_count = 0
-        errors = []
-        
-        for attempt_data in attempts_data:
-            try:
-                quiz_id = attempt_data.get('quiz_id')
-                quiz = Quiz.query.get(quiz_id)
-                
-                if not quiz:
-                    errors.append(f'Quiz {quiz_id} not found')
-                    continue
-                
-                # Check if already synced (prevent duplicates)
-                existing = Attempt.query.filter_by(
-                    user_id=user_id,
-                    quiz_id=quiz_id,
-                    timestamp=datetime.fromisoformat(attempt_data['timestamp'])
-                ).first()
-                
-                if existing:
-                    continue
-                
-                # Create attempt
-                attempt = Attempt(
-                    user_id=user_id,
-                    quiz_id=quiz_id,
-                    user_answer=attempt_data['user_answer'],
-                    is_correct=attempt_data['is_correct'],
-                    score=attempt_data['score'],
-                    time_taken_seconds=attempt_data.get('time_taken_seconds', 0),
-                    timestamp=datetime.fromisoformat(attempt_data['timestamp']),
-                    synced=True
-                )
-                
-                db.session.add(attempt)
-                synced_count += 1
-                
-            except Exception as e:
-                errors.append(f'Error syncing attempt: {str(e)}')
-        
+        result = sync_attempts(user_id, attempts_data)
         db.session.commit()
         
-        return success_response({
-            'synced_count': synced_count,
-            'errors': errors
-        }, f'Synced {synced_count} attempts')
+        return success_response(result, f"Synced {result['synced_count']} attempts")
         
     except Exception as e:
         db.session.rollback()
         return error_response(f'Sync failed: {str(e)}', 500)
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+
+def _sync_ndjson(user_id):
+    """
+    Ingest a newline-delimited attempt stream in committed chunks
+    
+    Lines are read from the request stream as they arrive and every
+    SYNC_CHUNK_SIZE lines are graded and committed on their own, so memory
+    stays flat and a failing chunk does not undo the earlier ones. Each
+    chunk is acknowledged with its line offsets; a client whose request
+    was cut off resends from next_offset of the last acknowledged chunk
+    (pass ?offset=N to keep offsets relative to its whole queue). When a
+    chunk fails the response is a 500 that still carries the acknowledged
+    chunks and resume_from.
+    """
+    chunk_size = current_app.config['SYNC_CHUNK_SIZE']
+    offset = request.args.get('offset', 0, type=int)
+    
+    chunks = []
+    resume_from = None
+    failure = None
+    for lines in read_chunks(request.stream, chunk_size):
+        try:
+            result = sync_attempts(user_id, lines, offset)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            resume_from = offset
+            failure = f'Chunk at offset {offset} failed: {str(e)}'
+            break
+        
+        chunks.append({'offset': offset, 'next_offset': offset + len(lines), **result})
+        offset += len(lines)
+    
+    synced_count = sum(chunk['synced_count'] for chunk in chunks)
+    data = {
+        'synced_count': synced_count,
+        'duplicate_count': sum(chunk['duplicate_count'] for chunk in chunks),
+        'chunks': chunks,
+        'complete': failure is None,
+        'resume_from': resume_from,
+        'error': failure
+    }
+    if failure:
+        return jsonify({
+            'success': False,
+            'message': failure,
+            'data': data
+        }), 500
+    
+    return success_response(data, f'Synced {synced_count} attempts')
@@ -0,0 +1,72 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database with sample data,
+a test client and JWT headers for a fresh student per test
+"""
+import os
+import sys
+import uuid
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix='learning-platform-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ['ML_MODEL_DIR'] = os.path.join(_tmp, 'models')
+os.environ['METRICS_DIR'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app  # noqa: E402  (configured from the environment above)
+from flask_jwt_extended import create_access_token  # noqa: E402
+from database import db  # noqa: E402
+from models.user import User  # noqa: E402
+from models.lesson import Lesson  # noqa: E402
+from models.quiz import Quiz  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_student(app):
+    """Create a student; returns (user_id, JWT headers)"""
+    def make():
+        with app.app_context():
+            user = User(name='Test Student', email=f'{uuid.uuid4().hex}@example.com', role='student')
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    return make
+
+
+@pytest.fixture
+def student_login(make_student):
+    """A new student, so attempt counts start at zero in every test"""
+    return make_student()
+
+
+@pytest.fixture
+def student(student_login):
+    return student_login[0]
+
+
+@pytest.fixture
+def auth_headers(student_login):
+    return student_login[1]
+
+
+@pytest.fixture
+def lesson_quizzes(app):
+    """(lesson_id, [(quiz_id, correct_answer)]) of a sample lesson with quizzes"""
+    with app.app_context():
+        lesson_id = db.session.query(Quiz.lesson_id).join(Lesson).order_by(Quiz.lesson_id).first()[0]
+        quizzes = Quiz.query.filter_by(lesson_id=lesson_id).order_by(Quiz.id).all()
+        return lesson_id, [(quiz.id, quiz.correct_answer) for quiz in quizzes]
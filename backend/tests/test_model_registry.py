@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ml_engine.registry import ModelRegistry
+
+
+def test_concurrent_publishers_keep_each_others_arrays(tmp_path):
+    def publish(name):
+        ModelRegistry(str(tmp_path)).publish(arrays={name: np.arange(3)})
+
+    names = [f'array_{index}' for index in range(24)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(publish, names))
+
+    registry = ModelRegistry(str(tmp_path))
+    artifact = registry.load(registry.current_version())
+    assert sorted(artifact.arrays) == sorted(names)
@@ -0,0 +1,153 @@
+"""
+Idempotency of /api/quiz/sync/offline for JSON batches and NDJSON streams
+"""
+import json
+from datetime import datetime, timedelta
+
+import routes.quiz_routes as quiz_routes
+from database import db
+from models.quiz import Attempt
+
+SYNC_URL = '/api/quiz/sync/offline'
+BASE_TIME = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _attempts(quizzes, count, prefix='offline'):
+    return [
+        {
+            'client_attempt_id': f'{prefix}-{i}',
+            'quiz_id': quizzes[i % len(quizzes)][0],
+            'user_answer': quizzes[i % len(quizzes)][1],
+            'timestamp': (BASE_TIME + timedelta(seconds=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _attempt_count(app, user_id):
+    with app.app_context():
+        return Attempt.query.filter_by(user_id=user_id).count()
+
+
+def _sync(client, headers, attempts):
+    response = client.post(SYNC_URL, json={'attempts': attempts}, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def _sync_ndjson(client, headers, lines, offset=None, status_code=200):
+    url = SYNC_URL if offset is None else f'{SYNC_URL}?offset={offset}'
+    response = client.post(
+        url,
+        data=''.join(line + '\n' for line in lines),
+        headers={**headers, 'Content-Type': 'application/x-ndjson'}
+    )
+    assert response.status_code == status_code
+    assert response.get_json()['success'] == (status_code == 200)
+    return response.get_json()['data']
+
+
+def test_replayed_batch_is_stored_once(app, client, auth_headers, student, lesson_quizzes):
+    attempts = _attempts(lesson_quizzes[1], 4)
+
+    first = _sync(client, auth_headers, attempts)
+    assert first['synced_count'] == 4
+    assert first['duplicate_count'] == 0
+
+    replay = _sync(client, auth_headers, attempts)
+    assert replay['synced_count'] == 0
+    assert replay['duplicate_count'] == 4
+    assert sorted(replay['acknowledged']) == sorted(item['client_attempt_id'] for item in attempts)
+    assert _attempt_count(app, student) == 4
+
+
+def test_partially_duplicated_batch_stores_only_new_attempts(app, client, auth_headers, student, lesson_quizzes):
+    attempts = _attempts(lesson_quizzes[1], 6)
+    _sync(client, auth_headers, attempts[:3])
+
+    # Overlaps the stored attempts and repeats one key inside the batch
+    result = _sync(client, auth_headers, attempts[1:] + [attempts[4]])
+    assert result['synced_count'] == 3
+    assert result['duplicate_count'] == 3
+    assert _attempt_count(app, student) == 6
+
+
+def test_attempts_without_keys_match_legacy_rows_on_quiz_and_timestamp(app, client, auth_headers, student, lesson_quizzes):
+    quiz_id, correct_answer = lesson_quizzes[1][0]
+    with app.app_context():
+        # Synced by an older client, before attempts carried keys
+        db.session.add(Attempt(
+            user_id=student,
+            quiz_id=quiz_id,
+            user_answer=correct_answer,
+            is_correct=True,
+            score=10,
+            timestamp=BASE_TIME
+        ))
+        db.session.commit()
+
+    legacy = {'quiz_id': quiz_id, 'user_answer': correct_answer, 'timestamp': BASE_TIME.isoformat()}
+    later = {**legacy, 'timestamp': (BASE_TIME + timedelta(minutes=1)).isoformat()}
+
+    result = _sync(client, auth_headers, [legacy, later])
+    assert result['synced_count'] == 1
+    assert result['duplicate_count'] == 1
+    assert _attempt_count(app, student) == 2
+
+    # The newly stored keyless attempt is recognized on replay too
+    replay = _sync(client, auth_headers, [legacy, later])
+    assert replay['synced_count'] == 0
+    assert replay['duplicate_count'] == 2
+
+
+def test_ndjson_stream_resumes_from_failed_chunk(app, client, auth_headers, student, lesson_quizzes, monkeypatch):
+    monkeypatch.setitem(app.config, 'SYNC_CHUNK_SIZE', 5)
+    lines = [json.dumps(item) for item in _attempts(lesson_quizzes[1], 17, prefix='stream')]
+
+    sync_attempts = quiz_routes.sync_attempts
+
+    def failing_third_chunk(user_id, items, start=0):
+        if start == 10:
+            raise RuntimeError('connection lost')
+        return sync_attempts(user_id, items, start)
+
+    monkeypatch.setattr(quiz_routes, 'sync_attempts', failing_third_chunk)
+    interrupted = _sync_ndjson(client, auth_headers, lines, status_code=500)
+    assert not interrupted['complete']
+    assert interrupted['resume_from'] == 10
+    assert [(chunk['offset'], chunk['next_offset']) for chunk in interrupted['chunks']] == [(0, 5), (5, 10)]
+    assert interrupted['synced_count'] == 10
+    assert _attempt_count(app, student) == 10
+
+    monkeypatch.setattr(quiz_routes, 'sync_attempts', sync_attempts)
+    resume_from = interrupted['resume_from']
+    resumed = _sync_ndjson(client, auth_headers, lines[resume_from:], offset=resume_from)
+    assert resumed['complete']
+    assert resumed['resume_from'] is None
+    assert [(chunk['offset'], chunk['next_offset']) for chunk in resumed['chunks']] == [(10, 15), (15, 17)]
+    assert resumed['synced_count'] == 7
+    assert _attempt_count(app, student) == 17
+
+    # Resending the whole queue afterwards stores nothing new
+    replay = _sync_ndjson(client, auth_headers, lines)
+    assert replay['synced_count'] == 0
+    assert replay['duplicate_count'] == 17
+    assert _attempt_count(app, student) == 17
+
+
+def test_attempts_skipped_by_the_insert_are_not_counted(app, client, auth_headers, student, lesson_quizzes, monkeypatch):
+    import utils.offline_sync as offline_sync
+
+    attempts = _attempts(lesson_quizzes[1], 3, prefix='race')
+    insert_missing = offline_sync.insert_missing
+
+    def insert_all_but_first(model, rows, index_elements):
+        # As if a concurrent sync had stored the first attempt first
+        insert_missing(model, rows[1:], index_elements)
+
+    monkeypatch.setattr(offline_sync, 'insert_missing', insert_all_but_first)
+    result = _sync(client, auth_headers, attempts)
+    assert result['synced_count'] == 2
+    assert result['duplicate_count'] == 1
+    assert 'race-0' not in result['acknowledged']
+    assert _attempt_count(app, student) == 2
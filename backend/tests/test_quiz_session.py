@@ -0,0 +1,116 @@
+"""
+Submitting a whole quiz session in one request
+"""
+from models.quiz import Attempt
+
+
+def _start_session(client, headers, lesson_id):
+    response = client.post('/api/quiz/session/start', json={'lesson_id': lesson_id}, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['data']['id']
+
+
+def _submit(client, headers, session_id, answers):
+    return client.post(f'/api/quiz/session/{session_id}/submit', json={'answers': answers}, headers=headers)
+
+
+def test_submit_grades_answers_and_closes_session(app, client, auth_headers, student, lesson_quizzes):
+    lesson_id, quizzes = lesson_quizzes
+    session_id = _start_session(client, auth_headers, lesson_id)
+
+    # First answer right, the rest wrong
+    answers = [
+        {'quiz_id': quiz_id, 'answer': correct if i == 0 else correct + 1, 'time_taken_seconds': 7}
+        for i, (quiz_id, correct) in enumerate(quizzes)
+    ]
+    response = _submit(client, auth_headers, session_id, answers)
+    assert response.status_code == 200
+    data = response.get_json()['data']
+
+    assert [result['is_correct'] for result in data['results']] == [i == 0 for i in range(len(quizzes))]
+    session = data['session']
+    assert session['completed_at'] is not None
+    assert session['correct_answers'] == 1
+    assert session['time_taken_seconds'] == 7 * len(quizzes)
+
+    with app.app_context():
+        attempts = Attempt.query.filter_by(user_id=student).all()
+        assert len(attempts) == len(quizzes)
+        assert {attempt.session_id for attempt in attempts} == {session_id}
+
+    # A completed session cannot be submitted again
+    again = _submit(client, auth_headers, session_id, answers[:1])
+    assert again.status_code == 409
+
+
+def test_submit_rejects_invalid_answers(app, client, auth_headers, student, lesson_quizzes):
+    lesson_id, quizzes = lesson_quizzes
+    session_id = _start_session(client, auth_headers, lesson_id)
+    quiz_id, correct = quizzes[0]
+
+    assert _submit(client, auth_headers, session_id, []).status_code == 400
+    assert _submit(client, auth_headers, session_id, [{'quiz_id': 999999, 'answer': 0}]).status_code == 400
+    duplicate = [{'quiz_id': quiz_id, 'answer': correct}] * 2
+    assert _submit(client, auth_headers, session_id, duplicate).status_code == 400
+
+    with app.app_context():
+        assert Attempt.query.filter_by(user_id=student).count() == 0
+
+
+def test_submit_rejects_other_students_session(client, auth_headers, make_student, lesson_quizzes):
+    lesson_id, quizzes = lesson_quizzes
+    session_id = _start_session(client, auth_headers, lesson_id)
+    _, other_headers = make_student()
+
+    response = _submit(client, other_headers, session_id, [{'quiz_id': quizzes[0][0], 'answer': 0}])
+    assert response.status_code == 403
+
+
+def test_submit_rejects_quizzes_already_answered_through_attempt(app, client, auth_headers, student, lesson_quizzes):
+    lesson_id, quizzes = lesson_quizzes
+    session_id = _start_session(client, auth_headers, lesson_id)
+    (first_quiz, first_answer), rest = quizzes[0], quizzes[1:]
+
+    # /attempt links the answer to the open session
+    response = client.post(f'/api/quiz/{first_quiz}/attempt', json={'answer': first_answer}, headers=auth_headers)
+    assert response.status_code == 200
+
+    answers = [{'quiz_id': quiz_id, 'answer': correct} for quiz_id, correct in quizzes]
+    response = _submit(client, auth_headers, session_id, answers)
+    assert response.status_code == 409
+    assert str(first_quiz) in response.get_json()['message']
+
+    with app.app_context():
+        assert Attempt.query.filter_by(user_id=student).count() == 1
+
+    response = _submit(client, auth_headers, session_id, answers[1:])
+    assert response.status_code == 200
+    assert [result['quiz_id'] for result in response.get_json()['data']['results']] == [quiz_id for quiz_id, _ in rest]
+
+    with app.app_context():
+        assert Attempt.query.filter_by(user_id=student, session_id=session_id).count() == len(quizzes)
+
+
+def test_session_totals_count_each_question_once(app, client, auth_headers, lesson_quizzes):
+    lesson_id, quizzes = lesson_quizzes
+    session_id = _start_session(client, auth_headers, lesson_id)
+    (first_quiz, first_answer), rest = quizzes[0], quizzes[1:]
+
+    attempt_url = f'/api/quiz/{first_quiz}/attempt'
+    assert client.post(attempt_url, json={'answer': first_answer, 'time_taken_seconds': 5}, headers=auth_headers).status_code == 200
+    # Answering the same question again stays out of the session's totals
+    assert client.post(attempt_url, json={'answer': first_answer, 'time_taken_seconds': 5}, headers=auth_headers).status_code == 200
+    repeat = client.post(attempt_url, json={'answer': first_answer, 'session_id': session_id}, headers=auth_headers)
+    assert repeat.status_code == 409
+
+    response = _submit(client, auth_headers, session_id, [
+        {'quiz_id': quiz_id, 'answer': correct, 'time_taken_seconds': 5} for quiz_id, correct in rest
+    ])
+    assert response.status_code == 200
+    session = response.get_json()['data']['session']
+
+    assert session['correct_answers'] == len(quizzes)
+    assert session['correct_answers'] <= session['total_questions']
+    assert session['percentage'] == 100.0
+    assert session['total_score'] == 10 * len(quizzes)
+    assert session['time_taken_seconds'] == 5 * len(quizzes)
@@ -0,0 +1,37 @@
+"""
+Running totals kept on StudentProfile by every recorded attempt
+"""
+from database import db
+from models.user import StudentProfile
+
+
+def test_average_score_after_two_attempts(app, client, auth_headers, student, lesson_quizzes):
+    with app.app_context():
+        db.session.add(StudentProfile(user_id=student))
+        db.session.commit()
+
+    (right_quiz, right_answer), (wrong_quiz, wrong_answer) = lesson_quizzes[1][:2]
+    for quiz_id, answer in ((right_quiz, right_answer), (wrong_quiz, wrong_answer + 1)):
+        response = client.post(f'/api/quiz/{quiz_id}/attempt', json={'answer': answer}, headers=auth_headers)
+        assert response.status_code == 200
+
+    with app.app_context():
+        profile = StudentProfile.query.filter_by(user_id=student).one()
+        assert profile.total_quizzes_taken == 2
+        assert profile.total_points_possible == 20
+        assert profile.total_points_earned == 10
+        assert profile.average_score == 50.0
+
+
+def test_update_assigns_average_before_totals(app, monkeypatch):
+    # MySQL reads already-assigned columns in later SET clauses
+    from sqlalchemy.dialects import mysql
+
+    statements = []
+    monkeypatch.setattr(db.session, 'execute', lambda statement, *args, **kwargs: statements.append(statement))
+    with app.app_context():
+        StudentProfile.record_attempt(1, 10, 10)
+
+    sql = str(statements[0].compile(dialect=mysql.dialect()))
+    assert sql.index('average_score=') < sql.index('total_points_earned=')
+    assert sql.index('average_score=') < sql.index('total_points_possible=')
@@ -0,0 +1,264 @@
+"""
+Fit per-topic Bayesian Knowledge Tracing parameters from the attempts table
+Attempts are streamed in (topic, student, time) order, so only the current
+topic's correctness sequences are held in memory. Each finished topic is
+fitted with EM in a worker process while the next one is being read.
+
+The fitted parameters are published as a new model registry version
+(Config.ML_MODEL_DIR); running workers switch to it without a restart.
+Stored SkillMastery posteriors of the fitted topics are then replayed
+under the new parameters; until a row is replayed its posterior carries
+the old version stamp and workers report its accuracy instead:
+
+    python train_bkt.py --workers 4
+    python train_bkt.py --max-attempts-per-topic 500000
+"""
+import os
+import sys
+import zlib
+import argparse
+from array import array
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def fit_topic(topic, observations, lengths):
+    """Fit one topic in a worker process"""
+    import numpy as np
+    from ml_engine.bkt_training import fit_bkt
+
+    params = fit_bkt(
+        np.frombuffer(observations, dtype=np.int8),
+        np.frombuffer(lengths, dtype=np.int32)
+    )
+    return topic, params
+
+
+def _sampled(user_id, rate):
+    """Deterministically keep whole student sequences at the given rate"""
+    return rate >= 1 or zlib.crc32(str(user_id).encode()) / 0xFFFFFFFF < rate
+
+
+def iter_topics(max_attempts_per_topic, chunk_size):
+    """
+    Stream attempts and yield each topic's sequences once it is complete
+
+    Lessons without a subject (NULL or '') form the 'general' topic, as
+    in knowledge_state.quiz_topic.
+
+    Yields:
+        tuple: (topic, observations bytes (int8), lengths bytes (int32),
+                user ids bytes (int64), one per sequence)
+    """
+    from database import db
+    from models.lesson import Lesson
+    from models.quiz import Quiz, Attempt
+
+    subject_topic = db.func.coalesce(db.func.nullif(Lesson.subject, ''), 'general')
+
+    # Sampling rate per topic so large topics stay under the cap
+    counts = db.session.query(subject_topic, db.func.count(Attempt.id))\
+        .join(Quiz, Attempt.quiz_id == Quiz.id)\
+        .join(Lesson, Quiz.lesson_id == Lesson.id)\
+        .group_by(subject_topic)
+    rates = {
+        subject: min(1.0, max_attempts_per_topic / count) if max_attempts_per_topic else 1.0
+        for subject, count in counts
+    }
+
+    rows = db.session.query(subject_topic, Attempt.user_id, Attempt.is_correct)\
+        .join(Quiz, Attempt.quiz_id == Quiz.id)\
+        .join(Lesson, Quiz.lesson_id == Lesson.id)\
+        .order_by(subject_topic, Attempt.user_id, Attempt.timestamp, Attempt.id)\
+        .yield_per(chunk_size)
+
+    topic = None
+    user = None
+    observations = array('b')
+    lengths = array('i')
+    users = array('q')
+    for subject, user_id, is_correct in rows:
+        if subject != topic:
+            if observations:
+                yield topic, observations.tobytes(), lengths.tobytes(), users.tobytes()
+            topic, user = subject, None
+            observations, lengths, users = array('b'), array('i'), array('q')
+
+        # Subjects first seen after the counts were read are kept whole
+        if not _sampled(user_id, rates.get(subject, 1.0)):
+            continue
+        if user_id != user:
+            user = user_id
+            lengths.append(0)
+            users.append(user_id)
+        observations.append(1 if is_correct else 0)
+        lengths[-1] += 1
+
+    if observations:
+        yield topic, observations.tobytes(), lengths.tobytes(), users.tobytes()
+
+
+def train(workers, max_attempts_per_topic, min_attempts, chunk_size):
+    from app import create_app
+
+    app = create_app()
+    fitted = {}
+    with app.app_context(), ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for topic, observations, lengths, _ in iter_topics(max_attempts_per_topic, chunk_size):
+            if len(observations) < min_attempts:
+                print(f"   ⏭️  {topic}: {len(observations)} attempts, keeping defaults")
+                continue
+
+            # Bound topics in flight so memory stays flat for any table size
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(finished, fitted)
+
+            pending.add(pool.submit(fit_topic, topic, observations, lengths))
+
+        finished, _ = wait(pending)
+        _collect(finished, fitted)
+
+    return app, fitted
+
+
+def _collect(finished, fitted):
+    for future in finished:
+        topic, params = future.result()
+        fitted[topic] = params
+        print(f"   ✅ {topic}: init={params['p_init']:.3f} learn={params['p_learn']:.3f} "
+              f"guess={params['p_guess']:.3f} slip={params['p_slip']:.3f} "
+              f"({params['n_attempts']} attempts, {params['iterations']} iterations)")
+
+
+def publish(model_dir, fitted, bkt_version, keep_versions):
+    """Publish the fitted parameters as a new registry version"""
+    import numpy as np
+    from ml_engine.registry import ModelRegistry
+
+    topics = sorted(fitted)
+    registry = ModelRegistry(model_dir)
+    version = registry.publish(
+        arrays={
+            'bkt_params': np.array(
+                [[fitted[t]['p_init'], fitted[t]['p_learn'], fitted[t]['p_guess'], fitted[t]['p_slip']]
+                 for t in topics],
+                dtype=np.float64
+            ).reshape(len(topics), 4)
+        },
+        params={
+            'bkt_topics': topics,
+            'bkt_version': bkt_version,
+            'bkt_fit': {
+                t: {key: fitted[t][key] for key in ('log_likelihood', 'iterations', 'n_sequences', 'n_attempts')}
+                for t in topics
+            }
+        }
+    )
+    registry.prune(keep_versions)
+    return version
+
+
+def replay_posteriors(fitted, bkt_version, chunk_size):
+    """
+    Recompute the stored posteriors of the fitted topics under their new parameters
+
+    Every attempt is replayed (no sampling). Rows a worker updated after
+    the replay started are left alone: their posterior mixes parameters,
+    so it keeps its old stamp and the accuracy fallback.
+
+    Returns:
+        int: Number of (student, topic) states replayed
+    """
+    import numpy as np
+    from database import db
+    from models.user import SkillMastery
+    from ml_engine.recommend import ai_engine
+
+    table = SkillMastery.__table__
+    statement = table.update().where(
+        table.c.user_id == db.bindparam('b_user_id'),
+        table.c.topic == db.bindparam('b_topic'),
+        table.c.updated_at < db.bindparam('b_started_at')
+    ).values(
+        p_mastery=db.bindparam('b_p_mastery'),
+        params_version=db.bindparam('b_params_version')
+    )
+
+    started_at = datetime.utcnow()
+    replayed = 0
+    for topic, observations, lengths, users in iter_topics(0, chunk_size):
+        if topic not in fitted:
+            continue
+
+        counts = np.frombuffer(lengths, dtype=np.int32).astype(np.int64)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        params = fitted[topic]
+        posteriors = ai_engine._batch_mastery(
+            np.frombuffer(observations, dtype=np.int8).astype(bool), starts, counts,
+            np.tile([params['p_init'], params['p_learn'], params['p_guess'], params['p_slip']],
+                    (len(counts), 1))
+        )
+
+        user_ids = np.frombuffer(users, dtype=np.int64)
+        for start in range(0, len(user_ids), 1000):
+            db.session.execute(statement, [
+                {
+                    'b_user_id': int(user_id),
+                    'b_topic': topic,
+                    'b_started_at': started_at,
+                    'b_p_mastery': float(p_mastery),
+                    'b_params_version': bkt_version
+                }
+                for user_id, p_mastery in zip(user_ids[start:start + 1000], posteriors[start:start + 1000])
+            ])
+            db.session.commit()
+        replayed += len(user_ids)
+
+    return replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit per-topic BKT parameters with EM')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--max-attempts-per-topic', type=int, default=1000000,
+                        help='Subsample students so a topic uses at most this many attempts (0 = all)')
+    parser.add_argument('--min-attempts', type=int, default=200,
+                        help='Topics with fewer attempts keep the default parameters')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per database round trip')
+    parser.add_argument('--keep-versions', type=int, default=3, help='Model registry versions to keep')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  TRAIN BKT PARAMETERS")
+    print("="*60)
+
+    try:
+        app, fitted = train(args.workers, args.max_attempts_per_topic, args.min_attempts, args.chunk_size)
+        bkt_version = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        version = publish(app.config['ML_MODEL_DIR'], fitted, bkt_version, args.keep_versions)
+    except Exception as e:
+        print(f"\n❌ Training failed: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n✅ Published parameters for {len(fitted)} topics as model version {version}")
+    print("   Running workers pick it up within ML_MODEL_CHECK_INTERVAL seconds")
+
+    try:
+        with app.app_context():
+            replayed = replay_posteriors(fitted, bkt_version, args.chunk_size)
+    except Exception as e:
+        print(f"\n❌ Replaying stored posteriors failed: {str(e)}")
+        print("   Their topics report accuracy until this script is run again")
+        sys.exit(1)
+
+    print(f"✅ Replayed {replayed} stored posteriors under the new parameters")
+
+
+if __name__ == '__main__':
+    main()
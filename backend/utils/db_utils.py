@@ -94,3 +94,29 @@ def safe_query(query_func):
         return query_func()
     
     return _query()
+
+
+def insert_missing(model, rows, index_elements):
+    """
+    Insert rows, skipping those that conflict on a unique key
+
+    Lets concurrent transactions create the same row without one of them
+    failing on the constraint. Joins the caller's transaction.
+
+    Args:
+        model: Model class
+        rows: Column dicts
+        index_elements: Columns of the unique constraint
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    elif dialect == 'mysql':
+        statement = db.insert(model).prefix_with('IGNORE')
+    else:
+        statement = db.insert(model)
+    db.session.execute(statement, rows)
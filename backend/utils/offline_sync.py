@@ -0,0 +1,197 @@
+"""
+Bulk, idempotent import of quiz attempts queued by offline clients
+Every attempt carries a client-generated client_attempt_id, unique per
+student in the attempts table, so a batch that is retried after a dropped
+connection is stored once. Quizzes are prefetched in one query, answers
+are re-graded on the server and new rows go in with one bulk insert that
+skips key conflicts (utils.db_utils.insert_missing).
+
+Large backlogs can be streamed as NDJSON (one attempt per line): lines are
+read incrementally and each chunk is committed and acknowledged on its own.
+"""
+import json
+from datetime import datetime
+from sqlalchemy.orm import joinedload
+from database import db
+from models.user import User
+from models.quiz import Quiz, Attempt
+from ml_engine import events
+from .db_utils import insert_missing
+
+MAX_KEY_LENGTH = 64  # Attempt.client_attempt_id column size
+
+
+def _parse(index, item):
+    """
+    Validate one queued attempt (a dict or one NDJSON line)
+
+    Returns:
+        tuple: (client key, quiz_id, answer, time taken, timestamp, has client key)
+
+    Raises:
+        ValueError: If a required field is missing or malformed
+    """
+    try:
+        if isinstance(item, str):
+            item = json.loads(item)
+        if not isinstance(item, dict):
+            raise ValueError('not an object')
+        quiz_id = int(item['quiz_id'])
+        answer = int(item['user_answer'])
+        timestamp = datetime.fromisoformat(item['timestamp'])
+        time_taken = int(item.get('time_taken_seconds') or 0)
+    except KeyError as e:
+        raise ValueError(f'Attempt {index} is missing {e}')
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Attempt {index} is invalid: {str(e)}')
+
+    # Older clients send no key; (quiz, timestamp) identified their attempts before
+    key = item.get('client_attempt_id')
+    has_key = key is not None
+    key = str(key) if has_key else f'{quiz_id}@{timestamp.isoformat()}'
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f'Attempt {index} client_attempt_id is longer than {MAX_KEY_LENGTH} characters')
+    return key, quiz_id, answer, time_taken, timestamp, has_key
+
+
+def _inserted_keys(user_id, keys):
+    """Which of these client keys the student has stored, read after our insert"""
+    return {
+        key for key, in db.session.query(Attempt.client_attempt_id).filter(
+            Attempt.user_id == user_id,
+            Attempt.client_attempt_id.in_(list(keys))
+        )
+    }
+
+
+def read_chunks(stream, chunk_size):
+    """
+    Split an NDJSON request stream into lists of lines without reading it whole
+
+    Yields:
+        list: Up to chunk_size decoded lines (blank lines included, so
+            positions match line numbers)
+    """
+    chunk = []
+    for line in stream:
+        chunk.append(line.decode('utf-8', errors='replace'))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sync_attempts(user_id, items, start=0):
+    """
+    Grade and store a batch of offline attempts of one student
+
+    Rows join the caller's transaction; the caller commits. The student's
+    user row stays locked until then, so concurrent syncs of one student (a
+    retry racing the original request, or a second device) take turns and
+    every attempt is counted by exactly one of them.
+
+    Args:
+        user_id: Student ID
+        items: Attempt dicts (or NDJSON lines) with quiz_id, user_answer,
+            timestamp and optionally client_attempt_id and time_taken_seconds
+        start: Position of the first item, used in error messages
+
+    Returns:
+        dict: synced_count, duplicate_count, acknowledged client keys and errors
+    """
+    db.session.query(User.id).filter(User.id == user_id).with_for_update().first()
+
+    errors = []
+    parsed = {}  # key -> parsed attempt; repeats inside the batch collapse
+    duplicates = 0
+    for index, item in enumerate(items, start):
+        if isinstance(item, str) and not item.strip():
+            continue  # Blank NDJSON line
+        try:
+            attempt = _parse(index, item)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        if attempt[0] in parsed:
+            duplicates += 1
+            continue
+        parsed[attempt[0]] = attempt
+
+    # Answer keys of every referenced quiz, with lessons for knowledge tracing
+    quizzes = {
+        quiz.id: quiz for quiz in Quiz.query.options(joinedload(Quiz.lesson))
+        .filter(Quiz.id.in_({attempt[1] for attempt in parsed.values()}))
+    } if parsed else {}
+
+    # Keys already stored by an earlier (possibly interrupted) sync
+    stored = {
+        key for key, in db.session.query(Attempt.client_attempt_id).filter(
+            Attempt.user_id == user_id,
+            Attempt.client_attempt_id.in_(list(parsed))
+        )
+    } if parsed else set()
+
+    # Attempts synced before keys existed are matched on (quiz, timestamp)
+    legacy = [attempt for attempt in parsed.values() if not attempt[5] and attempt[0] not in stored]
+    if legacy:
+        stored |= {
+            f'{quiz_id}@{timestamp.isoformat()}' for quiz_id, timestamp in db.session.query(
+                Attempt.quiz_id, Attempt.timestamp
+            ).filter(
+                Attempt.user_id == user_id,
+                Attempt.client_attempt_id.is_(None),
+                Attempt.timestamp.in_({attempt[4] for attempt in legacy})
+            )
+        }
+
+    pending = [attempt for attempt in parsed.values() if attempt[0] not in stored]
+    duplicates += len(parsed) - len(pending)
+
+    # Re-grade on the server from the prefetched quizzes; the client's
+    # is_correct and score are ignored
+    rows = []
+    graded = {}
+    for key, quiz_id, answer, time_taken, timestamp, _ in pending:
+        quiz = quizzes.get(quiz_id)
+        if quiz is None:
+            errors.append(f'Quiz {quiz_id} not found')
+            continue
+
+        is_correct = quiz.check_answer(answer)
+        score = quiz.points if is_correct else 0
+        rows.append({
+            'user_id': user_id,
+            'quiz_id': quiz_id,
+            'user_answer': answer,
+            'is_correct': is_correct,
+            'score': score,
+            'time_taken_seconds': time_taken,
+            'timestamp': timestamp,
+            'synced': True,
+            'feedback': quiz.feedback_for(answer),
+            'client_attempt_id': key
+        })
+        graded[key] = (quiz, is_correct, score, timestamp)
+
+    inserted = set()
+    if rows:
+        insert_missing(Attempt, rows, ['user_id', 'client_attempt_id'])
+        # Keys skipped on a conflict are not counted, graded or replayed
+        inserted = _inserted_keys(user_id, graded)
+        duplicates += len(rows) - len(inserted)
+
+    # Knowledge tracing and reviews replay the new attempts oldest first
+    new_attempts = sorted((graded[key] for key in inserted), key=lambda attempt: attempt[3])
+    if new_attempts:
+        events.attempts_recorded(user_id, new_attempts)
+
+    return {
+        'synced_count': len(inserted),
+        'duplicate_count': duplicates,
+        'acknowledged': [
+            key for key, attempt in parsed.items()
+            if attempt[5] and (key in stored or key in inserted)
+        ],
+        'errors': errors
+    }